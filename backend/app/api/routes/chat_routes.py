@@ -22,6 +22,8 @@ async def chat_stream(
     chat_service: ChatService = Depends(get_chat_service),
 ):
     chat_body.index_name = format_index_name(chat_body.index_name)
+    if chat_body.index_names:
+        chat_body.index_names = [format_index_name(n) for n in chat_body.index_names]
     return await chat_service.chat_stream_sse(body=chat_body)
 
 
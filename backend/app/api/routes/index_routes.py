@@ -5,11 +5,13 @@ from fastapi import APIRouter, UploadFile, File, Form, Depends
 from ask_forge.backend.app.api.dependencies import get_app_state, get_chroma_repo
 from ask_forge.backend.app.core.app_state import AppState
 from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
+from ask_forge.backend.app.repositories.local_store import LocalVectorRepo
 from ask_forge.backend.app.services.indexing.schemas import BuildIndexResponse, Metrics
 from ask_forge.backend.app.services.indexing.pipeline import build_index, add_to_index, load_index
 from ask_forge.backend.app.utils.naming import format_index_name
 from fastapi.responses import JSONResponse
 from typing import List
+import asyncio
 import logging
 # ----------------------------------------------------------------------------------
 
@@ -125,6 +127,37 @@ async def get_index_stats(
             content={"ok": False, "error": str(e)},
         )
 
+@router.get("/index/{index_name}/quantization_report")
+async def get_quantization_report(
+        index_name: str,
+        k: int = 10,
+        sample_size: int = 100,
+        repo: ChromaRepo = Depends(get_chroma_repo),
+):
+    """
+    Báo cáo memory tiết kiệm được và recall bị mất của index lượng tử hoá (int8/binary/ivfpq).
+
+    Recall được đo bằng full float32 scan nên có thể chậm với index lớn.
+    """
+    index_name = format_index_name(index_name)
+    if not isinstance(repo, LocalVectorRepo):
+        return JSONResponse(
+            status_code=400,
+            content={"ok": False, "error": "Quantized index mode is not enabled (VECTOR_INDEX_MODE)"},
+        )
+    try:
+        report = await asyncio.to_thread(repo.index_report, index_name, k, sample_size)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=404,
+            content={"ok": False, "error": str(e)},
+        )
+    return {
+        "ok": True,
+        "index_name": index_name,
+        "report": report,
+    }
+
 @router.delete("/index/{index_name}")
 async def delete_index(
         index_name: str,
@@ -145,8 +178,8 @@ async def delete_index(
         if json_file.exists():
             json_file.unlink()
 
-        # Remove khỏi AppState
-        state.active_indexes.discard(index_name)
+        # Remove khỏi AppState (kèm answer cache của index)
+        state.unregister_index(index_name)
 
         return {
             "ok": True,
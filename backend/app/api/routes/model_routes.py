@@ -0,0 +1,36 @@
+"""
+Model routes - trạng thái các HF model đang được quản lý (RAM footprint, idle...).
+"""
+import logging
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from ask_forge.backend.app.api.dependencies import get_app_state
+from ask_forge.backend.app.core.app_state import AppState
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.model_server.client import ModelServerError, get_model_server_client
+
+router = APIRouter(tags=["models"])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/models")
+async def models_report(app_state: AppState = Depends(get_app_state)):
+    """Footprint / trạng thái của từng model (local ModelManager hoặc model server)."""
+    if settings.MODEL_SERVER_ENABLED:
+        try:
+            info = await get_model_server_client().acall("ping", timeout=5)
+        except (ModelServerError, TimeoutError) as e:
+            return JSONResponse(status_code=503, content={"ok": False, "error": str(e)})
+        return {"ok": True, "source": "model_server", **info}
+
+    if app_state.model_manager is None:
+        return JSONResponse(status_code=503, content={"ok": False, "error": "Model manager not initialized"})
+    return {"ok": True, "source": "local", **app_state.model_manager.report()}
+
+
+@router.get("/models/providers")
+async def providers_report(app_state: AppState = Depends(get_app_state)):
+    """Live stats của từng LLM provider (TTFT, tokens/s, error rate, in-flight) mà router dùng."""
+    return {"ok": True, "providers": app_state.llm_registry.stats_report()}
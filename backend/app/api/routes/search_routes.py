@@ -0,0 +1,56 @@
+"""
+Search routes - batched retrieval (nhiều query trong 1 collection query).
+"""
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import JSONResponse
+
+from ask_forge.backend.app.api.dependencies import get_chroma_repo
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
+from ask_forge.backend.app.services.search.schemas import BatchSearchBody, BatchSearchResponse, QueryResult
+from ask_forge.backend.app.utils.naming import format_index_name
+
+router = APIRouter(tags=["search"])
+logger = logging.getLogger(__name__)
+
+
+@router.post("/search/batch", response_model=BatchSearchResponse)
+async def batch_search(
+        body: BatchSearchBody,
+        repo: ChromaRepo = Depends(get_chroma_repo),
+):
+    """
+    Retrieve contexts cho nhiều query cùng lúc.
+
+    Các query được embed trong 1 forward pass và chạy 1 collection query;
+    kết quả trả về theo đúng thứ tự `queries`.
+    """
+    index_name = format_index_name(body.index_name)
+    if len(body.queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        return JSONResponse(
+            status_code=400,
+            content={"ok": False, "error": f"Too many queries (max {settings.SEARCH_BATCH_MAX_QUERIES})"},
+        )
+    try:
+        per_query = await asyncio.to_thread(
+            repo.get_contexts_for_queries,
+            index_name=index_name,
+            query_texts=body.queries,
+            n_results=body.n_results,
+            min_relevance=body.min_rel,
+            search_params={"nprobe": body.nprobe} if body.nprobe else None,
+        )
+    except ValueError as e:
+        return JSONResponse(
+            status_code=404,
+            content={"ok": False, "error": str(e)},
+        )
+
+    return BatchSearchResponse(
+        ok=True,
+        index_name=index_name,
+        results=[QueryResult(query=q, contexts=ctx) for q, ctx in zip(body.queries, per_query)],
+    )
@@ -11,20 +11,29 @@ from contextlib import asynccontextmanager
 import logging
 
 from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
+from ask_forge.backend.app.repositories.quantized import QuantizedRepo, QUANTIZATION_MODES
 from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.tracing import setup_tracing, shutdown_tracing
 from ask_forge.backend.app.services.chat_history.chat_history import InMemoryHistoryRepo
 from ask_forge.backend.app.services.llm.adapters.question_generator import QuestionGeneratorAdapter
+from ask_forge.backend.app.services.llm.adapters.managed_qg import ManagedQuestionGenerator
+from ask_forge.backend.app.services.llm.model_manager import ModelManager
 
 from ask_forge.backend.app.services.llm.registry import get_registry, LLMRegistry
-from ask_forge.backend.app.services.llm.router import LLMRouter, prefer_local_for_qg, prefer_gemini_for_chat
+from ask_forge.backend.app.services.llm.router import LLMRouter, latency_aware, prefer_local_for_qg, prefer_gemini_for_chat
 
 from ask_forge.backend.app.services.llm.adapters.gemini import GeminiAdapter
+from ask_forge.backend.app.services.llm.adapters.fake import FakeLLMProvider
 from ask_forge.backend.app.services.llm.adapters.huggingface import HuggingFaceAdapter
 
 from pathlib import Path
 
+from ask_forge.backend.app.services.chat.answer_cache import SemanticAnswerCache
 from ask_forge.backend.app.services.queue.async_queue import AsyncBackgroundQueue
+from ask_forge.backend.app.utils.singleflight import SingleFlight
 from ask_forge.backend.app.services.queue.redis_queue import BackgroundQueueUsingRedis
+from ask_forge.backend.app.services.search.federated import FederatedSearcher
+from ask_forge.backend.app.services.model_server.client import RemoteQuestionGenerator, get_model_server_client
 
 logger = logging.getLogger(__name__)
 
@@ -39,7 +48,7 @@ class AppState:
 
     Attributes:
         chroma_repo: ChromaDB repository instance (singleton)
-        loaded_models: Dictionary chứa các ML models đã load
+        model_manager: Quản lý HF models (lazy load, RAM budget, evict LRU idle)
         active_indexes: Set các index names đang tồn tại
     """
     _instance: Optional["AppState"] = None
@@ -60,7 +69,8 @@ class AppState:
         self._initialized = False          # Chỉ True sau khi startup xong
 
         self.chroma_repo: Optional[ChromaRepo] = None
-        self.loaded_models: Dict[str, Any] = {}
+        self.federated_search: Optional[FederatedSearcher] = None
+        self.model_manager: Optional[ModelManager] = None
         self.active_indexes: set[str] = set()
 
         self.llm_registry: LLMRegistry = get_registry() # Đăng kí một singleton LLMRegistry
@@ -71,8 +81,16 @@ class AppState:
         #     redis_url=settings.REDIS_URL,
         # )
 
+        # Gộp các retrieval / QG job giống hệt nhau đang chạy đồng thời
+        self.singleflight = SingleFlight()
+
+        # Semantic answer cache (FAQ-style traffic bỏ qua Gemini)
+        self.answer_cache: Optional[SemanticAnswerCache] = (
+            SemanticAnswerCache() if settings.ANSWER_CACHE_ENABLED else None
+        )
+
         # Use AsyncIO queue instead of Redis/RQ
-        self.bq = AsyncBackgroundQueue()
+        self.bq = AsyncBackgroundQueue(flight=self.singleflight)
 
         # History repo
         self.history_repo = InMemoryHistoryRepo(
@@ -96,16 +114,23 @@ class AppState:
                 return
 
             logger.info("🚀 Starting up application resources...")
+            setup_tracing()
 
             # 1) Khởi tạo ChromaDB
             try:
-                logger.info("📦 Initializing ChromaDB repository...")
-                self.chroma_repo = ChromaRepo()
+                logger.info("📦 Initializing vector repository (mode=%s)...", settings.VECTOR_INDEX_MODE)
+                if settings.MODEL_SERVER_ENABLED:
+                    # Connect (hoặc spawn) model server trước khi dùng embedding
+                    await asyncio.to_thread(get_model_server_client().ensure_running)
+                self.chroma_repo = self._create_vector_repo()
+                # Load + warmup model embedding dùng chung (ChromaRepo & LangChainState)
+                await asyncio.to_thread(self.chroma_repo.embedding_service.load)
 
                 # Load danh sách các collections hiện có
                 collections = self.chroma_repo.list_collections()
 
                 self.active_indexes = {col.name for col in collections}
+                self.federated_search = FederatedSearcher(self.chroma_repo)
                 logger.info(
                     "✅ ChromaDB ready. Found %d existing indexes: %s",
                     len(self.active_indexes), self.active_indexes
@@ -118,14 +143,22 @@ class AppState:
             # Use
             logger.info("🔌 Registering LLM providers...")
 
+            # Load-test offline: provider giả lập thay cho các provider trong FAKE_LLM_REPLACE
+            faked = set(settings.FAKE_LLM_REPLACE) if settings.FAKE_LLM_ENABLED else set()
+            if settings.FAKE_LLM_ENABLED:
+                for name in ("fake_service", *faked):
+                    self.llm_registry.register(name, FakeLLMProvider(name))
+                logger.warning(f"🧪 Fake LLM provider enabled for: {sorted(faked)}")
+
             # Gemini
-            self.llm_registry.register("gemini_service", GeminiAdapter())
+            if "gemini_service" not in faked:
+                self.llm_registry.register("gemini_service", GeminiAdapter())
 
-            # Question Generator Register
-            if settings.HF_PRELOAD_AT_STARTUP:
-                question_generator_adapter = QuestionGeneratorAdapter(
-                    settings.HF_QUESTION_GENERATOR_CKPT
-                )
+            # Question Generator Register (fake: không load model QG)
+            if "question_generator_service" in faked:
+                logger.info("🧪 Skipping QG model load (fake provider)")
+            elif settings.HF_PRELOAD_AT_STARTUP:
+                question_generator_adapter = self._create_qg_provider()
 
                 await question_generator_adapter._ensure_loaded() # Lệnh kích hoạt load Adapter/Model
                 self.llm_registry.register(
@@ -135,10 +168,11 @@ class AppState:
                 # Lazy: register nhưng chưa load
                 self.llm_registry.register(
                     "question_generator_service",
-                    QuestionGeneratorAdapter(settings.HF_QUESTION_GENERATOR_CKPT)
+                    self._create_qg_provider()
                 )
 
-            # Setup router policies
+            # Setup router policies (latency-aware trước, policy tĩnh làm fallback)
+            self.llm_router.add_policy(latency_aware(settings.LLM_TASK_CANDIDATES, self.llm_registry))
             self.llm_router.add_policy(prefer_gemini_for_chat)
             self.llm_router.add_policy(prefer_local_for_qg)
 
@@ -156,18 +190,61 @@ class AppState:
         # Cleanup ChromaDb nếu cần
         if self.chroma_repo:
             try:
-                # Nếu có handle close/flush, gọi ở đây (ChromaRepo optional)
+                # Dừng micro-batcher thread / model server client; Chroma tự persist xuống disk
+                self.chroma_repo.embedding_service.close()
                 logger.info("📦 ChromaDB persisted to disk")
             finally:
                 self.chroma_repo = None
 
-        if self.loaded_models:
+        if self.federated_search:
+            self.federated_search.shutdown()
+            self.federated_search = None
+
+        if self.bq.qg_cache is not None:
+            self.bq.qg_cache.close()
+
+        gemini = self.llm_registry.get("gemini_service")
+        # Provider thay thế (fake, ...) có thể không có aclose
+        aclose = getattr(gemini, "aclose", None) if gemini is not None else None
+        if aclose is not None:
+            await aclose()
+        self.llm_registry.shutdown()
+
+        if self.model_manager:
             logger.info("🧠 Unloading ML models...")
-            self.loaded_models.clear()
+            self.model_manager.stop()
+            self.model_manager = None
 
+        shutdown_tracing()  # flush span còn trong hàng đợi
         self._initialized = False
         logger.info("✅ All resources cleaned up")
 
+    def _create_qg_provider(self):
+        """QG chạy trong process (qua ModelManager) hoặc trong model server."""
+        if settings.MODEL_SERVER_ENABLED:
+            return RemoteQuestionGenerator()
+        self.model_manager = ModelManager(QuestionGeneratorAdapter)
+        self.model_manager.start()
+        return ManagedQuestionGenerator(self.model_manager)
+
+    def prefetch_qg(self, lang: Optional[str] = None):
+        """Load trước checkpoint QG cho lang (QG job chạy sau khi stream answer xong)."""
+        provider = self.llm_registry.get("question_generator_service")
+        if provider is not None and hasattr(provider, "prefetch"):
+            provider.prefetch(lang)
+
+    def _create_vector_repo(self) -> ChromaRepo:
+        """Chọn backend theo VECTOR_INDEX_MODE (mọi backend đều theo interface của ChromaRepo)."""
+        mode = settings.VECTOR_INDEX_MODE
+        if mode in QUANTIZATION_MODES:
+            return QuantizedRepo(mode=mode)
+        if mode == "ivfpq":
+            from ask_forge.backend.app.repositories.faiss_store import FaissIVFPQRepo
+            return FaissIVFPQRepo()
+        if mode != "float":
+            raise ValueError(f"Unknown VECTOR_INDEX_MODE: {mode}")
+        return ChromaRepo()
+
     def get_chroma_repo(self) -> ChromaRepo:
         """
         Lấy ChromaDB repository instance.
@@ -189,14 +266,22 @@ class AppState:
         self.active_indexes = {c.name for c in cols}
 
     def register_index(self, index_name: str):
-        """Đăng ký index mới vào active set."""
+        """Đăng ký index mới vào active set (nội dung index đổi -> bỏ answer / QG cache của index)."""
         self.active_indexes.add(index_name)
+        self._invalidate_caches(index_name)
         logger.info("📝 Registered index: %s", index_name)
 
     def unregister_index(self, index_name: str):
         self.active_indexes.discard(index_name)
+        self._invalidate_caches(index_name)
         logger.info("🗑️ Unregistered index: %s", index_name)
 
+    def _invalidate_caches(self, index_name: str):
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate(index_name)
+        if self.bq.qg_cache is not None:
+            self.bq.qg_cache.invalidate(index_name)
+
     def index_exists(self, index_name: str) -> bool:
         """Kiểm tra xem index có tồn tại không."""
         return index_name in self.active_indexes
@@ -1,6 +1,6 @@
 # core/config.py
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 from pydantic import AnyHttpUrl, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -28,9 +28,51 @@ class Settings(BaseSettings):
     CHROMA_PERSIST_DIR: str = ".chroma"
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
 
+    EMBEDDING_BACKEND: str = Field(default="torch")  # torch | onnx (ONNX Runtime, CPU)
+    EMBEDDING_DEVICE: str = Field(default="auto")  # auto | cpu | cuda | mps
+    EMBEDDING_NUM_THREADS: int = Field(default=0)  # 0 = mặc định của torch
+    EMBEDDING_BATCH_SIZE: int = Field(default=32)
+    EMBEDDING_ONNX_DIR: str = Field(default=".onnx")
+    EMBEDDING_ONNX_QUANTIZE: bool = Field(default=True)  # dynamic int8
+    EMBEDDING_ONNX_MIN_COSINE: float = Field(default=0.99)  # dưới ngưỡng -> fallback torch
+
+    # Query embedding micro-batching (gom các query đồng thời thành 1 batch)
+    EMBEDDING_MICROBATCH_ENABLED: bool = Field(default=True)
+    EMBEDDING_MICROBATCH_MAX_SIZE: int = Field(default=32)
+    EMBEDDING_MICROBATCH_MAX_WAIT_MS: float = Field(default=5.0)
+
+    # Vector index mode: "float" (Chroma HNSW) | "int8" | "binary" (quantized + rescore) | "ivfpq" (FAISS)
+    VECTOR_INDEX_MODE: str = Field(default="float")
+    QUANTIZED_INDEX_DIR: str = Field(default=".quantized")
+    QUANTIZED_RESCORE_FACTOR: int = Field(default=4)  # shortlist = k * factor
+
+    # Batched retrieval (/search/batch)
+    SEARCH_BATCH_MAX_QUERIES: int = Field(default=256)
+
+    # Federated search (ChatBody.index_names)
+    FEDERATED_MAX_WORKERS: int = Field(default=8)
+    FEDERATED_SHARD_TIMEOUT_S: float = Field(default=2.0)
+    FEDERATED_MAX_INFLIGHT_PER_SHARD: int = Field(default=2)  # query chờ + đang chạy tối đa của 1 shard, quá -> "shed"
+    FEDERATED_CALIBRATION_PRIOR: int = Field(default=50)  # pseudo-count khi shrink về thống kê global
+
+    # FAISS IVF-PQ (VECTOR_INDEX_MODE=ivfpq, cần faiss-cpu)
+    FAISS_INDEX_DIR: str = Field(default=".faiss")
+    FAISS_NLIST: int = Field(default=4096)
+    FAISS_PQ_M: int = Field(default=48)
+    FAISS_NPROBE: int = Field(default=16)
+    FAISS_TRAIN_SAMPLE: int = Field(default=200_000)
+    FAISS_MIN_TRAIN_SIZE: int = Field(default=10_000)  # dưới ngưỡng này: full scan float32
+    # Train lại (nlist lớn hơn) khi số vector > FAISS_RETRAIN_GROWTH * 39 * nlist hiện tại; 0 = tắt
+    FAISS_RETRAIN_GROWTH: float = Field(default=4.0)
+
     # Gemini (đặt required hoặc có default tuỳ bạn)
     GEMINI_API_KEY: str = Field(min_length=1)  # thiếu sẽ raise
     GEMINI_MODEL_NAME: str = Field(default="gemini-2.5-flash")
+    GEMINI_ASYNC: bool = Field(default=True)  # client.aio (False = sync SDK trên executor)
+    GEMINI_HTTP_MAX_CONNECTIONS: int = Field(default=256)
+    GEMINI_HTTP_MAX_KEEPALIVE: int = Field(default=64)
+    GEMINI_HTTP_KEEPALIVE_EXPIRY_S: float = Field(default=60.0)
+    GEMINI_HTTP_TIMEOUT_S: float = Field(default=120.0)
 
     # HF
     HF_QUESTION_GENERATOR_CKPT: str = Field(default="Qwen/qwen-security-final-question-reformatted")
@@ -42,6 +84,96 @@ class Settings(BaseSettings):
     HF_TRUST_REMOTE_CODE: bool = Field(default=False)
     HF_PRELOAD_AT_STARTUP: bool = Field(default=True)
 
+    # Model manager (lazy load + evict LRU idle trong RAM budget)
+    QG_CHECKPOINTS: Dict[str, str] = Field(default_factory=dict)  # lang -> checkpoint, JSON trong env
+    MODEL_RAM_BUDGET_MB: int = Field(default=0)  # 0 = không giới hạn
+    MODEL_IDLE_TTL_S: float = Field(default=1800.0)  # 0 = không unload khi idle
+    MODEL_DEFAULT_ESTIMATE_MB: int = Field(default=2048)  # footprint giả định khi chưa load lần nào
+
+    # Question generator serving (CPU mode khi HF_DEVICE_MAP=cpu hoặc không có CUDA)
+    QG_CPU_QUANTIZE: bool = Field(default=False)  # dynamic int8 cho nn.Linear
+    QG_NUM_THREADS: int = Field(default=0)  # intra-op threads của QG worker, 0 = mặc định torch
+    QG_INTEROP_THREADS: int = Field(default=1)
+    QG_EXECUTOR_WORKERS: int = Field(default=1)
+    QG_WARMUP: bool = Field(default=True)
+    QG_WARMUP_TOKENS: int = Field(default=4)
+    QG_PROMPT_PREFIX_FILE: str = Field(default="")  # instruction prefix tĩnh đặt trước seed question
+    QG_PREFIX_KV_CACHE: bool = Field(default=True)  # cache past_key_values của prefix
+    QG_DRAFT_CKPT: str = Field(default="")  # draft model nhỏ (cùng tokenizer) cho speculative decoding
+    QG_DRAFT_TOKENS: int = Field(default=5)  # số token draft đề xuất mỗi bước (khởi điểm)
+
+    # Cache kết quả QG (seed question + context chunk ids + lang + checkpoint)
+    QG_CACHE_ENABLED: bool = Field(default=True)
+    QG_CACHE_MAX_ENTRIES: int = Field(default=4096)
+    QG_CACHE_TTL_S: float = Field(default=86400.0)  # 0 = không hết hạn
+    QG_CACHE_SQLITE_PATH: str = Field(default="")  # vd. ".cache/qg_cache.sqlite3", rỗng = chỉ RAM
+
+    # Semantic answer cache (câu hỏi gần giống + cùng contexts -> replay answer, không gọi Gemini)
+    ANSWER_CACHE_ENABLED: bool = Field(default=False)
+    ANSWER_CACHE_THRESHOLD: float = Field(default=0.95)  # cosine tối thiểu giữa 2 câu hỏi
+    ANSWER_CACHE_MAX_ENTRIES: int = Field(default=1024)  # mỗi index (scope)
+    ANSWER_CACHE_TTL_S: float = Field(default=3600.0)  # 0 = không hết hạn
+
+    # Out-of-process model server (QG + embedding chạy trong process riêng, qua Unix socket)
+    MODEL_SERVER_ENABLED: bool = Field(default=False)
+    MODEL_SERVER_SOCKET: str = Field(default="/tmp/askforge-models.sock")
+    MODEL_SERVER_SPAWN: bool = Field(default=True)  # tự spawn nếu chưa có server
+    MODEL_SERVER_START_TIMEOUT_S: float = Field(default=30.0)
+    MODEL_SERVER_REQUEST_TIMEOUT_S: float = Field(default=120.0)
+    MODEL_SERVER_IDLE_EXIT_S: float = Field(default=30.0)  # server tự spawn thoát khi không còn worker nào connect
+    MODEL_SERVER_MAX_BATCH: int = Field(default=8)  # số prompt QG tối đa mỗi batch
+    MODEL_SERVER_BATCH_WAIT_MS: float = Field(default=10.0)
+
+    # Latency-aware LLM routing (rolling stats mỗi provider)
+    LLM_TASK_CANDIDATES: Dict[str, List[str]] = Field(
+        default_factory=lambda: {"chat": ["gemini_service"]}
+    )  # task -> providers có thể phục vụ, JSON trong env
+    LLM_STATS_WINDOW: int = Field(default=200)  # số request gần nhất giữ lại mỗi provider
+    LLM_STATS_MIN_SAMPLES: int = Field(default=5)  # ít hơn -> provider được thử để lấy số liệu
+    LLM_EXPLORE_MAX_INFLIGHT: int = Field(default=2)  # request thử đồng thời tối đa cho provider chưa đủ số liệu
+    LLM_LOW_LATENCY_TTFT_S: float = Field(default=1.5)  # target TTFT khi latency_requirement="low"
+    LLM_MAX_ERROR_RATE: float = Field(default=0.5)
+    LLM_INFLIGHT_PENALTY: float = Field(default=0.05)  # expected TTFT *= 1 + penalty * in_flight
+    LLM_HEDGE_DELAY_S: float = Field(default=2.0)  # chưa có token đầu sau X giây -> start provider thứ 2, 0 = tắt
+    LLM_FIRST_TOKEN_TIMEOUT_S: float = Field(default=20.0)  # deadline cho token đầu tiên
+    LLM_BREAKER_FAILURES: int = Field(default=5)  # số lỗi liên tiếp để open circuit
+    LLM_BREAKER_RESET_S: float = Field(default=30.0)  # thời gian open trước khi cho 1 request thử
+
+    # Governor mỗi provider (executor riêng + giới hạn concurrency + hàng chờ có giới hạn)
+    LLM_MAX_CONCURRENCY: int = Field(default=16)
+    LLM_MAX_QUEUE: int = Field(default=64)  # hàng chờ đầy -> 429
+    LLM_QUEUE_TIMEOUT_S: float = Field(default=10.0)  # chờ slot quá lâu -> 503
+    LLM_EXECUTOR_WORKERS: int = Field(default=16)
+    LLM_PROVIDER_LIMITS: Dict[str, Dict[str, float]] = Field(
+        default_factory=lambda: {
+            "question_generator_service": {"max_concurrency": 4, "max_queue": 256, "queue_timeout_s": 600},
+            # async client: concurrency không tốn thread, giới hạn theo connection pool
+            "gemini_service": {"max_concurrency": 256, "max_queue": 1024},
+        }
+    )  # override theo provider, JSON trong env
+
+    # Fake LLM provider (load-test offline, không gọi Gemini / không load model QG)
+    FAKE_LLM_ENABLED: bool = Field(default=False)
+    FAKE_LLM_REPLACE: List[str] = Field(
+        default_factory=lambda: ["gemini_service", "question_generator_service"]
+    )  # provider bị thay bằng fake; luôn register thêm "fake_service"
+    FAKE_LLM_TTFT_MS: float = Field(default=300.0)
+    FAKE_LLM_ITL_MS: float = Field(default=20.0)  # inter-token latency
+    FAKE_LLM_OUTPUT_TOKENS: int = Field(default=200)
+    FAKE_LLM_ERROR_RATE: float = Field(default=0.0)
+    FAKE_LLM_JITTER: float = Field(default=0.0)  # ±tỉ lệ ngẫu nhiên (seeded) quanh TTFT / ITL
+    FAKE_LLM_SEED: int = Field(default=0)
+
+    # Token accounting: ước lượng token khi provider không trả usage metadata
+    TOKEN_COUNT_TOKENIZER: str = Field(default="")  # HF tokenizer (repo / path); rỗng = ~4 ký tự / token
+
+    # Tracing in-process (core/tracing.py): span ghi ra file local
+    TRACING_ENABLED: bool = Field(default=False)
+    TRACING_EXPORTER: str = Field(default="jsonl")  # jsonl | otlp_json (OTLP/JSON, format file exporter của OTel Collector)
+    TRACING_PATH: str = Field(default=".traces/spans.jsonl")
+    TRACING_SAMPLE_RATE: float = Field(default=1.0)  # tỉ lệ trace được ghi (quyết định ở root span)
+    TRACING_SERVICE_NAME: str = Field(default="askforge")
+
     REDIS_URL: str = Field(default="redis://localhost:6379")
     # >>> Pydantic v2 config
     model_config = SettingsConfigDict(
@@ -1,6 +1,7 @@
 """
 LangChain-powered application state with LCEL (LangChain Expression Language)
 """
+import asyncio
 from functools import lru_cache
 from typing import Optional, Dict, Any
 import logging
@@ -8,7 +9,7 @@ from pathlib import Path
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings, HuggingFacePipeline
+from langchain_huggingface import HuggingFacePipeline
 from langchain.memory import ConversationBufferWindowMemory
 from langchain.chains import ConversationalRetrievalChain
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
@@ -18,8 +19,10 @@ from langchain_core.runnables import RunnablePassthrough, RunnableParallel
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.embeddings import Embeddings
 
 from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.embedding.service import get_embedding_service
 
 logger = logging.getLogger(__name__)
 
@@ -46,7 +49,7 @@ class LangChainState:
             return
 
         # Core components
-        self.embeddings: Optional[HuggingFaceEmbeddings] = None
+        self.embeddings: Optional[Embeddings] = None
         self.gemini_llm: Optional[ChatGoogleGenerativeAI] = None
         self.hf_llm: Optional[HuggingFacePipeline] = None
 
@@ -66,13 +69,11 @@ class LangChainState:
         """Initialize core LangChain components"""
         logger.info("🚀 Starting LangChain components...")
 
-        # 1. Initialize embeddings
-        self.embeddings = HuggingFaceEmbeddings(
-            model_name=settings.EMBEDDING_MODEL,
-            model_kwargs={'device': 'cuda' if settings.HF_DEVICE_MAP == 'cuda' else 'cpu'},
-            encode_kwargs={'normalize_embeddings': True},
-        )
-        logger.info("✅ Embeddings loaded: %s", settings.EMBEDDING_MODEL)
+        # 1. Initialize embeddings (dùng chung model với ChromaRepo)
+        embedding_service = get_embedding_service()
+        await asyncio.to_thread(embedding_service.load)
+        self.embeddings = embedding_service.as_langchain()
+        logger.info("✅ Embeddings ready: %s", settings.EMBEDDING_MODEL)
 
         # 2. Initialize Gemini LLM
         self.gemini_llm = ChatGoogleGenerativeAI(
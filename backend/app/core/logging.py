@@ -8,10 +8,11 @@ request_id_var: ContextVar[str] = ContextVar("requests_id", default="")
 
 class RequestIDFilter(logging.Filter):
     def filter(self, record):
-        record.request_id = request_id_var.get()
+        # Ngoài request (startup, thread nền không bind context) -> "-"
+        record.request_id = request_id_var.get() or "-"
         return True
-# TODO: Thêm vào formatter:
-# "%(asctime)s | %(request_id)s | %(levelname)s | %(name)s | %(message)s"
+
+LOG_FORMAT = "%(asctime)s | %(request_id)s | %(levelname)s | %(name)s | %(message)s"
 
 def setup_logging(level: int = logging.INFO) -> None:
     """
@@ -36,20 +37,19 @@ def setup_logging(level: int = logging.INFO) -> None:
             message = super().format(record)
             return f"{color}{message}{self.RESET}"
 
-    formatter = ColorFormatter(
-        "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
-        datefmt="%H:%M:%S"
-    )
+    formatter = ColorFormatter(LOG_FORMAT, datefmt="%H:%M:%S")
 
     handler = logging.StreamHandler(sys.stdout)
     handler.setFormatter(formatter)
+    handler.addFilter(RequestIDFilter())
 
     # ---- Cấu hình dictConfig để đồng bộ với Uvicorn ----
     logging_config = {
         "version": 1,
         "disable_existing_loggers": False,
-        "formatters": {"default": {"format": "%(asctime)s | %(levelname)s | %(name)s | %(message)s"}},
-        "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "default"}},
+        "filters": {"request_id": {"()": RequestIDFilter}},
+        "formatters": {"default": {"format": LOG_FORMAT}},
+        "handlers": {"console": {"class": "logging.StreamHandler", "formatter": "default", "filters": ["request_id"]}},
         "loggers": {
             "": {"handlers": ["console"], "level": level},
             "uvicorn": {"handlers": ["console"], "level": level, "propagate": False},
@@ -0,0 +1,153 @@
+"""
+Prometheus metrics dùng chung (default registry -> tự xuất hiện ở /metrics).
+"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# ---- Embedding micro-batching ----
+EMBEDDING_BATCH_SIZE = Histogram(
+    "askforge_embedding_batch_size",
+    "Number of texts encoded per micro-batch",
+    ["batcher"],
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+EMBEDDING_QUEUE_WAIT = Histogram(
+    "askforge_embedding_queue_wait_seconds",
+    "Time a request waited in the micro-batch queue before encoding",
+    ["batcher"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+EMBEDDING_BATCH_SECONDS = Histogram(
+    "askforge_embedding_batch_seconds",
+    "Wall time of one micro-batch encode call",
+    ["batcher"],
+)
+
+# ---- Question generation ----
+QG_TOKENS_PER_SECOND = Histogram(
+    "askforge_qg_tokens_per_second",
+    "Decode throughput of one QG generate call",
+    ["mode"],
+    buckets=(1, 2, 5, 10, 20, 40, 80, 160),
+)
+QG_DRAFT_ACCEPTANCE = Histogram(
+    "askforge_qg_draft_acceptance_rate",
+    "Fraction of draft-model tokens accepted per assisted QG request",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+QG_CACHE_REQUESTS = Counter(
+    "askforge_qg_cache_requests_total",
+    "QG result cache lookups",
+    ["result"],
+)
+
+# ---- Single-flight ----
+SINGLEFLIGHT_CALLS = Counter(
+    "askforge_singleflight_calls_total",
+    "Calls through single-flight: leader runs the work, shared joins an in-flight call",
+    ["group", "role"],
+)
+
+# ---- Chat ----
+ANSWER_CACHE_REQUESTS = Counter(
+    "askforge_answer_cache_requests_total",
+    "Semantic answer cache lookups",
+    ["result"],
+)
+
+# ---- LLM providers (rolling window, xem services/llm/stats.py) ----
+LLM_PROVIDER_TTFT = Gauge(
+    "askforge_llm_provider_ttft_seconds",
+    "Rolling time-to-first-token quantile per provider",
+    ["provider", "quantile"],
+)
+LLM_PROVIDER_TOKENS_PER_SECOND = Gauge(
+    "askforge_llm_provider_tokens_per_second",
+    "Rolling mean decode throughput per provider (estimated tokens)",
+    ["provider"],
+)
+LLM_PROVIDER_ERROR_RATE = Gauge(
+    "askforge_llm_provider_error_rate",
+    "Rolling error rate per provider",
+    ["provider"],
+)
+LLM_PROVIDER_INFLIGHT = Gauge(
+    "askforge_llm_provider_in_flight",
+    "Requests currently running per provider",
+    ["provider"],
+)
+LLM_PROVIDER_CIRCUIT_OPEN = Gauge(
+    "askforge_llm_provider_circuit_open",
+    "1 while the provider's circuit breaker is open",
+    ["provider"],
+)
+LLM_HEDGES = Counter(
+    "askforge_llm_hedged_streams_total",
+    "Streams where a hedge provider was started, by which provider won",
+    ["winner"],
+)
+LLM_QUEUE_SECONDS = Histogram(
+    "askforge_llm_queue_seconds",
+    "Time a call waited for a provider concurrency slot",
+    ["provider"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LLM_QUEUE_DEPTH = Gauge(
+    "askforge_llm_queue_depth",
+    "Calls waiting for a provider concurrency slot",
+    ["provider"],
+)
+LLM_SHED = Counter(
+    "askforge_llm_shed_total",
+    "Calls rejected by a provider governor (429 queue full, 503 queue timeout)",
+    ["provider", "status"],
+)
+FEDERATED_SHARD_SHED = Counter(
+    "askforge_federated_shard_shed_total",
+    "Federated shard queries skipped because earlier queries to the shard are still in flight",
+    ["index"],
+)
+
+# ---- Chat pipeline stages (chat_stream_sse, xem services/chat/stages.py) ----
+CHAT_STAGE_SECONDS = Histogram(
+    "askforge_chat_stage_seconds",
+    "Time spent in each stage of a streamed chat request",
+    ["stage", "index", "provider"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+CHAT_INTER_TOKEN_SECONDS = Histogram(
+    "askforge_chat_inter_token_seconds",
+    "Gap between consecutive streamed answer chunks",
+    ["index", "provider"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+CHAT_PROMPT_CHARS = Histogram(
+    "askforge_chat_prompt_chars",
+    "Size of the rendered chat prompt in characters",
+    ["index"],
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+)
+CHAT_CONTEXTS = Histogram(
+    "askforge_chat_contexts",
+    "Contexts retrieved per chat request",
+    ["index"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+QG_JOB_SECONDS = Histogram(
+    "askforge_qg_job_seconds",
+    "QG job time from enqueue to completion",
+    ["index", "provider", "status"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+
+# ---- Token accounting (services/llm/usage.py) ----
+LLM_TOKENS = Counter(
+    "askforge_llm_tokens_total",
+    "Tokens sent to (prompt) and generated by (completion) LLM providers",
+    ["provider", "index", "direction", "source"],
+)
+LLM_PROMPT_TOKENS = Histogram(
+    "askforge_llm_prompt_tokens",
+    "Prompt size per provider call in tokens",
+    ["provider"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
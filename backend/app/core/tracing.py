@@ -0,0 +1,261 @@
+"""
+Tracing in-process, nhẹ: span lồng nhau theo contextvars, export ra file local.
+
+- span(name, **attrs): context manager, span mới thành span hiện tại (con của span
+  đang mở). Dùng cho hàm thường / coroutine.
+- start_span(name, parent=...): span không đổi context, tự gọi .end() -> dùng trong
+  async generator (mỗi __anext__ có thể chạy ở context khác nhau, set/reset contextvar
+  trong đó không an toàn).
+- Context (request_id_var + span hiện tại) tự đi theo asyncio.to_thread / create_task;
+  executor thường (run_in_executor, ThreadPoolExecutor.submit) cần bọc qua bind_context.
+- Exporter chạy trên thread riêng (không chặn event loop), ghi theo batch:
+    jsonl      - mỗi dòng 1 span phẳng (trace_id, span_id, parent_id, name, thời gian, attributes)
+    otlp_json  - mỗi dòng 1 ExportTraceServiceRequest theo OTLP/JSON (format của file
+                 exporter OpenTelemetry Collector) -> đọc được bằng tool của OTel.
+
+Bật bằng TRACING_ENABLED; tắt thì span là no-op.
+"""
+import contextvars
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.logging import request_id_var
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str] = None
+    sampled: bool = True
+    start_ns: int = field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def record_error(self, exc: BaseException):
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.sampled and _exporter is not None:
+            _exporter.export(self)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else None
+
+
+class _NoopSpan:
+    trace_id = span_id = parent_id = None
+    sampled = False
+    attributes: Dict[str, Any] = {}
+
+    def set(self, **attributes):
+        return self
+
+    def record_error(self, exc: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes) -> Span:
+    """Tạo span (không đổi span hiện tại); parent mặc định = span hiện tại."""
+    if _exporter is None:
+        return NOOP_SPAN
+    parent = parent if parent is not None else _current_span.get()
+    if isinstance(parent, Span):
+        s = Span(name, parent.trace_id, f"{random.getrandbits(64):016x}", parent.span_id, parent.sampled)
+    else:
+        # Root span: quyết định sample cho cả trace
+        sampled = settings.TRACING_SAMPLE_RATE >= 1.0 or random.random() < settings.TRACING_SAMPLE_RATE
+        s = Span(name, f"{random.getrandbits(128):032x}", f"{random.getrandbits(64):016x}", sampled=sampled)
+        request_id = request_id_var.get()
+        if request_id:
+            s.attributes["request.id"] = request_id
+    s.attributes.update(attributes)
+    return s
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Span hiện tại trong khối with; exception được ghi vào span rồi raise tiếp."""
+    s = start_span(name, **attributes)
+    if s is NOOP_SPAN:
+        yield s
+        return
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.record_error(e)
+        raise
+    finally:
+        s.end()
+        try:
+            _current_span.reset(token)
+        except ValueError:  # khối with trải qua nhiều context (vd. async generator)
+            _current_span.set(None if token.old_value is contextvars.Token.MISSING else token.old_value)
+
+
+def bind_context(fn: Callable, *args, **kwargs) -> Callable[[], Any]:
+    """Chụp context hiện tại (request_id, span) để chạy fn trong thread của executor."""
+    ctx = contextvars.copy_context()
+    return lambda: ctx.run(fn, *args, **kwargs)
+
+
+# ------------------------------------------------------------
+# Exporters
+# ------------------------------------------------------------
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON: int64 dạng string
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_jsonl(span: Span) -> Dict[str, Any]:
+    return {
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "parent_id": span.parent_id,
+        "name": span.name,
+        "start_ns": span.start_ns,
+        "end_ns": span.end_ns,
+        "duration_ms": round(span.duration_ms, 3),
+        "attributes": span.attributes,
+        "status": "error" if span.error else "ok",
+        "error": span.error,
+    }
+
+
+def _to_otlp(span: Span) -> Dict[str, Any]:
+    out = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+    if span.parent_id:
+        out["parentSpanId"] = span.parent_id
+    return out
+
+
+class SpanExporter:
+    """Hàng đợi + thread ghi file theo batch (tối đa batch_size span hoặc flush_interval_s)."""
+
+    def __init__(self, path: str, fmt: str = "jsonl", service_name: str = "askforge",
+                 batch_size: int = 256, flush_interval_s: float = 1.0):
+        if fmt not in ("jsonl", "otlp_json"):
+            raise ValueError(f"Unsupported TRACING_EXPORTER: {fmt}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        self._queue.put(span)
+
+    def _lines(self, batch: List[Span]) -> List[str]:
+        if self.fmt == "jsonl":
+            return [json.dumps(_to_jsonl(s), ensure_ascii=False, default=str) for s in batch]
+        request = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+            "scopeSpans": [{"scope": {"name": "askforge.tracing"}, "spans": [_to_otlp(s) for s in batch]}],
+        }]}
+        return [json.dumps(request, ensure_ascii=False, default=str)]
+
+    def _write(self, batch: List[Span]):
+        if not batch:
+            return
+        try:
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write("\n".join(self._lines(batch)) + "\n")
+        except Exception as e:
+            logger.warning(f"⚠️ Span export failed ({len(batch)} spans dropped): {e}")
+
+    def _run(self):
+        batch: List[Span] = []
+        deadline = time.monotonic() + self.flush_interval_s
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = ...
+            if item is None:  # shutdown
+                self._write(batch)
+                return
+            if item is not ...:
+                batch.append(item)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval_s
+
+    def shutdown(self, timeout: float = 5.0):
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def setup_tracing() -> Optional[SpanExporter]:
+    """Gọi lúc startup; TRACING_ENABLED=False -> mọi span là no-op."""
+    global _exporter
+    if not settings.TRACING_ENABLED or _exporter is not None:
+        return _exporter
+    _exporter = SpanExporter(
+        settings.TRACING_PATH,
+        fmt=settings.TRACING_EXPORTER,
+        service_name=settings.TRACING_SERVICE_NAME,
+    )
+    logger.info(f"🔭 Tracing enabled: {settings.TRACING_EXPORTER} -> {settings.TRACING_PATH}")
+    return _exporter
+
+
+def shutdown_tracing():
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
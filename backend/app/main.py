@@ -1,5 +1,6 @@
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 import time, uuid, logging
 from prometheus_fastapi_instrumentator import Instrumentator
 
@@ -8,7 +9,11 @@ from ask_forge.backend.app.core.logging import setup_logging
 from ask_forge.backend.app.core.app_state import lifespan_manager
 from ask_forge.backend.app.api.routes.index_routes import router as index_router
 from ask_forge.backend.app.api.routes.chat_routes import router as chat_router
+from ask_forge.backend.app.api.routes.search_routes import router as search_router
+from ask_forge.backend.app.api.routes.model_routes import router as model_router
 from ask_forge.backend.app.core.logging import request_id_var
+from ask_forge.backend.app.core.tracing import span
+from ask_forge.backend.app.services.llm.governor import ProviderOverloaded
 
 # 0) Logging
 setup_logging()
@@ -42,10 +47,21 @@ app.add_middleware(
 API_PREFIX = getattr(settings, "APP_PREFIX", "/api")
 app.include_router(index_router, prefix=API_PREFIX)
 app.include_router(chat_router,  prefix=API_PREFIX)
+app.include_router(search_router, prefix=API_PREFIX)
+app.include_router(model_router, prefix=API_PREFIX)
 
 # 5) /metrics (Prometheus)
 Instrumentator().instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
 
+# 6) LLM provider quá tải -> 429 / 503 + Retry-After
+@app.exception_handler(ProviderOverloaded)
+async def provider_overloaded_handler(request: Request, exc: ProviderOverloaded):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"ok": False, "error": str(exc)},
+        headers={"Retry-After": str(int(exc.retry_after) or 1)},
+    )
+
 @app.get("/")
 async def hello():
     return {"message": "Welcome to Ask Forge!"}
@@ -55,8 +71,13 @@ async def add_request_id(request: Request, call_next):
     req_id = request.headers.get("X-Request-ID", str(uuid.uuid4()))
     token = request_id_var.set(req_id)
     try:
-        resp = await call_next(request)
+        # Root span của request (SSE: chỉ tới lúc gửi headers, phần stream nằm ở span chat.stream)
+        with span("http.request", method=request.method, path=request.url.path) as s:
+            resp = await call_next(request)
+            s.set(status_code=resp.status_code)
         resp.headers["X-Request-ID"] = req_id
+        if s.trace_id:
+            resp.headers["X-Trace-ID"] = s.trace_id
         return resp
     finally:
         request_id_var.reset(token)
\ No newline at end of file
@@ -0,0 +1,182 @@
+"""
+IVF-PQ approximate index (FAISS, CPU) cho các collection rất lớn.
+
+- Train coarse quantizer + PQ trên một sample khi index đủ lớn; trước đó search
+  bằng full scan trên float32 (memmap).
+- upsert thêm/ghi đè vector tăng dần (remove_ids + add_with_ids, direct map dạng
+  hashtable để remove_ids không phải quét mọi inverted list), không rebuild.
+- Index train khi còn nhỏ (nlist thấp) được train lại khi dữ liệu vượt
+  FAISS_RETRAIN_GROWTH * 39 * nlist.
+- nprobe chỉnh được theo từng query qua search_params={"nprobe": ...}.
+
+faiss là optional dependency: `pip install faiss-cpu`.
+"""
+import logging
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.repositories.local_store import LocalVectorIndex, LocalVectorRepo
+
+logger = logging.getLogger(__name__)
+
+# FAISS khuyến nghị ít nhất ~39 điểm train cho mỗi centroid
+_MIN_POINTS_PER_CENTROID = 39
+_PQ_NBITS = 8
+
+try:
+    import faiss
+except ImportError:  # pragma: no cover - optional dependency
+    faiss = None
+
+
+def _pq_subquantizers(dim: int, wanted: int) -> int:
+    """PQ yêu cầu dim chia hết cho M: lấy ước lớn nhất <= wanted."""
+    for m in range(min(wanted, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _ensure_direct_map(index):
+    """Direct map hashtable (id -> list, offset): remove_ids/update không quét toàn bộ inverted lists."""
+    if index.direct_map.type == faiss.DirectMap.NoMap:
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+class FaissIVFPQIndex(LocalVectorIndex):
+    """
+    Files riêng:
+        ivfpq.faiss : FAISS IndexIVFPQ (inner product trên vector đã normalize)
+    """
+
+    kind = "ivfpq"
+
+    def __init__(self, path: Path):
+        if faiss is None:
+            raise RuntimeError("VECTOR_INDEX_MODE=ivfpq requires faiss (pip install faiss-cpu)")
+        self._index = None
+        super().__init__(path)
+
+    @property
+    def _index_file(self) -> Path:
+        return self.path / "ivfpq.faiss"
+
+    @property
+    def is_trained(self) -> bool:
+        return self._index is not None
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _load_index(self):
+        if self._index_file.exists():
+            self._index = faiss.read_index(str(self._index_file))
+            _ensure_direct_map(self._index)  # file cũ lưu trước khi có direct map
+
+    def _save_index(self):
+        if self._index is not None:
+            faiss.write_index(self._index, str(self._index_file))
+
+    # ------------------------------------------------------------
+    # Training
+    # ------------------------------------------------------------
+    def train(self, sample_size: Optional[int] = None, seed: int = 0):
+        """Train IVF-PQ trên sample các vector đã lưu rồi add toàn bộ vào index."""
+        n = self.count()
+        sample_size = min(n, sample_size or settings.FAISS_TRAIN_SAMPLE)
+        nlist = max(1, min(settings.FAISS_NLIST, sample_size // _MIN_POINTS_PER_CENTROID))
+        m = _pq_subquantizers(self.dim, settings.FAISS_PQ_M)
+
+        rng = np.random.default_rng(seed)
+        rows = np.sort(rng.choice(n, size=sample_size, replace=False))
+        sample = np.ascontiguousarray(self._vectors[rows], dtype=np.float32)
+
+        logger.info(
+            "🧮 Training IVF-PQ (nlist=%d, M=%d, sample=%d/%d) at %s",
+            nlist, m, sample_size, n, self.path,
+        )
+        quantizer = faiss.IndexFlatIP(self.dim)
+        index = faiss.IndexIVFPQ(quantizer, self.dim, nlist, m, _PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        index.train(sample)
+        _ensure_direct_map(index)
+
+        # Add theo chunk để không load toàn bộ memmap vào RAM
+        step = 65536
+        for i in range(0, n, step):
+            j = min(i + step, n)
+            index.add_with_ids(
+                np.ascontiguousarray(self._vectors[i:j], dtype=np.float32),
+                np.arange(i, j, dtype=np.int64),
+            )
+        self._index = index
+        self._save_index()
+        logger.info("✅ IVF-PQ trained: %d vectors indexed", index.ntotal)
+
+    def _min_train_size(self) -> int:
+        # PQ 8-bit cần >= 256 điểm cho mỗi codebook
+        return max(settings.FAISS_MIN_TRAIN_SIZE, 2 ** _PQ_NBITS)
+
+    # ------------------------------------------------------------
+    # Backend hooks
+    # ------------------------------------------------------------
+    def _needs_retrain(self) -> bool:
+        """nlist lúc train bị giới hạn bởi số vector khi đó: dữ liệu tăng đủ nhiều -> train lại."""
+        growth = settings.FAISS_RETRAIN_GROWTH
+        nlist = self._index.nlist
+        return (growth > 0 and nlist < settings.FAISS_NLIST
+                and self.count() > growth * _MIN_POINTS_PER_CENTROID * nlist)
+
+    def _index_rows(self, updated_rows, updated_vectors, new_rows, new_vectors):
+        if self._index is None or self._needs_retrain():
+            # train() add toàn bộ vectors hiện có (kể cả batch này)
+            if self.count() >= self._min_train_size():
+                self.train()
+            return
+        if len(updated_rows):
+            self._index.remove_ids(updated_rows)
+            self._index.add_with_ids(np.ascontiguousarray(updated_vectors, dtype=np.float32), updated_rows)
+        if len(new_rows):
+            self._index.add_with_ids(np.ascontiguousarray(new_vectors, dtype=np.float32), new_rows)
+
+    def _candidates(self, query: np.ndarray, n: int, nprobe: Optional[int] = None, **search_params) -> np.ndarray:
+        if self._index is None:
+            # Chưa đủ dữ liệu để train: full scan float32
+            scores = self.exact_scores(query)
+            if n >= len(scores):
+                return np.arange(len(scores))
+            return np.argpartition(-scores, n - 1)[:n]
+
+        # SearchParametersIVF: nprobe per-query, thread-safe (không sửa index.nprobe)
+        params = faiss.SearchParametersIVF(nprobe=int(nprobe or settings.FAISS_NPROBE))
+        _, labels = self._index.search(query[None, :].astype(np.float32), n, params=params)
+        labels = labels[0]
+        return labels[labels >= 0]
+
+    def resident_bytes(self) -> int:
+        if self._index is None:
+            return 0
+        ivf = self._index
+        # codes + ids trong inverted lists + coarse centroids + PQ codebooks
+        pq_bytes = ivf.pq.M * ivf.pq.ksub * ivf.pq.dsub * 4
+        return int(ivf.ntotal * (ivf.code_size + 8) + ivf.nlist * self.dim * 4 + pq_bytes)
+
+
+class FaissIVFPQRepo(LocalVectorRepo):
+    """Repository dùng FAISS IVF-PQ thay cho Chroma HNSW (VECTOR_INDEX_MODE=ivfpq)."""
+
+    def __init__(self):
+        if faiss is None:
+            raise RuntimeError("VECTOR_INDEX_MODE=ivfpq requires faiss (pip install faiss-cpu)")
+        super().__init__(settings.FAISS_INDEX_DIR)
+
+    def _open_index(self, path: Path) -> FaissIVFPQIndex:
+        return FaissIVFPQIndex(path)
+
+    def retrain(self, index_name: str, sample_size: Optional[int] = None):
+        """Train lại IVF-PQ (ví dụ sau khi dữ liệu tăng nhiều so với lúc train)."""
+        index = self.get_collection(index_name)
+        with index.lock.write():
+            index.train(sample_size=sample_size)
@@ -0,0 +1,660 @@
+"""
+Local (non-Chroma) vector index backends.
+
+Mỗi index là một thư mục chứa:
+    vectors.f32       : float32 vectors đã normalize (row-major), mở bằng np.memmap
+    records.sqlite3   : meta (kind, dim) + records(row, id, document, metadata) theo row
+    + các file riêng của từng backend (codes, faiss index, ...)
+
+Records (id / document / metadata) nằm trên disk, chỉ đọc các row cần trả về:
+upsert mỗi batch chỉ ghi các row của batch, RAM không tăng theo số chunk.
+Index cũ lưu records.json được chuyển sang SQLite ở lần mở đầu tiên.
+
+Backend chỉ cần cung cấp bước candidate scan; rescore chính xác bằng float32
+trên disk được dùng chung.
+"""
+import json
+import logging
+import shutil
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
+from ask_forge.backend.app.services.embedding.service import get_embedding_service
+
+logger = logging.getLogger(__name__)
+
+# Số dòng xử lý mỗi lần khi scan, giới hạn bộ nhớ tạm
+SCAN_CHUNK = 65536
+RECORDS_FILE = "records.sqlite3"
+_LEGACY_RECORDS_FILE = "records.json"
+# Page cache SQLite cho records (KiB) - phần records chiếm trong RAM
+RECORDS_CACHE_KIB = 8192
+# Giới hạn số tham số trong 1 câu lệnh SQLite
+_SQL_BATCH = 500
+
+
+def has_records(path: Path) -> bool:
+    return (path / RECORDS_FILE).exists() or (path / _LEGACY_RECORDS_FILE).exists()
+
+
+class _ReadWriteLock:
+    """Nhiều search song song, upsert độc quyền (memmap / cấu trúc backend bị ghi lại)."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writing = False
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            while self._writing:
+                self._cond.wait()
+            self._writing = True  # chặn reader mới trong lúc chờ reader cũ xong
+            while self._readers:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writing = False
+                self._cond.notify_all()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+_WHERE_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def compile_where(where: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """
+    Filter metadata kiểu Chroma -> điều kiện SQL trên cột metadata (JSON).
+
+    Hỗ trợ {"field": value}, {"field": {"$eq" | "$ne" | "$gt" | "$gte" | "$lt" | "$lte": v}},
+    {"field": {"$in" | "$nin": [...]}}, {"$and": [...]}, {"$or": [...]}.
+    Toán tử khác -> ValueError.
+    """
+    if not where:
+        return "1", []
+    if not isinstance(where, dict):
+        raise ValueError(f"Invalid where filter: {where!r}")
+    clauses, params = [], []
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            if not isinstance(cond, list) or not cond:
+                raise ValueError(f"'{key}' expects a non-empty list of filters")
+            parts = [compile_where(c) for c in cond]
+            clauses.append("(" + f" {key[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params += [p for _, ps in parts for p in ps]
+            continue
+        if key.startswith("$") or '"' in key:
+            raise ValueError(f"Unsupported where key: {key!r}")
+        field = f'json_extract(metadata, \'$."{key}"\')'
+        if not isinstance(cond, dict):
+            cond = {"$eq": cond}
+        for op, value in cond.items():
+            if op in _WHERE_OPS:
+                clauses.append(f"{field} {_WHERE_OPS[op]} ?")
+                params.append(value)
+            elif op in ("$in", "$nin"):
+                if not isinstance(value, list) or not value:
+                    raise ValueError(f"'{op}' expects a non-empty list")
+                neg = "NOT " if op == "$nin" else ""
+                clauses.append(f"{field} {neg}IN ({','.join('?' * len(value))})")
+                params += value
+            else:
+                raise ValueError(f"Unsupported where operator: {op!r}")
+    return "(" + " AND ".join(clauses) + ")", params
+
+
+def compile_where_document(where_document: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """{"$contains": str}, {"$not_contains": str}, {"$and" | "$or": [...]} -> điều kiện SQL trên document."""
+    if not where_document:
+        return "1", []
+    if not isinstance(where_document, dict):
+        raise ValueError(f"Invalid where_document filter: {where_document!r}")
+    clauses, params = [], []
+    for op, value in where_document.items():
+        if op in ("$and", "$or"):
+            if not isinstance(value, list) or not value:
+                raise ValueError(f"'{op}' expects a non-empty list of filters")
+            parts = [compile_where_document(c) for c in value]
+            clauses.append("(" + f" {op[1:].upper()} ".join(sql for sql, _ in parts) + ")")
+            params += [p for _, ps in parts for p in ps]
+        elif op in ("$contains", "$not_contains"):
+            clauses.append(f"instr(document, ?) {'>' if op == '$contains' else '='} 0")
+            params.append(str(value))
+        else:
+            raise ValueError(f"Unsupported where_document operator: {op!r}")
+    return "(" + " AND ".join(clauses) + ")", params
+
+
+class LocalVectorIndex(ABC):
+    """Records + float32 vectors trên disk; subclass cài đặt candidate scan."""
+
+    kind: str = ""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.dim: Optional[int] = None
+        self._n = 0
+        self._vectors: Optional[np.memmap] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.lock = _ReadWriteLock()
+
+        if has_records(self.path):
+            self._load()
+
+    # ------------------------------------------------------------
+    # Backend hooks
+    # ------------------------------------------------------------
+    @abstractmethod
+    def _candidates(self, query: np.ndarray, n: int, **search_params) -> np.ndarray:
+        """Trả về tối đa n row ứng viên cho query (đã normalize)."""
+
+    @abstractmethod
+    def _index_rows(self,
+                    updated_rows: np.ndarray, updated_vectors: np.ndarray,
+                    new_rows: np.ndarray, new_vectors: np.ndarray):
+        """Cập nhật cấu trúc tìm kiếm cho các rows bị ghi đè và các rows mới thêm."""
+
+    @abstractmethod
+    def _load_index(self):
+        ...
+
+    @abstractmethod
+    def _save_index(self):
+        ...
+
+    @abstractmethod
+    def resident_bytes(self) -> int:
+        """Số byte cấu trúc tìm kiếm chiếm trong RAM."""
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    @property
+    def _vectors_file(self) -> Path:
+        return self.path / "vectors.f32"
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path / RECORDS_FILE, check_same_thread=False)
+            db.execute(f"PRAGMA cache_size=-{RECORDS_CACHE_KIB}")
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                "row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, document TEXT, metadata TEXT)"
+            )
+            self._db = db
+        return self._db
+
+    def _load(self):
+        if not (self.path / RECORDS_FILE).exists():
+            self._migrate_legacy_records()
+        db = self._connect()
+        with self._db_lock:
+            meta = dict(db.execute("SELECT key, value FROM meta").fetchall())
+            self._n = db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+        kind = meta.get("kind")
+        if kind != self.kind:
+            raise ValueError(
+                f"Index at {self.path} was built as '{kind}', not '{self.kind}'"
+            )
+        self.dim = int(meta["dim"]) if meta.get("dim") else None
+        self._open_vectors()
+        self._load_index()
+
+    def _migrate_legacy_records(self):
+        """records.json (toàn bộ records trong 1 file JSON) -> records.sqlite3."""
+        legacy = self.path / _LEGACY_RECORDS_FILE
+        with legacy.open("r", encoding="utf-8") as f:
+            records = json.load(f)
+        db = self._connect()
+        with self._db_lock, db:
+            db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                # Index quantized cũ lưu key "mode" thay vì "kind"
+                ("kind", records.get("kind", records.get("mode"))),
+                ("dim", str(records["dim"]) if records.get("dim") else ""),
+            ])
+            db.executemany("INSERT INTO records VALUES (?, ?, ?, ?)", (
+                (row, id_, doc, json.dumps(meta, ensure_ascii=False))
+                for row, (id_, doc, meta) in enumerate(
+                    zip(records["ids"], records["documents"], records["metadatas"])
+                )
+            ))
+        legacy.unlink()
+        logger.info(f"📦 Migrated {len(records['ids'])} records to SQLite at {self.path}")
+
+    def _open_vectors(self):
+        if not self._n:
+            self._vectors = None
+            return
+        # File có thể dài hơn số records (crash giữa ghi vector và commit records) -> chỉ map n dòng
+        self._vectors = np.memmap(
+            self._vectors_file, dtype=np.float32, mode="r", shape=(self._n, self.dim)
+        )
+
+    def _rows_of(self, ids: List[str]) -> Dict[str, int]:
+        db = self._connect()
+        out: Dict[str, int] = {}
+        with self._db_lock:
+            for i in range(0, len(ids), _SQL_BATCH):
+                part = ids[i:i + _SQL_BATCH]
+                out.update(db.execute(
+                    f"SELECT id, row FROM records WHERE id IN ({','.join('?' * len(part))})", part
+                ).fetchall())
+        return out
+
+    def records(self, rows: List[int]) -> Tuple[List[str], List[str], List[Dict[str, Any]]]:
+        """(ids, documents, metadatas) của các row, đúng thứ tự rows."""
+        found: Dict[int, Tuple[str, str, str]] = {}
+        rows = [int(r) for r in rows]
+        if rows:
+            db = self._connect()
+            with self._db_lock:
+                for i in range(0, len(rows), _SQL_BATCH):
+                    part = rows[i:i + _SQL_BATCH]
+                    for row, id_, doc, meta in db.execute(
+                        f"SELECT row, id, document, metadata FROM records "
+                        f"WHERE row IN ({','.join('?' * len(part))})", part
+                    ):
+                        found[row] = (id_, doc, meta)
+        return (
+            [found[r][0] for r in rows],
+            [found[r][1] for r in rows],
+            [json.loads(found[r][2]) for r in rows],
+        )
+
+    def records_disk_bytes(self) -> int:
+        return sum(
+            f.stat().st_size for f in self.path.glob(f"{RECORDS_FILE}*") if f.is_file()
+        )
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+    def count(self) -> int:
+        return self._n
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, documents: List[str], metadatas: List[Dict[str, Any]]):
+        # Id trùng trong cùng một batch: giữ bản cuối
+        last = {id_: k for k, id_ in enumerate(ids)}
+        if len(last) != len(ids):
+            keep = sorted(last.values())
+            ids = [ids[k] for k in keep]
+            documents = [documents[k] for k in keep]
+            metadatas = [metadatas[k] for k in keep]
+            vectors = np.asarray(vectors)[keep]
+
+        vectors = normalize(vectors)
+        with self.lock.write():
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim mismatch: expected {self.dim}, got {vectors.shape[1]}")
+
+            existing = self._rows_of(ids)
+            update_src, update_rows, new_src, rows = [], [], [], []
+            n_old = self._n
+            for k, id_ in enumerate(ids):
+                row = existing.get(id_)
+                if row is None:
+                    row = n_old + len(new_src)
+                    new_src.append(k)
+                else:
+                    update_src.append(k)
+                    update_rows.append(row)
+                rows.append(row)
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            # Đóng memmap cũ trước khi ghi vào file
+            self._vectors = None
+
+            if update_rows:
+                mm = np.memmap(self._vectors_file, dtype=np.float32, mode="r+", shape=(n_old, self.dim))
+                mm[update_rows] = vectors[update_src]
+                mm.flush()
+                del mm
+
+            if new_src:
+                with self._vectors_file.open("r+b" if self._vectors_file.exists() else "wb") as f:
+                    # Bỏ phần đuôi thừa (nếu có) của lần ghi trước bị dừng giữa chừng
+                    f.seek(n_old * self.dim * 4)
+                    f.truncate()
+                    f.write(vectors[new_src].tobytes())
+
+            self._n = n_old + len(new_src)
+            self._open_vectors()
+            self._index_rows(
+                np.asarray(update_rows, dtype=np.int64), vectors[update_src],
+                np.arange(n_old, self._n, dtype=np.int64), vectors[new_src],
+            )
+            self._save_index()
+            self._save_records(rows, ids, documents, metadatas)
+
+    def _save_records(self, rows: List[int], ids: List[str], documents: List[str],
+                      metadatas: List[Dict[str, Any]]):
+        """Chỉ ghi các row của batch (không ghi lại toàn bộ records)."""
+        db = self._connect()
+        with self._db_lock, db:
+            db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("kind", self.kind), ("dim", str(self.dim)),
+            ])
+            db.executemany("INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?)", (
+                (row, id_, doc, json.dumps(meta, ensure_ascii=False))
+                for row, id_, doc, meta in zip(rows, ids, documents, metadatas)
+            ))
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def search(self, query: np.ndarray, k: int, rescore_factor: int = 4, **search_params) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Trả về (rows, exact_cosine) của top-k.
+        Shortlist k * rescore_factor ứng viên từ backend, rescore bằng float32 trên disk.
+        """
+        with self.lock.read():
+            n = self._n
+            if n == 0 or k <= 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            query = normalize(query[None, :])[0]
+            shortlist = min(n, max(k, k * rescore_factor))
+            cand = self._candidates(query, shortlist, **search_params)
+            if len(cand) == 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+            # Fancy-index trên memmap chỉ đọc các dòng cần thiết từ disk
+            cand = np.sort(np.asarray(cand, dtype=np.int64))
+            exact = np.asarray(self._vectors[cand]) @ query
+            order = np.argsort(-exact)[:k]
+            return cand[order], exact[order]
+
+    def search_rows(self, query: np.ndarray, k: int, where_sql: str, params: List[Any]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search có filter metadata / document: lọc row bằng SQLite trước, rồi scan
+        chính xác trên float32 của các row còn lại (không qua candidate scan của backend).
+        """
+        query = normalize(query[None, :])[0]
+        with self.lock.read():
+            with self._db_lock:
+                allowed = np.fromiter(
+                    (r for (r,) in self._connect().execute(
+                        f"SELECT row FROM records WHERE row < ? AND ({where_sql}) ORDER BY row",
+                        [self._n, *params],
+                    )),
+                    dtype=np.int64,
+                )
+            if len(allowed) == 0 or k <= 0:
+                return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+            scores = np.empty(len(allowed), dtype=np.float32)
+            for i in range(0, len(allowed), SCAN_CHUNK):
+                j = min(i + SCAN_CHUNK, len(allowed))
+                scores[i:j] = np.asarray(self._vectors[allowed[i:j]]) @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return allowed[top], scores[top]
+
+    def exact_scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine của query với toàn bộ vectors (full scan theo chunk)."""
+        n = self._n
+        scores = np.empty(n, dtype=np.float32)
+        for i in range(0, n, SCAN_CHUNK):
+            j = min(i + SCAN_CHUNK, n)
+            scores[i:j] = np.asarray(self._vectors[i:j]) @ query
+        return scores
+
+    def exact_search(self, query: np.ndarray, k: int) -> np.ndarray:
+        """Full scan trên float32 (dùng làm ground truth khi đo recall)."""
+        query = normalize(query[None, :])[0]
+        with self.lock.read():
+            scores = self.exact_scores(query)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def memory_report(self) -> Dict[str, Any]:
+        n = self._n
+        float_bytes = n * (self.dim or 0) * 4
+        records_disk = self.records_disk_bytes()
+        # Records nằm trên disk; phần trong RAM tối đa bằng page cache của SQLite
+        records_resident = min(records_disk, RECORDS_CACHE_KIB * 1024)
+        resident = self.resident_bytes() + records_resident
+        return {
+            "kind": self.kind,
+            "vectors": n,
+            "dim": self.dim,
+            "float32_bytes": float_bytes,
+            "index_resident_bytes": resident - records_resident,
+            "records_disk_bytes": records_disk,
+            "records_resident_bytes": records_resident,
+            "resident_bytes": resident,
+            "saved_bytes": float_bytes - resident,
+            "compression_ratio": round(float_bytes / resident, 2) if resident else None,
+        }
+
+    def estimate_recall(self,
+                        k: int = 10,
+                        sample_size: int = 100,
+                        rescore_factor: int = 4,
+                        queries: Optional[np.ndarray] = None,
+                        seed: int = 0,
+                        **search_params,
+                        ) -> Dict[str, Any]:
+        """
+        So sánh top-k (candidate scan + rescore) với full float32 scan.
+
+        Nếu không truyền queries thì lấy ngẫu nhiên các vector đã lưu làm query và bỏ
+        chính row đó khỏi cả ground truth lẫn kết quả (query luôn tìm thấy chính nó,
+        tính vào sẽ làm recall cao giả).
+        """
+        n = self._n
+        self_rows: List[Optional[int]]
+        if queries is None:
+            rng = np.random.default_rng(seed)
+            rows = np.sort(rng.choice(n, size=min(sample_size, n), replace=False)) if n else np.zeros(0, dtype=np.int64)
+            with self.lock.read():
+                queries = np.asarray(self._vectors[rows]) if len(rows) else np.zeros((0, self.dim or 0))
+            self_rows = rows.tolist()
+            k = min(k, n - 1)
+        else:
+            self_rows = [None] * len(queries)
+            k = min(k, n)
+        if k <= 0 or len(queries) == 0:
+            return {"k": k, "queries": 0, "rescore_factor": rescore_factor,
+                    "recall_at_k": None, "recall_at_k_without_rescore": None}
+
+        def top(rows: np.ndarray, self_row: Optional[int]) -> set:
+            return set([r for r in rows.tolist() if r != self_row][:k])
+
+        # Lấy dư 1 kết quả để bù row bị loại
+        extra = 0 if self_rows[0] is None else 1
+        hits, shortlist_hits = 0, 0
+        for q, self_row in zip(queries, self_rows):
+            truth = top(self.exact_search(q, k + extra), self_row)
+            got, _ = self.search(q, k + extra, rescore_factor=rescore_factor, **search_params)
+            hits += len(truth & top(got, self_row))
+            # Không rescore: chỉ lấy đúng k ứng viên đầu của backend
+            approx_only, _ = self.search(q, k + extra, rescore_factor=1, **search_params)
+            shortlist_hits += len(truth & top(approx_only, self_row))
+
+        total = k * len(queries)
+        return {
+            "k": k,
+            "queries": int(len(queries)),
+            "rescore_factor": rescore_factor,
+            "recall_at_k": round(hits / total, 4),
+            "recall_at_k_without_rescore": round(shortlist_hits / total, 4),
+        }
+
+
+class LocalVectorRepo(ChromaRepo, ABC):
+    """
+    ChromaRepo-compatible repository trên các LocalVectorIndex.
+
+    Giữ nguyên interface (upsert / get_context_for_chat / list_collections ...)
+    nên có thể thay thế ChromaRepo ở mọi nơi.
+    """
+
+    def __init__(self, root: str):
+        # Không tạo PersistentClient: toàn bộ vector nằm trong thư mục root
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.rescore_factor = settings.QUANTIZED_RESCORE_FACTOR
+        self.embedding_service = get_embedding_service()
+        self.embedder = self.embedding_service.as_chroma()
+        self._collections: dict[str, LocalVectorIndex] = {}
+        # Mở index (get_or_create) / xoá index: 1 thư mục chỉ có đúng 1 LocalVectorIndex
+        self._collections_lock = threading.Lock()
+
+    @abstractmethod
+    def _open_index(self, path: Path) -> LocalVectorIndex:
+        ...
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return self.embedding_service.embed_documents(texts)
+
+    # ------------------------------------------------------------
+    # Collection Management
+    # ------------------------------------------------------------
+    def get_or_create(self, index_name: str) -> LocalVectorIndex:
+        name = self._collection_name(index_name)
+        index = self._collections.get(name)
+        if index is not None:
+            return index
+        with self._collections_lock:
+            index = self._collections.get(name)
+            if index is None:
+                index = self._collections[name] = self._open_index(self.root / name)
+        return index
+
+    def get_collection(self, index_name: str) -> LocalVectorIndex:
+        name = self._collection_name(index_name)
+        if name not in self._collections and not has_records(self.root / name):
+            raise ValueError(f"Collection '{index_name}' does not exist")
+        return self.get_or_create(index_name)
+
+    def list_collections(self):
+        """List tất cả các index hiện có (object có thuộc tính .name như Chroma)."""
+        return [
+            SimpleNamespace(name=p.name)
+            for p in sorted(self.root.iterdir())
+            if has_records(p)
+        ]
+
+    def delete_collection(self, index_name: str):
+        name = self._collection_name(index_name)
+        with self._collections_lock:
+            index = self._collections.pop(name, None)
+            path = self.root / name
+            if index is not None:
+                # Chờ search / upsert đang chạy trên index xong rồi mới xoá file
+                with index.lock.write():
+                    index.close()
+            if not path.exists():
+                raise ValueError(f"Collection '{index_name}' does not exist")
+            shutil.rmtree(path)
+
+    # ------------------------------------------------------------
+    # Data Upsertion
+    # ------------------------------------------------------------
+    def upsert(self, index_name: str, all_chunks: List[Dict[str, Any]], batch_size: int = 3000):
+        index = self.get_or_create(index_name)
+
+        ids, docs, metadatas = self._flatten_chunks(all_chunks)
+        n = len(ids)
+        for i in range(0, n, batch_size):
+            j = min(i + batch_size, n)
+            index.upsert(ids[i:j], self._embed(docs[i:j]), docs[i:j], metadatas[i:j])
+
+    # ------------------------------------------------------------
+    # Query & Search
+    # ------------------------------------------------------------
+    def _query_batch(self,
+                     index_name: str,
+                     query_texts: List[str],
+                     n_results: int = 5,
+                     where: Optional[Dict[str, Any]] = None,
+                     where_document: Optional[Dict[str, Any]] = None,
+                     search_params: Optional[Dict[str, Any]] = None,
+                     query_embeddings: Optional[np.ndarray] = None,
+                     ) -> Dict[str, Any]:
+        index = self.get_collection(index_name)
+        filtered = bool(where or where_document)
+        if filtered:
+            # Filter sai cú pháp -> ValueError trước khi embed query
+            where_sql, where_params = compile_where(where)
+            doc_sql, doc_params = compile_where_document(where_document)
+        if query_embeddings is None:
+            query_vectors = self.embedding_service.embed_queries(list(query_texts))
+        else:
+            query_vectors = np.asarray(query_embeddings, dtype=np.float32)
+
+        # Trả về đúng shape của Chroma để get_context_for_chat dùng lại được
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for qv in query_vectors:
+            if filtered:
+                rows, scores = index.search_rows(
+                    qv, n_results, f"{where_sql} AND {doc_sql}", where_params + doc_params
+                )
+            else:
+                rows, scores = index.search(qv, n_results, self.rescore_factor, **(search_params or {}))
+            ids, documents, metadatas = index.records(rows.tolist())
+            results["ids"].append(ids)
+            results["documents"].append(documents)
+            results["metadatas"].append(metadatas)
+            results["distances"].append([float(1 - s) for s in scores])
+        return results
+
+    def get_collection_stats(self, index_name: str) -> Dict[str, Any]:
+        index = self.get_collection(index_name)
+        return {
+            'count': index.count(),
+            'name': self._collection_name(index_name),
+            'metadata': {"index_mode": index.kind},
+            'memory': index.memory_report(),
+        }
+
+    def index_report(self, index_name: str, k: int = 10, sample_size: int = 100) -> Dict[str, Any]:
+        """Memory tiết kiệm được + recall bị mất so với full float32 scan."""
+        index = self.get_collection(index_name)
+        return {
+            "memory": index.memory_report(),
+            "recall": index.estimate_recall(k=k, sample_size=sample_size, rescore_factor=self.rescore_factor),
+        }
@@ -0,0 +1,111 @@
+"""
+Quantized vector store - giữ int8/binary codes trong RAM, vector float32 nằm trên disk (memmap).
+
+Candidate scan chạy trên codes đã lượng tử hoá, sau đó shortlist được rescore
+bằng vector float32 chính xác đọc qua memory-mapping.
+"""
+import logging
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.repositories.local_store import LocalVectorIndex, LocalVectorRepo, SCAN_CHUNK
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("int8", "binary")
+
+# Số bit 1 trong mỗi byte, dùng cho Hamming distance của binary codes
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class QuantizedIndex(LocalVectorIndex):
+    """
+    Index lượng tử hoá trên disk.
+
+    Files riêng:
+        codes.npy     : int8 codes (n, dim) hoặc packed bits (n, ceil(dim/8))
+        scales.npy    : scale per-row cho int8 (rỗng với binary)
+    """
+
+    def __init__(self, path: Path, mode: str):
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.kind = mode
+        self._codes: Optional[np.ndarray] = None
+        self._scales: np.ndarray = np.zeros(0, dtype=np.float32)
+        super().__init__(path)
+
+    # ------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------
+    def _load_index(self):
+        self._codes = np.load(self.path / "codes.npy")
+        self._scales = np.load(self.path / "scales.npy")
+
+    def _save_index(self):
+        np.save(self.path / "codes.npy", self._codes)
+        np.save(self.path / "scales.npy", self._scales)
+
+    # ------------------------------------------------------------
+    # Quantization
+    # ------------------------------------------------------------
+    def _quantize(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.kind == "int8":
+            # Symmetric per-row scale: v ≈ codes * scale
+            max_abs = np.abs(vectors).max(axis=1)
+            max_abs[max_abs == 0] = 1.0
+            scales = (max_abs / 127.0).astype(np.float32)
+            codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+            return codes, scales
+        # binary: 1 bit/chiều theo dấu
+        return np.packbits(vectors > 0, axis=1), np.zeros(0, dtype=np.float32)
+
+    def _index_rows(self, updated_rows, updated_vectors, new_rows, new_vectors):
+        if len(updated_rows):
+            codes, scales = self._quantize(updated_vectors)
+            self._codes[updated_rows] = codes
+            if self.kind == "int8":
+                self._scales[updated_rows] = scales
+        if len(new_rows):
+            codes, scales = self._quantize(new_vectors)
+            self._codes = codes if self._codes is None else np.concatenate([self._codes, codes])
+            if self.kind == "int8":
+                self._scales = np.concatenate([self._scales, scales])
+
+    def _candidates(self, query: np.ndarray, n: int, **search_params) -> np.ndarray:
+        """Top-n theo điểm xấp xỉ trên codes, scan theo từng chunk."""
+        total = self.count()
+        scores = np.empty(total, dtype=np.float32)
+        if self.kind == "int8":
+            for i in range(0, total, SCAN_CHUNK):
+                j = min(i + SCAN_CHUNK, total)
+                scores[i:j] = (self._codes[i:j].astype(np.float32) @ query) * self._scales[i:j]
+        else:
+            q_bits = np.packbits(query[None, :] > 0, axis=1)
+            for i in range(0, total, SCAN_CHUNK):
+                j = min(i + SCAN_CHUNK, total)
+                hamming = _POPCOUNT[np.bitwise_xor(self._codes[i:j], q_bits)].sum(axis=1)
+                scores[i:j] = -hamming.astype(np.float32)
+
+        if n >= total:
+            return np.arange(total)
+        return np.argpartition(-scores, n - 1)[:n]
+
+    def resident_bytes(self) -> int:
+        return (0 if self._codes is None else self._codes.nbytes) + self._scales.nbytes
+
+
+class QuantizedRepo(LocalVectorRepo):
+    """Repository dùng QuantizedIndex thay cho Chroma HNSW (VECTOR_INDEX_MODE=int8|binary)."""
+
+    def __init__(self, mode: Optional[str] = None):
+        self.mode = mode or settings.VECTOR_INDEX_MODE
+        if self.mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unsupported quantization mode: {self.mode}")
+        super().__init__(settings.QUANTIZED_INDEX_DIR)
+
+    def _open_index(self, path: Path) -> QuantizedIndex:
+        return QuantizedIndex(path, self.mode)
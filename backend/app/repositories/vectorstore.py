@@ -2,16 +2,18 @@
 Updated ChromaRepo với query methods cho chat.
 """
 from typing import List, Dict, Any, Optional
+
+import numpy as np
 from chromadb import PersistentClient
-from chromadb.utils import embedding_functions
 from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.embedding.service import get_embedding_service
 
 class ChromaRepo:
     def __init__(self):
         self.client = PersistentClient(path=settings.CHROMA_PERSIST_DIR)
-        self.embedder = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=settings.EMBEDDING_MODEL,
-        )
+        # Model embedding dùng chung với LangChainState (1 bản weights/process)
+        self.embedding_service = get_embedding_service()
+        self.embedder = self.embedding_service.as_chroma()
         self._collections: dict[str, Any] = {}
 
     # ------------------------------------------------------------
@@ -20,6 +22,9 @@ class ChromaRepo:
     def _collection_name(self, index_name: str) -> str:
         return f"{index_name}"
 
+    def _embed_queries(self, query_texts: List[str]) -> List[List[float]]:
+        return self.embedding_service.embed_queries(list(query_texts)).tolist()
+
     # ------------------------------------------------------------
     # Collection Management
     # ------------------------------------------------------------
@@ -50,9 +55,9 @@ class ChromaRepo:
     # ------------------------------------------------------------
     # Data Upsertion
     # ------------------------------------------------------------
-    def upsert(self, index_name: str, all_chunks: List[Dict[str, Any]], batch_size: int = 3000):
-        col = self.get_or_create(index_name)
-
+    @staticmethod
+    def _flatten_chunks(all_chunks: List[Dict[str, Any]]):
+        """Chuyển [{source, content: [...]}] thành (ids, docs, metadatas) phẳng."""
         ids, docs, metadatas = [], [], []
         for chunk in all_chunks:
             src = chunk["source"]
@@ -64,6 +69,12 @@ class ChromaRepo:
                     "page": ch["page"],
                     "chunk_id": ch["chunk_id"],
                 })
+        return ids, docs, metadatas
+
+    def upsert(self, index_name: str, all_chunks: List[Dict[str, Any]], batch_size: int = 3000):
+        col = self.get_or_create(index_name)
+
+        ids, docs, metadatas = self._flatten_chunks(all_chunks)
 
         n = len(ids)
         for i in range(0, n, batch_size):
@@ -76,17 +87,25 @@ class ChromaRepo:
     # ------------------------------------------------------------
     # Query & Search (CHO CHAT) (New, must check)
     # ------------------------------------------------------------
-    def _query(self,
-               index_name: str,
-               query_text: str,
-               n_results: int = 5,
-               where: Optional[str] = None,
-               where_document: Optional[str] = None
-               )-> Dict[str, Any]:
+    def _query_batch(self,
+                     index_name: str,
+                     query_texts: List[str],
+                     n_results: int = 5,
+                     where: Optional[str] = None,
+                     where_document: Optional[str] = None,
+                     search_params: Optional[Dict[str, Any]] = None,
+                     query_embeddings: Optional[np.ndarray] = None,
+                     ) -> Dict[str, Any]:
+        """
+        Một collection query cho nhiều câu hỏi: embed cả batch trong 1 forward pass
+        rồi trả kết quả theo từng query. query_embeddings (đã embed sẵn) -> bỏ qua bước embed.
+        """
+        # search_params (vd. nprobe) chỉ dùng cho backend local; HNSW của Chroma không chỉnh per-query
         col = self.get_collection(index_name)
 
         results = col.query(
-            query_texts=[query_text],
+            query_embeddings=self._embed_queries(query_texts) if query_embeddings is None
+            else np.asarray(query_embeddings, dtype=np.float32).tolist(),
             n_results=n_results,
             where=where,
             where_document=where_document,
@@ -94,22 +113,31 @@ class ChromaRepo:
 
         return results
 
-    def get_context_for_chat(self,
-                             index_name: str,
-                             query_text: str,
-                             n_results: int = 5,
-                             min_relevance: float = 0.0,
-    ) -> List[Dict[str, Any]]:
-        results = self._query(
+    def _query(self,
+               index_name: str,
+               query_text: str,
+               n_results: int = 5,
+               where: Optional[str] = None,
+               where_document: Optional[str] = None,
+               search_params: Optional[Dict[str, Any]] = None,
+               query_embedding: Optional[np.ndarray] = None,
+               )-> Dict[str, Any]:
+        return self._query_batch(
             index_name=index_name,
-            query_text=query_text,
+            query_texts=[query_text],
             n_results=n_results,
+            where=where,
+            where_document=where_document,
+            search_params=search_params,
+            query_embeddings=None if query_embedding is None else np.asarray(query_embedding)[None, :],
         )
 
-        # Flatten results
+    @staticmethod
+    def _flatten_results(results: Dict[str, Any], qi: int, min_relevance: float) -> List[Dict[str, Any]]:
+        """Lấy contexts của query thứ qi từ kết quả dạng Chroma."""
         contexts = []
-        for i in range(len(results['ids'][0])):
-            distance = results['distances'][0][i]
+        for i in range(len(results['ids'][qi])):
+            distance = results['distances'][qi][i]
             score = 1 - distance # Convert distance to similarity score
 
             # Filter by minimum relevance
@@ -117,14 +145,50 @@ class ChromaRepo:
                 continue
 
             contexts.append({
-                'text': results['documents'][0][i],
-                'source': results['metadatas'][0][i]['source'],
-                'page': results['metadatas'][0][i]['page'],
-                'chunk_id': results['metadatas'][0][i]['chunk_id'],
+                'text': results['documents'][qi][i],
+                'source': results['metadatas'][qi][i]['source'],
+                'page': results['metadatas'][qi][i]['page'],
+                'chunk_id': results['metadatas'][qi][i]['chunk_id'],
                 'score': round(score, 4),
             })
         return contexts
 
+    def get_context_for_chat(self,
+                             index_name: str,
+                             query_text: str,
+                             n_results: int = 5,
+                             min_relevance: float = 0.0,
+                             search_params: Optional[Dict[str, Any]] = None,
+                             query_embedding: Optional[np.ndarray] = None,
+    ) -> List[Dict[str, Any]]:
+        """query_embedding: vector của query_text nếu caller đã embed (không embed lại)."""
+        results = self._query(
+            index_name=index_name,
+            query_text=query_text,
+            n_results=n_results,
+            search_params=search_params,
+            query_embedding=query_embedding,
+        )
+        return self._flatten_results(results, 0, min_relevance)
+
+    def get_contexts_for_queries(self,
+                                 index_name: str,
+                                 query_texts: List[str],
+                                 n_results: int = 5,
+                                 min_relevance: float = 0.0,
+                                 search_params: Optional[Dict[str, Any]] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Batched retrieval: trả về list contexts theo đúng thứ tự query_texts."""
+        if not query_texts:
+            return []
+        results = self._query_batch(
+            index_name=index_name,
+            query_texts=query_texts,
+            n_results=n_results,
+            search_params=search_params,
+        )
+        return [self._flatten_results(results, qi, min_relevance) for qi in range(len(query_texts))]
+
     def get_collection_stats(self, index_name: str) -> Dict[str, Any]:
         col = self.get_collection(index_name)
         return {
@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import List, Optional
 
 from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
 
@@ -30,6 +31,15 @@ class VectorSearchTool(AgentTool):
     def description(self) -> str:
         return "Search knowledge base for relevant context"
 
-    async def run(self, query: str, index: str, k: int =5) -> dict:
-        results = self.repo.get_context_for_chat(index, query, k)
+    async def run(self, query: str, index: str, k: int =5, nprobe: Optional[int] = None) -> dict:
+        results = self.repo.get_context_for_chat(
+            index, query, k, search_params={"nprobe": nprobe} if nprobe else None
+        )
+        return {"contexts": results}
+
+    async def run_batch(self, queries: List[str], index: str, k: int = 5, nprobe: Optional[int] = None) -> dict:
+        """Nhiều query trong 1 collection query (1 forward pass embedding)."""
+        results = self.repo.get_contexts_for_queries(
+            index, queries, k, search_params={"nprobe": nprobe} if nprobe else None
+        )
         return {"contexts": results}
@@ -0,0 +1,172 @@
+"""
+Semantic answer cache cho chat (FAQ-style traffic).
+
+Mỗi scope (index_name, hoặc bộ index của federated search) giữ các entry
+(question embedding, context ids, lang, answer). Lookup:
+    - cosine(query, question) >= ANSWER_CACHE_THRESHOLD (brute-force trên ma trận
+      embedding của scope - vài nghìn vector L2-normalized nên 1 matmul là đủ),
+    - cùng lang và cùng tập context ids với lần retrieve hiện tại
+      (tài liệu đổi -> context đổi -> không replay answer cũ).
+Entry bị evict theo LRU (ANSWER_CACHE_MAX_ENTRIES mỗi scope) + TTL, và bị xoá
+toàn bộ khi index thay đổi (build / add / delete index). Stream bắt đầu trước lúc
+invalidate mang generation cũ -> put() của nó bị bỏ (file build lại giữ nguyên
+chunk id nên answer cũ vẫn khớp fingerprint).
+
+Mọi method chạy trên event loop (không có I/O) nên không cần lock.
+"""
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import ANSWER_CACHE_REQUESTS
+from ask_forge.backend.app.services.qg.cache import context_fingerprint
+
+logger = logging.getLogger(__name__)
+
+Scope = Tuple[str, ...]
+
+
+@dataclass
+class _Entry:
+    question: str
+    embedding: np.ndarray
+    context_ids: Tuple[str, ...]
+    lang: str
+    answer: str
+    created_at: float = field(default_factory=time.time)
+
+
+class _ScopeCache:
+    def __init__(self):
+        self.entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._ids: List[int] = []
+        self._matrix: Optional[np.ndarray] = None  # (n, dim), build lại khi entries đổi
+
+    def matrix(self) -> Tuple[List[int], np.ndarray]:
+        if self._matrix is None:
+            self._ids = list(self.entries)
+            self._matrix = np.stack([self.entries[i].embedding for i in self._ids])
+        return self._ids, self._matrix
+
+    def invalidate_matrix(self):
+        self._matrix = None
+
+
+class SemanticAnswerCache:
+    def __init__(self,
+                 threshold: Optional[float] = None,
+                 max_entries: Optional[int] = None,
+                 ttl_s: Optional[float] = None):
+        self.threshold = threshold or settings.ANSWER_CACHE_THRESHOLD
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self.ttl_s = settings.ANSWER_CACHE_TTL_S if ttl_s is None else ttl_s  # 0 = không hết hạn
+        self._scopes: Dict[Scope, _ScopeCache] = {}
+        self._next_id = 0
+        self._generations: Dict[str, int] = {}  # số lần invalidate của từng index
+
+    @staticmethod
+    def _normalize(vec: np.ndarray) -> np.ndarray:
+        vec = np.asarray(vec, dtype=np.float32).reshape(-1)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm > 0 else vec
+
+    def _expired(self, entry: _Entry) -> bool:
+        return self.ttl_s > 0 and time.time() - entry.created_at > self.ttl_s
+
+    def _drop_expired(self, scope: _ScopeCache):
+        expired = [i for i, e in scope.entries.items() if self._expired(e)]
+        for i in expired:
+            del scope.entries[i]
+        if expired:
+            scope.invalidate_matrix()
+
+    # ------------------------------------------------------------
+    # Lookup / insert
+    # ------------------------------------------------------------
+    def _best_match(self, scope: _ScopeCache, query: np.ndarray, context_ids: Tuple[str, ...],
+                    lang: str) -> Tuple[Optional[int], float]:
+        ids, matrix = scope.matrix()
+        sims = matrix @ query
+        for pos in np.argsort(-sims):
+            if sims[pos] < self.threshold:
+                break
+            entry = scope.entries[ids[pos]]
+            if entry.lang == lang and entry.context_ids == context_ids:
+                return ids[pos], float(sims[pos])
+        return None, 0.0
+
+    def lookup(self, scope_key: Scope, query_embedding: np.ndarray, contexts: List[Dict],
+               lang: str) -> Optional[Tuple[str, float]]:
+        """Trả về (answer, similarity) nếu có entry đủ giống, ngược lại None."""
+        scope = self._scopes.get(scope_key)
+        if scope is not None:
+            self._drop_expired(scope)
+        if scope is None or not scope.entries:
+            ANSWER_CACHE_REQUESTS.labels("miss").inc()
+            return None
+
+        entry_id, similarity = self._best_match(
+            scope, self._normalize(query_embedding), tuple(context_fingerprint(contexts)), lang
+        )
+        if entry_id is None:
+            ANSWER_CACHE_REQUESTS.labels("miss").inc()
+            return None
+        scope.entries.move_to_end(entry_id)
+        ANSWER_CACHE_REQUESTS.labels("hit").inc()
+        return scope.entries[entry_id].answer, similarity
+
+    def generation(self, scope_key: Scope) -> Tuple[int, ...]:
+        """Chụp trước khi retrieve, truyền lại cho put()."""
+        return tuple(self._generations.get(name, 0) for name in scope_key)
+
+    def put(self, scope_key: Scope, question: str, query_embedding: np.ndarray, contexts: List[Dict],
+            lang: str, answer: str, generation: Optional[Tuple[int, ...]] = None):
+        if not answer.strip():
+            return
+        if generation is not None and generation != self.generation(scope_key):
+            # Index đổi trong lúc stream: answer dựa trên nội dung cũ
+            return
+        scope = self._scopes.setdefault(scope_key, _ScopeCache())
+        entry = _Entry(
+            question=question,
+            embedding=self._normalize(query_embedding),
+            context_ids=tuple(context_fingerprint(contexts)),
+            lang=lang,
+            answer=answer,
+        )
+        # Câu gần như trùng với entry sẵn có -> thay thế thay vì thêm bản sao
+        if scope.entries:
+            self._drop_expired(scope)
+        if scope.entries:
+            old_id, _ = self._best_match(scope, entry.embedding, entry.context_ids, lang)
+            if old_id is not None:
+                del scope.entries[old_id]
+
+        scope.entries[self._next_id] = entry
+        self._next_id += 1
+        while len(scope.entries) > self.max_entries:
+            scope.entries.popitem(last=False)
+        scope.invalidate_matrix()
+
+    # ------------------------------------------------------------
+    # Invalidation
+    # ------------------------------------------------------------
+    def invalidate(self, index_name: str):
+        """Index bị build lại / thêm tài liệu / xoá -> bỏ mọi scope có index đó."""
+        self._generations[index_name] = self._generations.get(index_name, 0) + 1
+        stale = [key for key in self._scopes if index_name in key]
+        for key in stale:
+            del self._scopes[key]
+        if stale:
+            logger.info("🧹 Answer cache invalidated for %s (%d scopes)", index_name, len(stale))
+
+    def clear(self):
+        self._scopes.clear()
+
+    def __len__(self) -> int:
+        return sum(len(s.entries) for s in self._scopes.values())
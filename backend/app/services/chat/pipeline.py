@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import List, Dict, Iterable, Tuple, AsyncIterable, AsyncIterator, Any, Coroutine
+from typing import List, Dict, Iterable, Tuple, AsyncIterable, AsyncIterator, Any, Coroutine, Optional
 
 from ask_forge.backend.app.core.app_state import AppState
 from ask_forge.backend.app.services.chat.schemas import ChatTurn, ContextChunk
@@ -77,16 +77,16 @@ async def stream_answer_llm(
     prompt: str,
     app_state: AppState,
     task: str = "chat",
+    route_info: Optional[dict] = None,
     **context
 ) -> AsyncIterator[str]:
-    """Streaming qua Router"""
+    """Streaming qua Router (route_info: xem LLMRouter.stream)"""
 
-    provider = await app_state.llm_router.route({
+    # Router chọn provider, hedge sang provider thứ 2 nếu token đầu tới chậm / provider lỗi
+    async for chunk in app_state.llm_router.stream({
         "task": task,
         **context
-    }) # M có thể vào trong route để kiểm `tra và xem các thông số đầu vào có thể nhận, ở đây ta nhận task
-
-    async for chunk in provider.generate_stream(prompt):
+    }, prompt, route_info=route_info):
         yield chunk
 
 def prepare_contexts_for_response(contexts: List[Dict]) -> List[Dict]:
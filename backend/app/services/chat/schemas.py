@@ -33,9 +33,12 @@ class ChatSession(BaseModel):
 class ChatBody(BaseModel):
     query_text: str = Field(..., description="Câu hỏi của người dùng")
     index_name: str = Field(..., description="Tên index trong Chroma")
+    index_names: Optional[List[str]] = Field(default=None, description="Federated search: query thêm các index này song song")
     lang: str = Field(default="vietnamese", description="Ngôn ngữ đầu ra (vietnamese/english)")
+    session_id: Optional[str] = Field(default=None, description="Phiên chat của client: có thì các lượt (kèm số token) được lưu vào history")
     n_results: int = Field(default=75)
     min_rel: float = Field(default=0.2)
+    nprobe: Optional[int] = Field(default=None, description="Số IVF list được probe (chỉ dùng với VECTOR_INDEX_MODE=ivfpq)")
     # TODO: Xử lý lang theo origin_language của query
 
 class ContextChunk(BaseModel):
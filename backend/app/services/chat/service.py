@@ -2,11 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import json
-from typing import List, Dict
+import re
+import time
+from typing import List, Dict, Optional
 
 from ask_forge.backend.app.core.app_state import AppState
+from ask_forge.backend.app.core.tracing import span
 from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
-from ask_forge.backend.app.services.chat.schemas import ChatBody
+from ask_forge.backend.app.services.chat.schemas import ChatBody, ChatTurn
+from ask_forge.backend.app.services.chat.stages import ChatStageRecorder
 from ask_forge.backend.app.services.chat.pipeline import (
     prepare_contexts_for_response,
     build_history_context,
@@ -14,11 +18,16 @@ from ask_forge.backend.app.services.chat.pipeline import (
 )
 # from ask_forge.backend.app.services.queue.redis_queue import BackgroundQueueUsingRedis
 from ask_forge.backend.app.services.chat_history.summary import generate_session_summary
+from ask_forge.backend.app.services.llm.governor import ProviderOverloaded
+from ask_forge.backend.app.services.llm.usage import TokenUsage, usage_index_var
 
 from fastapi.responses import StreamingResponse
 import logging
 logger = logging.getLogger(__name__)
 
+# Replay answer từ cache: mỗi token SSE = 1 từ kèm whitespace phía sau
+_REPLAY_TOKEN = re.compile(r"\s*\S+\s*")
+
 def _sse(payload: dict | str, event: str | None = None) -> str:
     """SSE format: data: {json}\n\n"""
     if isinstance(payload, dict):
@@ -37,98 +46,245 @@ class ChatService:
         self.question_generator_service = app_state.llm_registry.get("question_generator_service") # llm_registered ở app_state
         self.chat_history = app_state.history_repo
 
-    def _retrieve(self, *, index_name: str, query_text: str, n_results: int = 3, min_rel: float = 0.5) -> List[Dict]:
-        return self.repo.get_context_for_chat(
+    def _retrieve(self, *, index_name: str, query_text: str, n_results: int = 3, min_rel: float = 0.5,
+                  search_params: Optional[Dict] = None):
+        """Trả về (contexts, query embedding): answer cache dùng lại vector, không embed lần 2."""
+        query_embedding = self.repo.embedding_service.embed_query(query_text)
+        contexts = self.repo.get_context_for_chat(
             index_name=index_name,
             query_text=query_text,
             n_results=n_results,
             min_relevance=min_rel,
+            search_params=search_params,
+            query_embedding=query_embedding,
+        )
+        return contexts, query_embedding
+
+    @staticmethod
+    def _timed(stages: ChatStageRecorder, fn, **kwargs):
+        """
+        Chạy trong thread (chỉ leader của single-flight), trả (result, exec_s): mỗi request
+        dùng chung exec_s và tự tính thời gian chờ = tổng thời gian đợi - exec_s.
+        """
+        t_start = time.perf_counter()
+        with span("chat.retrieve", index=stages.index, fn=fn.__name__, n_results=kwargs.get("n_results")):
+            result = fn(**kwargs)
+        return result, time.perf_counter() - t_start
+
+    def _retrieve_federated(self, *, index_names: List[str], query_text: str, n_results: int = 3,
+                            min_rel: float = 0.5, search_params: Optional[Dict] = None):
+        """Query nhiều index song song (embed 1 lần), trả về (contexts đã merge, trạng thái từng shard, query embedding)."""
+        query_embedding = self.repo.embedding_service.embed_query(query_text)
+        contexts, shards = self.app_state.federated_search.search(
+            index_names=index_names,
+            query_text=query_text,
+            n_results=n_results,
+            min_relevance=min_rel,
+            search_params=search_params,
+            query_embedding=query_embedding,
         )
+        return contexts, shards, query_embedding
 
     async def chat_stream_sse(self, body: ChatBody):
         """Generator trả SSE chunks theo chuẩn"""
+        stages = ChatStageRecorder("federated" if body.index_names else body.index_name)
+
         async def event_gen():
-            try:
-                # ===== 1. Retrieve contexts (non-blocking) =====
-                contexts = await asyncio.to_thread(
-                    self._retrieve,
-                    index_name=body.index_name,
-                    query_text=body.query_text,
-                    n_results=body.n_results,
-                    min_rel=body.min_rel,
-                )
-
-
-                logger.info(f"📚 Retrieved {len(contexts)} contexts for streaming")
-                # Optional ping connection
-
-                # yield _sse({
-                #     "type": "ping",
-                #     "content": "start"
-                # })
-
-                # ===== 2. Build prompt =====
-                prompt = build_chat_prompt_from_template(
-                    question=body.query_text,
-                    contexts=contexts,
-                    lang=body.lang
-                )
-
-                # ===== 3. Stream answer tokens =====
-                async for chunk in stream_answer_llm(
-                        prompt=prompt,
-                        app_state=self.app_state,
-                        task="chat"
-                ):
-                    if chunk:  # Skip empty chunks
+            # Label index cho token counters (QG job tạo trong request này kế thừa qua context)
+            usage_index_var.set(stages.index)
+            with span("chat.stream", index=stages.index, session_id=body.session_id or "", lang=body.lang) as chat_span:
+                try:
+                    # QG job chạy sau khi stream answer xong: load trước checkpoint cho lang này
+                    self.app_state.prefetch_qg(body.lang)
+
+                    answer_cache = self.app_state.answer_cache
+                    cache_scope = (body.index_name, *(body.index_names or []))
+                    # Chụp trước retrieve: index đổi sau lúc này -> không put answer vào cache
+                    cache_generation = answer_cache.generation(cache_scope) if answer_cache is not None else None
+
+                    # ===== 1. Retrieve contexts (non-blocking) =====
+                    search_params = {"nprobe": body.nprobe} if body.nprobe else None
+                    # Cả lớp hỏi cùng 1 câu cùng lúc -> 1 lần retrieve dùng chung (single-flight)
+                    flight_key = (body.query_text.strip(), body.n_results, body.min_rel, body.nprobe)
+                    t_retrieve = time.perf_counter()
+                    if body.index_names:
+                        # Federated: index_name + index_names, shard chậm trả partial results
+                        index_names = [body.index_name, *body.index_names]
+                        (contexts, shards, query_embedding), exec_s = await self.app_state.singleflight.do(
+                            "retrieve", (tuple(index_names), *flight_key),
+                            lambda: asyncio.to_thread(
+                                self._timed, stages, self._retrieve_federated,
+                                index_names=index_names,
+                                query_text=body.query_text,
+                                n_results=body.n_results,
+                                min_rel=body.min_rel,
+                                search_params=search_params,
+                            ),
+                        )
                         yield _sse({
-                            "type": "token",
-                            "content": chunk,
+                            "type": "shards",
+                            "data": shards,
                         })
+                    else:
+                        (contexts, query_embedding), exec_s = await self.app_state.singleflight.do(
+                            "retrieve", (body.index_name, *flight_key),
+                            lambda: asyncio.to_thread(
+                                self._timed, stages, self._retrieve,
+                                index_name=body.index_name,
+                                query_text=body.query_text,
+                                n_results=body.n_results,
+                                min_rel=body.min_rel,
+                                search_params=search_params,
+                            ),
+                        )
+                    # Kết quả dùng chung giữa các request -> copy trước khi dùng
+                    contexts = [dict(c) for c in contexts]
+                    # Follower tham gia muộn đợi ít hơn exec_s của leader -> wait = 0
+                    wait_s = max(0.0, time.perf_counter() - t_retrieve - exec_s)
+                    stages.observe("retrieval_wait", wait_s)
+                    stages.observe("retrieval_exec", exec_s)
+                    stages.contexts(len(contexts))
+                    chat_span.set(n_contexts=len(contexts), retrieval_wait_ms=round(wait_s * 1000, 3))
 
-                # ===== 4. Send contexts (after answer complete) =====
-                yield _sse({
-                    "type": "contexts",
-                    "data": [
-                        {
-                            "source": c.get("source"),
-                            "page": c.get("page"),
-                            "preview": c.get("text", "")[:200],
-                            "score": c.get("score")
-                        }
-                        for c in contexts
-                    ]
-                })
-
-                # ===== 5. Trigger QG background job =====
-                try:
-                    job_id = await self.app_state.bq.enqueue_qg(
-                        seed_question=body.query_text,
-                        contexts=contexts,
-                        lang=body.lang,
-                        session_id=getattr(body, "session_id", "default"),
-                        app_state=self.app_state,
+
+                    logger.info(f"📚 Retrieved {len(contexts)} contexts for streaming")
+                    # Optional ping connection
+
+                    # yield _sse({
+                    #     "type": "ping",
+                    #     "content": "start"
+                    # })
+
+                    # ===== 2. Build prompt =====
+                    with stages.stage("prompt_build"), span("chat.prompt_build"):
+                        prompt = build_chat_prompt_from_template(
+                            question=body.query_text,
+                            contexts=contexts,
+                            lang=body.lang
+                        )
+                    stages.prompt(prompt)
+
+                    # ===== 3. Stream answer tokens =====
+                    cached = None
+                    if answer_cache is not None:
+                        with stages.stage("answer_cache_lookup"):
+                            # query_embedding: vector đã dùng để retrieve (single-flight dùng chung, chỉ đọc)
+                            cached = answer_cache.lookup(cache_scope, query_embedding, contexts, body.lang)
+
+                    if cached is not None:
+                        # Cache hit: replay answer cũ theo từng từ, không gọi LLM
+                        answer, similarity = cached
+                        stages.provider = "answer_cache"
+                        # Không gọi provider -> 0 token
+                        usage, model_name = TokenUsage(0, 0, "provider", "provider"), "answer_cache"
+                        logger.info(f"♻️ Answer cache hit (similarity={similarity:.3f})")
+                        yield _sse({
+                            "type": "answer_cache",
+                            "similarity": round(similarity, 4),
+                        })
+                        for chunk in _REPLAY_TOKEN.findall(answer):
+                            yield _sse({
+                                "type": "token",
+                                "content": chunk,
+                            })
+                    else:
+                        answer_parts = []
+                        route_info: Dict = {}
+                        t_llm = time.perf_counter()
+                        async for chunk in stream_answer_llm(
+                                prompt=prompt,
+                                app_state=self.app_state,
+                                task="chat",
+                                route_info=route_info,
+                                latency_requirement="low",
+                        ):
+                            if stages.provider == "none":
+                                # Chunk đầu tiên: router đã chọn xong provider thắng
+                                stages.provider = route_info["provider"]
+                                stages.observe("routing", route_info["routing_s"])
+                                stages.observe("ttft", time.perf_counter() - t_llm)
+                            if chunk:  # Skip empty chunks
+                                stages.token()
+                                answer_parts.append(chunk)
+                                yield _sse({
+                                    "type": "token",
+                                    "content": chunk,
+                                })
+                        answer = "".join(answer_parts)
+                        usage = route_info.get("usage") or TokenUsage()
+                        model_name = self.app_state.llm_registry.get(route_info["provider"]).model_name \
+                            if route_info.get("provider") else None
+                        if answer_cache is not None:
+                            answer_cache.put(
+                                cache_scope, body.query_text, query_embedding, contexts, body.lang, answer,
+                                generation=cache_generation,
+                            )
+
+                    self._record_turn(body, answer, model_name, usage, len(contexts), cached is not None)
+                    chat_span.set(
+                        provider=stages.provider,
+                        prompt_chars=len(prompt),
+                        tokens_in=usage.prompt_tokens or 0,
+                        tokens_out=usage.completion_tokens or 0,
                     )
-                    logger.info(job_id)
-                    # Yield for client to know where the job located (job_id), then the client need to call an API with the job_id
-                    # to get the question generate result
+
+                    # ===== 4. Send contexts (after answer complete) =====
                     yield _sse({
-                        "type": "qg_job",
-                        "job_id": job_id,
-                        "poll_url": f"/api/chat/qg/{job_id}"
+                        "type": "contexts",
+                        "data": [
+                            {
+                                "source": c.get("source"),
+                                "page": c.get("page"),
+                                "preview": c.get("text", "")[:200],
+                                "score": c.get("score"),
+                                "index_name": c.get("index_name", body.index_name),
+                            }
+                            for c in contexts
+                        ]
+                    })
+
+                    # ===== 5. Trigger QG background job =====
+                    try:
+                        job_id = await self.app_state.bq.enqueue_qg(
+                            seed_question=body.query_text,
+                            contexts=contexts,
+                            lang=body.lang,
+                            session_id=body.session_id or "default",
+                            app_state=self.app_state,
+                            index_name=stages.index,
+                        )
+                        logger.info(job_id)
+                        # Yield for client to know where the job located (job_id), then the client need to call an API with the job_id
+                        # to get the question generate result
+                        yield _sse({
+                            "type": "qg_job",
+                            "job_id": job_id,
+                            "poll_url": f"/api/chat/qg/{job_id}"
+                        })
+                    except Exception as e:
+                        logger.warning(f"QG job enqueue failed: {e}")
+                        # Không crash stream nếu QG fail
+
+                except ProviderOverloaded as e:
+                    # SSE đã trả 200 -> báo quá tải trong event để client retry sau
+                    logger.warning(f"LLM provider overloaded: {e}")
+                    chat_span.record_error(e)
+                    yield _sse({
+                        "type": "error",
+                        "content": str(e),
+                        "status": e.status_code,
+                        "retry_after": e.retry_after,
                     })
                 except Exception as e:
-                    logger.warning(f"QG job enqueue failed: {e}")
-                    # Không crash stream nếu QG fail
-
-            except Exception as e:
-                logger.exception("Streaming error")
-                yield _sse({
-                    "type": "error",
-                    "content": str(e)
-                })
-            finally:
-                yield _sse("[DONE]")
+                    logger.exception("Streaming error")
+                    chat_span.record_error(e)
+                    yield _sse({
+                        "type": "error",
+                        "content": str(e)
+                    })
+                finally:
+                    stages.finish()
+                    yield _sse("[DONE]")
 
         # ==== HTTP response (bắt buộc cho SSE) ====
         headers = {
@@ -139,6 +295,33 @@ class ChatService:
         return StreamingResponse(event_gen(), media_type="text/event-stream", headers=headers)
         # StreamingResponse Receive AsyncIterable object to return streaming response.
 
+    def _record_turn(self, body: ChatBody, answer: str, model_name: Optional[str], usage: TokenUsage,
+                     n_contexts: int, from_cache: bool):
+        """
+        Lưu lượt hỏi / đáp vào history của session client gửi lên; số token nằm ở lượt
+        assistant (1 lượt = 1 call provider). Không có session_id -> chỉ ghi metrics / span.
+        """
+        if self.chat_history is None or not body.session_id:
+            return
+        self.chat_history.append(body.session_id, ChatTurn(
+            role="user",
+            question=body.query_text,
+            index_name=body.index_name,
+        ))
+        self.chat_history.append(body.session_id, ChatTurn(
+            role="assistant",
+            answer_text=answer,
+            model_name=model_name,
+            index_name=body.index_name,
+            tokens_in=usage.prompt_tokens,
+            tokens_out=usage.completion_tokens,
+            meta={
+                "token_source": {"in": usage.prompt_source, "out": usage.completion_source},
+                "n_contexts": n_contexts,
+                "answer_cache": from_cache,
+            },
+        ))
+
     async def _summarize_learning_flow(self, sess) -> str:
         """
         Gọi LLM tạo tóm tắt lũy tiến:
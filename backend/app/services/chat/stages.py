@@ -0,0 +1,53 @@
+"""
+Đo thời gian từng stage của chat_stream_sse vào Prometheus.
+
+Stage: retrieval_wait (chờ thread pool / single-flight trước khi retrieve chạy),
+retrieval_exec, prompt_build, answer_cache_lookup, routing, ttft, stream_total.
+Label index = index của request ("federated" khi query nhiều index), provider =
+provider thắng (chưa route -> "none", replay từ answer cache -> "answer_cache").
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from ask_forge.backend.app.core.metrics import (
+    CHAT_CONTEXTS,
+    CHAT_INTER_TOKEN_SECONDS,
+    CHAT_PROMPT_CHARS,
+    CHAT_STAGE_SECONDS,
+)
+
+
+class ChatStageRecorder:
+    def __init__(self, index: str):
+        self.index = index
+        self.provider = "none"
+        self.started_at = time.perf_counter()
+        self._last_token_at: Optional[float] = None
+
+    def observe(self, stage: str, seconds: float):
+        CHAT_STAGE_SECONDS.labels(stage, self.index, self.provider).observe(max(0.0, seconds))
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+
+    def contexts(self, n: int):
+        CHAT_CONTEXTS.labels(self.index).observe(n)
+
+    def prompt(self, prompt: str):
+        CHAT_PROMPT_CHARS.labels(self.index).observe(len(prompt))
+
+    def token(self):
+        """Gọi mỗi chunk answer: ghi khoảng cách với chunk trước."""
+        now = time.perf_counter()
+        if self._last_token_at is not None:
+            CHAT_INTER_TOKEN_SECONDS.labels(self.index, self.provider).observe(now - self._last_token_at)
+        self._last_token_at = now
+
+    def finish(self):
+        self.observe("stream_total", time.perf_counter() - self.started_at)
@@ -0,0 +1,142 @@
+"""
+Micro-batching cho query embedding.
+
+Nhiều request đồng thời (mỗi request embed 1 query trong asyncio.to_thread) được
+gom trong vài ms rồi encode thành 1 batch trên 1 thread riêng, thay vì hàng chục
+lần encode batch-size-1 tranh nhau GIL và torch threads.
+"""
+import asyncio
+import logging
+import queue
+import time
+from concurrent.futures import Future
+from threading import Lock, Thread
+from typing import Callable, List, Sequence, Any, Optional
+
+from ask_forge.backend.app.core.metrics import EMBEDDING_BATCH_SIZE, EMBEDDING_QUEUE_WAIT, EMBEDDING_BATCH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class MicroBatchEmbedder:
+    """
+    Gom các lời gọi embed 1 text thành batch.
+
+    Args:
+        encode_fn: hàm encode List[str] -> list vectors (vd. Chroma embedding function)
+        max_batch_size: số text tối đa mỗi batch
+        max_wait_ms: thời gian tối đa chờ gom thêm request sau request đầu tiên
+    """
+
+    def __init__(self,
+                 encode_fn: Callable[[List[str]], Sequence[Any]],
+                 max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0,
+                 name: str = "query"):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._close_lock = Lock()
+        self._thread = Thread(target=self._loop, name=f"embed-batcher-{name}", daemon=True)
+        self._thread.start()
+
+    # ------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------
+    def submit(self, text: str) -> Future:
+        """Đưa 1 text vào hàng đợi, trả về Future chứa vector (RuntimeError nếu đã close)."""
+        fut: Future = Future()
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError(f"Embedding batcher '{self.name}' is closed")
+            self._queue.put((text, fut, time.perf_counter()))
+        return fut
+
+    def embed(self, text: str, timeout: Optional[float] = None):
+        """Blocking: dùng trong worker thread (vd. asyncio.to_thread)."""
+        return self.submit(text).result(timeout=timeout)
+
+    async def aembed(self, text: str):
+        """Async: không chặn event loop."""
+        return await asyncio.wrap_future(self.submit(text))
+
+    def close(self):
+        """Dừng worker: request vào hàng đợi trước close vẫn được encode, submit sau đó lỗi ngay."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+    # ------------------------------------------------------------
+    # Worker
+    # ------------------------------------------------------------
+    def _collect(self, first) -> tuple[list, bool]:
+        """Gom thêm request tới khi đủ batch hoặc hết max_wait."""
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _loop(self):
+        try:
+            self._run()
+        finally:
+            self._fail_pending()
+
+    def _fail_pending(self):
+        """Future còn trong hàng đợi khi worker dừng -> lỗi, caller không bị treo."""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not _STOP and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError(f"Embedding batcher '{self.name}' is closed"))
+
+    def _run(self):
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect(first)
+
+            # Bỏ các future đã bị caller huỷ
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                EMBEDDING_QUEUE_WAIT.labels(self.name).observe(started - enqueued)
+            EMBEDDING_BATCH_SIZE.labels(self.name).observe(len(batch))
+
+            try:
+                vectors = self._encode_fn([text for text, _, _ in batch])
+            except Exception as e:
+                logger.exception("❌ Micro-batch encode failed (%d texts)", len(batch))
+                for _, fut, _ in batch:
+                    fut.set_exception(e)
+                continue
+            finally:
+                EMBEDDING_BATCH_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+
+            for (_, fut, _), vec in zip(batch, vectors):
+                fut.set_result(vec)
@@ -0,0 +1,210 @@
+"""
+ONNX Runtime backend cho model embedding (CPU).
+
+- Export transformer của EMBEDDING_MODEL sang ONNX 1 lần, cache trên disk
+  (tokenizer + meta đi kèm); pooling/normalize làm bằng numpy.
+- Optional dynamic int8 quantization (onnxruntime.quantization).
+- Mỗi biến thể (fp32/int8) được so cosine với output PyTorch khi export;
+  kết quả lưu trong validation.json nên các lần start sau không cần load torch.
+
+onnxruntime là optional dependency: `pip install onnxruntime onnx`.
+"""
+import json
+import logging
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+try:
+    import onnxruntime as ort
+except ImportError:  # pragma: no cover - optional dependency
+    ort = None
+
+# Câu mẫu dùng để so sánh output ONNX với PyTorch
+VALIDATION_TEXTS = [
+    "What is a SQL injection attack?",
+    "Explain how TLS certificate pinning protects mobile apps.",
+    "Mô tả cơ chế xác thực hai yếu tố.",
+    "buffer overflow",
+    "The quick brown fox jumps over the lazy dog. " * 8,
+    "",
+]
+
+_ONNX_OPSET = 14
+
+
+def onnx_cache_dir(root: str, model_name: str) -> Path:
+    return Path(root) / re.sub(r"[^A-Za-z0-9_.-]+", "__", model_name)
+
+
+def _model_file(model_dir: Path, quantize: bool) -> Path:
+    return model_dir / ("model.int8.onnx" if quantize else "model.onnx")
+
+
+def _variant(quantize: bool) -> str:
+    return "int8" if quantize else "fp32"
+
+
+# ------------------------------------------------------------
+# Export (cần torch + sentence-transformers)
+# ------------------------------------------------------------
+def export_onnx(st_model, model_dir: Path, quantize: bool):
+    """Export SentenceTransformer (Transformer + Pooling [+ Normalize]) sang ONNX nếu chưa có."""
+    import torch
+    from sentence_transformers import models as st_models
+
+    modules = list(st_model)
+    if not modules or not isinstance(modules[0], st_models.Transformer):
+        raise ValueError("ONNX export supports SentenceTransformer models starting with a Transformer module")
+    pooling = next((m for m in modules if isinstance(m, st_models.Pooling)), None)
+    unsupported = [type(m).__name__ for m in modules[1:]
+                   if not isinstance(m, (st_models.Pooling, st_models.Normalize))]
+    if pooling is None or unsupported:
+        raise ValueError(f"ONNX export does not support modules: {unsupported or ['<no Pooling>']}")
+    if pooling.pooling_mode_cls_token:
+        pooling_mode = "cls"
+    elif pooling.pooling_mode_mean_tokens:
+        pooling_mode = "mean"
+    else:
+        raise ValueError("ONNX export supports only mean or CLS pooling")
+
+    model_dir.mkdir(parents=True, exist_ok=True)
+    fp32_file = _model_file(model_dir, quantize=False)
+    transformer = modules[0]
+
+    if not fp32_file.exists():
+        tokenizer = transformer.tokenizer
+        auto_model = transformer.auto_model.to("cpu").eval()
+        dummy = tokenizer(["hello world"], return_tensors="pt", padding=True)
+        input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in dummy]
+
+        class _LastHiddenState(torch.nn.Module):
+            def __init__(self, model):
+                super().__init__()
+                self.model = model
+
+            def forward(self, *inputs):
+                return self.model(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+        dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names + ["last_hidden_state"]}
+        logger.info("📤 Exporting %s to ONNX at %s", transformer.auto_model.name_or_path, fp32_file)
+        with torch.no_grad():
+            torch.onnx.export(
+                _LastHiddenState(auto_model),
+                tuple(dummy[n] for n in input_names),
+                str(fp32_file),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=_ONNX_OPSET,
+                do_constant_folding=True,
+            )
+        tokenizer.save_pretrained(str(model_dir))
+        meta = {
+            "pooling": pooling_mode,
+            "max_seq_length": int(transformer.max_seq_length),
+            "dim": int(st_model.get_sentence_embedding_dimension()),
+            "input_names": input_names,
+        }
+        (model_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+
+    int8_file = _model_file(model_dir, quantize=True)
+    if quantize and not int8_file.exists():
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info("🗜️ Quantizing ONNX embedding model to int8 at %s", int8_file)
+        quantize_dynamic(str(fp32_file), str(int8_file), weight_type=QuantType.QInt8)
+
+
+# ------------------------------------------------------------
+# Validation report
+# ------------------------------------------------------------
+def read_validation(model_dir: Path, quantize: bool) -> Optional[Dict[str, Any]]:
+    path = model_dir / "validation.json"
+    if not path.exists() or not _model_file(model_dir, quantize).exists():
+        return None
+    return json.loads(path.read_text()).get(_variant(quantize))
+
+
+def validate_against_torch(encoder: "OnnxEmbeddingEncoder", st_model) -> Dict[str, Any]:
+    """Cosine giữa vector ONNX và PyTorch trên VALIDATION_TEXTS; lưu vào validation.json."""
+    reference = np.asarray(
+        st_model.encode(VALIDATION_TEXTS, normalize_embeddings=True, convert_to_numpy=True),
+        dtype=np.float32,
+    )
+    candidate = encoder.encode(VALIDATION_TEXTS)
+    cosines = (reference * candidate).sum(axis=1)
+    report = {
+        "min_cosine": round(float(cosines.min()), 6),
+        "mean_cosine": round(float(cosines.mean()), 6),
+        "n_texts": len(VALIDATION_TEXTS),
+    }
+
+    path = encoder.model_dir / "validation.json"
+    reports = json.loads(path.read_text()) if path.exists() else {}
+    reports[_variant(encoder.quantize)] = report
+    path.write_text(json.dumps(reports, indent=2))
+    return report
+
+
+# ------------------------------------------------------------
+# Inference (chỉ cần onnxruntime + tokenizer)
+# ------------------------------------------------------------
+class OnnxEmbeddingEncoder:
+    """Encode text bằng ONNX Runtime (CPUExecutionProvider), output đã L2-normalize."""
+
+    def __init__(self, model_dir: Path, quantize: bool = False, num_threads: int = 0):
+        if ort is None:
+            raise RuntimeError("EMBEDDING_BACKEND=onnx requires onnxruntime (pip install onnxruntime onnx)")
+        from transformers import AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        self.quantize = quantize
+        self.meta = json.loads((self.model_dir / "meta.json").read_text())
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads > 0:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            str(_model_file(self.model_dir, quantize)),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+    @property
+    def dimension(self) -> int:
+        return int(self.meta["dim"])
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        features = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.meta["max_seq_length"],
+            return_tensors="np",
+        )
+        inputs = {name: features[name].astype(np.int64) for name in self.meta["input_names"]}
+        hidden = self.session.run(["last_hidden_state"], inputs)[0]
+
+        if self.meta["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = features["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.concatenate([
+            self._encode_batch(list(texts[i:i + batch_size]))
+            for i in range(0, len(texts), batch_size)
+        ])
@@ -0,0 +1,256 @@
+"""
+Embedding service dùng chung - 1 bản model embedding cho cả process.
+
+ChromaRepo / LocalVectorRepo và LangChainState đều đi qua service này
+(qua adapter tương ứng) thay vì mỗi nơi tự load 1 bản SentenceTransformer.
+Service quyết định backend (torch | onnx), device, số threads, batch size
+và micro-batching cho query đơn lẻ.
+"""
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from threading import Lock, local
+from typing import List, Optional
+
+import numpy as np
+from chromadb import Documents, EmbeddingFunction, Embeddings
+from langchain_core.embeddings import Embeddings as LangChainEmbeddings
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.embedding.batcher import MicroBatchEmbedder
+from ask_forge.backend.app.services.embedding.onnx_backend import (
+    OnnxEmbeddingEncoder,
+    export_onnx,
+    onnx_cache_dir,
+    read_validation,
+    validate_against_torch,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _resolve_device(device: str) -> str:
+    if device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+class EmbeddingService:
+    """
+    Sở hữu model embedding. Model được load lazy ở lần encode đầu tiên
+    (hoặc chủ động qua `load()` lúc startup).
+
+    Vector trả về luôn được L2-normalize (collection dùng cosine nên không đổi kết quả).
+    """
+
+    def __init__(self,
+                 model_name: Optional[str] = None,
+                 backend: Optional[str] = None,
+                 device: Optional[str] = None,
+                 num_threads: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.model_name = model_name or settings.EMBEDDING_MODEL
+        self.backend = backend or settings.EMBEDDING_BACKEND
+        if self.backend not in ("torch", "onnx"):
+            raise ValueError(f"Unsupported EMBEDDING_BACKEND: {self.backend}")
+        self.device = device or settings.EMBEDDING_DEVICE
+        self.num_threads = num_threads if num_threads is not None else settings.EMBEDDING_NUM_THREADS
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+
+        self._model = None
+        self._onnx: Optional[OnnxEmbeddingEncoder] = None
+        self._load_lock = Lock()
+        self._thread_state = local()
+        self._query_batcher: Optional[MicroBatchEmbedder] = None
+        self._start_query_batcher()
+
+    # ------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None or self._onnx is not None
+
+    @property
+    def active_backend(self) -> Optional[str]:
+        if self._onnx is not None:
+            return "onnx-int8" if self._onnx.quantize else "onnx"
+        return "torch" if self._model is not None else None
+
+    def _start_query_batcher(self):
+        if settings.EMBEDDING_MICROBATCH_ENABLED and self._query_batcher is None:
+            self._query_batcher = MicroBatchEmbedder(
+                self.embed_documents,
+                max_batch_size=settings.EMBEDDING_MICROBATCH_MAX_SIZE,
+                max_wait_ms=settings.EMBEDDING_MICROBATCH_MAX_WAIT_MS,
+            )
+
+    def load(self):
+        """Load model (idempotent, thread-safe) và warmup 1 lần encode."""
+        if self._query_batcher is None and settings.EMBEDDING_MICROBATCH_ENABLED:
+            # Instance là singleton (lru_cache): sau close() của lifespan trước -> tạo lại micro-batcher
+            with self._load_lock:
+                self._start_query_batcher()
+        if self.is_loaded:
+            return
+        with self._load_lock:
+            if self.is_loaded:
+                return
+            t0 = time.perf_counter()
+            if self.backend == "onnx":
+                try:
+                    self._load_onnx()
+                except Exception as e:
+                    logger.warning("⚠️ ONNX embedding backend unavailable, falling back to torch: %s", e)
+            if self._onnx is None:
+                self._load_torch()
+
+            self._encode(["warmup"])
+            logger.info(
+                "✅ Embedding model loaded: %s (backend=%s, dim=%d) in %.2fs",
+                self.model_name, self.active_backend, self.dimension, time.perf_counter() - t0,
+            )
+
+    def _load_torch(self):
+        if self._model is not None:
+            return self._model
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(self.model_name, device=_resolve_device(self.device))
+        return self._model
+
+    def _load_onnx(self):
+        """Export/quantize lần đầu (cần torch để so sánh), các lần sau chỉ load ONNX."""
+        quantize = settings.EMBEDDING_ONNX_QUANTIZE
+        model_dir = onnx_cache_dir(settings.EMBEDDING_ONNX_DIR, self.model_name)
+
+        report = read_validation(model_dir, quantize)
+        encoder = None
+        if report is None:
+            st_model = self._load_torch()
+            export_onnx(st_model, model_dir, quantize)
+            encoder = OnnxEmbeddingEncoder(model_dir, quantize, self.num_threads)
+            report = validate_against_torch(encoder, st_model)
+            logger.info("🔍 ONNX vs torch cosine: min=%.5f mean=%.5f",
+                        report["min_cosine"], report["mean_cosine"])
+
+        if report["min_cosine"] < settings.EMBEDDING_ONNX_MIN_COSINE:
+            raise RuntimeError(
+                f"ONNX output diverges from torch (min cosine {report['min_cosine']:.5f} "
+                f"< {settings.EMBEDDING_ONNX_MIN_COSINE})"
+            )
+        self._onnx = encoder or OnnxEmbeddingEncoder(model_dir, quantize, self.num_threads)
+        # Không giữ torch weights khi đã chạy bằng ONNX
+        self._model = None
+
+    def close(self):
+        """Dừng micro-batcher; load() sau đó (lifespan mới) tạo lại."""
+        batcher, self._query_batcher = self._query_batcher, None
+        if batcher is not None:
+            batcher.close()
+
+    @property
+    def dimension(self) -> int:
+        self.load()
+        if self._onnx is not None:
+            return self._onnx.dimension
+        return int(self._model.get_sentence_embedding_dimension())
+
+    # ------------------------------------------------------------
+    # Encoding
+    # ------------------------------------------------------------
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode 1 batch text -> ma trận float32 (n, dim) đã normalize."""
+        self.load()
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return self._encode(list(texts))
+
+    def _apply_torch_threads(self):
+        """
+        Số intra-op threads (OpenMP) là per-OS-thread: set trong chính thread encode
+        để không đụng tới threads của QG model (xem QG_NUM_THREADS).
+        """
+        if self.num_threads <= 0 or getattr(self._thread_state, "configured", False):
+            return
+        import torch
+        torch.set_num_threads(self.num_threads)
+        self._thread_state.configured = True
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._onnx is not None:
+            return self._onnx.encode(texts, batch_size=self.batch_size)
+        self._apply_torch_threads()
+        vectors = self._model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """1 query: đi qua micro-batcher để gom với các request đồng thời."""
+        if self._query_batcher is not None:
+            return self._query_batcher.embed(text)
+        return self.encode([text])[0]
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        """Như embed_query nhưng không chặn event loop."""
+        if self._query_batcher is not None:
+            return await self._query_batcher.aembed(text)
+        return (await asyncio.to_thread(self.encode, [text]))[0]
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Nhiều query: đã là batch, encode trực tiếp 1 forward pass."""
+        if len(texts) == 1:
+            return self.embed_query(texts[0])[None, :]
+        return self.encode(texts)
+
+    # ------------------------------------------------------------
+    # Adapters
+    # ------------------------------------------------------------
+    def as_chroma(self) -> "ChromaEmbeddingAdapter":
+        return ChromaEmbeddingAdapter(self)
+
+    def as_langchain(self) -> "LangChainEmbeddingAdapter":
+        return LangChainEmbeddingAdapter(self)
+
+
+class ChromaEmbeddingAdapter(EmbeddingFunction[Documents]):
+    """Chroma embedding function trên EmbeddingService."""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return self.service.embed_documents(list(input)).tolist()
+
+
+class LangChainEmbeddingAdapter(LangChainEmbeddings):
+    """LangChain Embeddings trên EmbeddingService."""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.service.embed_documents(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.service.embed_query(text).tolist()
+
+
+# ---- The SINGLE way to obtain EmbeddingService everywhere ----
+@lru_cache(maxsize=1)
+def get_embedding_service() -> EmbeddingService:
+    if settings.MODEL_SERVER_ENABLED:
+        # Model nằm trong model server process; API worker chỉ giữ client
+        from ask_forge.backend.app.services.model_server.client import RemoteEmbeddingService
+        return RemoteEmbeddingService()
+    return EmbeddingService()
@@ -6,6 +6,7 @@ from typing import List, Dict, Any, Tuple
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
 from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.tracing import span
 from ask_forge.backend.app.services.indexing.pdf_loader import load_pdfs
 from ask_forge.backend.app.services.indexing.chunking import split_and_filter
 from ask_forge.backend.app.utils.io import write_pages_json, read_pages_json
@@ -25,29 +26,36 @@ async def build_index(
            repo: ChromaRepo instance (injected)
     """
 
-    docs_per_file = await load_pdfs(files)
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=settings.CHUNK_SIZE,
-        chunk_overlap=settings.CHUNK_OVERLAP,
-    )
+    with span("index.build", index=index_name) as build_span:
+        with span("index.load_pdfs", n_files=len(files)):
+            docs_per_file = await load_pdfs(files)
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+        )
 
-    all_chunks: List[Dict[str, Any]] = []
-    metrics_sum = {"total_pages": 0,
-                   "total_raw_chunks": 0,
-                   "kept_chunks_after_min_chars": 0
-    }
+        all_chunks: List[Dict[str, Any]] = []
+        metrics_sum = {"total_pages": 0,
+                       "total_raw_chunks": 0,
+                       "kept_chunks_after_min_chars": 0
+        }
 
-    for fname, docs in docs_per_file:
-        doc_chunks, m = split_and_filter(fname, docs, splitter, settings.MIN_CHARS)
-        all_chunks.append(doc_chunks)
-        for k in metrics_sum:
-            metrics_sum[k] += m[k]
+        with span("index.split") as split_span:
+            for fname, docs in docs_per_file:
+                doc_chunks, m = split_and_filter(fname, docs, splitter, settings.MIN_CHARS)
+                all_chunks.append(doc_chunks)
+                for k in metrics_sum:
+                    metrics_sum[k] += m[k]
+            split_span.set(**metrics_sum)
 
-    # Save to JSON
-    write_pages_json(index_name, all_chunks)
+        # Save to JSON
+        with span("index.write_json"):
+            write_pages_json(index_name, all_chunks)
 
-    # upsert to Chroma (use singleton repo)
-    repo.upsert(index_name, all_chunks)
+        # upsert to Chroma (use singleton repo)
+        with span("index.upsert", n_chunks=metrics_sum["kept_chunks_after_min_chars"]):
+            repo.upsert(index_name, all_chunks)
+        build_span.set(n_files=len(docs_per_file), n_chunks=metrics_sum["kept_chunks_after_min_chars"])
 
     return all_chunks, metrics_sum
 
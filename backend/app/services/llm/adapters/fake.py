@@ -0,0 +1,115 @@
+# backend/app/services/llm/adapters/fake.py
+"""
+FakeLLMProvider - provider giả lập, deterministic, dùng để load-test offline.
+
+- Nội dung output chỉ phụ thuộc (seed, prompt): cùng prompt -> cùng tokens.
+- TTFT / inter-token latency / độ dài output cấu hình được (FAKE_LLM_*), jitter
+  tuỳ chọn cũng lấy từ RNG đã seed.
+- Lỗi được inject theo FAKE_LLM_ERROR_RATE từ 1 RNG riêng của provider (seed cố định)
+  -> cùng thứ tự request cho cùng chuỗi lỗi.
+- generate(..., n=...) trả về List[str] (interface của QG), không có n trả về str.
+- Báo completion tokens = số token sinh ra (prompt tokens để layer ước lượng).
+
+Bật bằng FAKE_LLM_ENABLED; FAKE_LLM_REPLACE chọn các provider trong registry bị thay.
+"""
+import asyncio
+import hashlib
+import random
+from typing import AsyncIterator, List, Optional, Union
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.usage import TokenUsage
+
+_WORDS = (
+    "dữ liệu mô hình câu hỏi bài học kiến thức ví dụ hệ thống mạng bảo mật thuật toán "
+    "phân tích tài liệu khái niệm định nghĩa quy trình kiểm tra kết quả giải thích"
+).split()
+
+
+class FakeLLMInjectedError(RuntimeError):
+    pass
+
+
+class FakeLLMProvider(LLMProvider):
+    def __init__(self,
+                 name: str = "fake",
+                 ttft_ms: Optional[float] = None,
+                 itl_ms: Optional[float] = None,
+                 output_tokens: Optional[int] = None,
+                 error_rate: Optional[float] = None,
+                 jitter: Optional[float] = None,
+                 seed: Optional[int] = None):
+        self.name = name
+        self.ttft_s = (settings.FAKE_LLM_TTFT_MS if ttft_ms is None else ttft_ms) / 1000.0
+        self.itl_s = (settings.FAKE_LLM_ITL_MS if itl_ms is None else itl_ms) / 1000.0
+        self.output_tokens = output_tokens or settings.FAKE_LLM_OUTPUT_TOKENS
+        self.error_rate = settings.FAKE_LLM_ERROR_RATE if error_rate is None else error_rate
+        self.jitter = settings.FAKE_LLM_JITTER if jitter is None else jitter  # ±tỉ lệ quanh TTFT / ITL
+        self.seed = settings.FAKE_LLM_SEED if seed is None else seed
+        self._error_rng = random.Random(self.seed)
+
+    # ------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------
+    def _rng(self, prompt: str) -> random.Random:
+        digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()
+        return random.Random(int.from_bytes(digest[:8], "big"))
+
+    def _delay(self, base_s: float, rng: random.Random) -> float:
+        if self.jitter <= 0:
+            return base_s
+        return max(0.0, base_s * (1.0 + rng.uniform(-self.jitter, self.jitter)))
+
+    def _maybe_fail(self):
+        if self.error_rate > 0 and self._error_rng.random() < self.error_rate:
+            raise FakeLLMInjectedError(f"{self.name}: injected error")
+
+    def _tokens(self, rng: random.Random, n_tokens: int) -> List[str]:
+        return [rng.choice(_WORDS) + " " for _ in range(n_tokens)]
+
+    # ------------------------------------------------------------
+    # LLMProvider
+    # ------------------------------------------------------------
+    async def generate(self, prompt: str, n: Optional[int] = None, usage: Optional[TokenUsage] = None,
+                       **kwargs) -> Union[str, List[str]]:
+        rng = self._rng(prompt)
+        await asyncio.sleep(self._delay(self.ttft_s + self.itl_s * self.output_tokens, rng))
+        self._maybe_fail()
+        if n is None:
+            if usage is not None:
+                usage.report(completion_tokens=self.output_tokens)
+            return "".join(self._tokens(rng, self.output_tokens)).strip()
+
+        # QG: n câu hỏi, mỗi câu ~ output_tokens / n từ
+        per_question = max(3, self.output_tokens // max(n, 1))
+        if usage is not None:
+            usage.report(completion_tokens=per_question * n)
+        return [
+            "".join(self._tokens(rng, per_question)).strip().capitalize() + "?"
+            for _ in range(n)
+        ]
+
+    async def generate_stream(self, prompt: str, usage: Optional[TokenUsage] = None,
+                              **kwargs) -> AsyncIterator[str]:
+        rng = self._rng(prompt)
+        await asyncio.sleep(self._delay(self.ttft_s, rng))
+        self._maybe_fail()
+        for i, token in enumerate(self._tokens(rng, self.output_tokens)):
+            if i:
+                await asyncio.sleep(self._delay(self.itl_s, rng))
+            yield token
+        if usage is not None:
+            usage.report(completion_tokens=self.output_tokens)
+
+    @property
+    def model_name(self) -> str:
+        return f"fake:{self.name}"
+
+    @property
+    def supports_streaming(self) -> bool:
+        return True
+
+    async def aclose(self):
+        """Không giữ connection nào; có để thay thế gemini_service khi shutdown."""
+        pass
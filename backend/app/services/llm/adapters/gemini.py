@@ -1,43 +1,156 @@
 # backend/app/services/llm/adapters/gemini.py
+"""
+Gemini adapter trên async API của SDK (client.aio): mỗi request/stream là 1
+coroutine trên event loop, dùng chung 1 connection pool httpx (keep-alive) thay
+vì 1 thread / request.
+
+SDK cũ không có client.aio / HttpOptions.async_client_args -> fallback chạy
+sync API trên executor riêng của provider (xem governor.py).
+"""
 import asyncio
-from typing import AsyncIterator
+import logging
+import threading
+from typing import AsyncIterator, Optional
+
 import google.genai as genai
+import httpx
+from google.genai import types
 
+from ask_forge.backend.app.core.tracing import bind_context
 from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.usage import TokenUsage
 from ask_forge.backend.app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
+
+def _http_options():
+    """Connection pool dùng chung cho mọi request async (limits + keep-alive cấu hình được)."""
+    return types.HttpOptions(
+        timeout=int(settings.GEMINI_HTTP_TIMEOUT_S * 1000),  # ms
+        async_client_args={
+            "limits": httpx.Limits(
+                max_connections=settings.GEMINI_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.GEMINI_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.GEMINI_HTTP_KEEPALIVE_EXPIRY_S,
+            ),
+        },
+    )
+
+
+def _report_usage(usage: Optional[TokenUsage], response):
+    """usage_metadata của response / chunk (stream: chunk cuối mang tổng số token)."""
+    meta = getattr(response, "usage_metadata", None)
+    if usage is None or meta is None:
+        return
+    usage.report(
+        prompt_tokens=getattr(meta, "prompt_token_count", None),
+        completion_tokens=getattr(meta, "candidates_token_count", None),
+    )
+
 
 class GeminiAdapter(LLMProvider):
     def __init__(self):
-        self._client = genai.Client(api_key=settings.GEMINI_API_KEY)
         self._model_name = settings.GEMINI_MODEL_NAME
+        self._async = settings.GEMINI_ASYNC
+        try:
+            self._client = genai.Client(api_key=settings.GEMINI_API_KEY, http_options=_http_options())
+            self._async = self._async and hasattr(self._client, "aio")
+        except Exception as e:  # SDK cũ: HttpOptions chưa có async_client_args
+            logger.warning(f"⚠️ Gemini async client unavailable ({e}), using threaded sync client")
+            self._client = genai.Client(api_key=settings.GEMINI_API_KEY)
+            self._async = False
+
+    async def generate(self, prompt: str, usage: Optional[TokenUsage] = None, **kwargs) -> str:
+        if self._async:
+            response = await self._client.aio.models.generate_content(
+                model=self._model_name,
+                contents=prompt,
+            )
+            _report_usage(usage, response)
+            return getattr(response, "text", "")
 
-    async def generate(self, prompt: str, **kwargs) -> str:
         loop = asyncio.get_running_loop()
-        # Gemini SDK chưa async native → wrap in executor
+        # Fallback sync SDK → wrap in executor (executor riêng của provider, xem governor.py)
         response = await loop.run_in_executor(
-            None,
-            lambda: self._client.models.generate_content(
+            self.executor,
+            bind_context(
+                self._client.models.generate_content,
                 model=self._model_name,
-                contents=prompt
-            )
+                contents=prompt,
+            ),
         )
+        _report_usage(usage, response)
         return getattr(response, "text", "")
 
-    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
-        def sync_gen():
-            stream = self._client.models.generate_content_stream(
-                model=self._model_name,
-                contents=prompt,
-            )
-            for event in stream:
+    async def generate_stream(self, prompt: str, usage: Optional[TokenUsage] = None,
+                              **kwargs) -> AsyncIterator[str]:
+        if not self._async:
+            async for chunk in self._generate_stream_threaded(prompt, usage):
+                yield chunk
+            return
+
+        stream = await self._client.aio.models.generate_content_stream(
+            model=self._model_name,
+            contents=prompt,
+        )
+        try:
+            async for event in stream:
+                _report_usage(usage, event)
                 chunk = getattr(event, "text", None)
                 if chunk:
-                    yield chunk
+                    yield chunk  # yield từng token ra ngoài (bắt SSE gửi ngay)
+        finally:
+            # Consumer bỏ stream (cancel / client ngắt) -> đóng response, trả connection về pool
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    async def _generate_stream_threaded(self, prompt: str,
+                                        usage: Optional[TokenUsage] = None) -> AsyncIterator[str]:
+        """
+        Sync SDK stream chạy trong thread riêng, đẩy chunk về event loop
+        qua asyncio.Queue -> chờ token không chặn loop (hedge / các request khác vẫn chạy).
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+
+        def pump():
+            try:
+                stream = self._client.models.generate_content_stream(
+                    model=self._model_name,
+                    contents=prompt,
+                )
+                for event in stream:
+                    if stop.is_set():  # consumer đã bỏ stream (cancel / client ngắt)
+                        break
+                    _report_usage(usage, event)
+                    chunk = getattr(event, "text", None)
+                    if chunk:
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+        loop.run_in_executor(self.executor, bind_context(pump))
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
 
-        for chunk in sync_gen():  # chạy sync
-            yield chunk  # yield từng token ra ngoài (bắt SSE gửi ngay)
-            await asyncio.sleep(0)  # nhường event loop
+    async def aclose(self):
+        """Đóng connection pool async (gọi khi app shutdown)."""
+        aclose = getattr(getattr(self._client, "aio", None), "aclose", None)
+        if self._async and aclose is not None:
+            await aclose()
 
     @property
     def model_name(self) -> str:
@@ -45,4 +158,4 @@ class GeminiAdapter(LLMProvider):
 
     @property
     def supports_streaming(self) -> bool:
-        return True
\ No newline at end of file
+        return True
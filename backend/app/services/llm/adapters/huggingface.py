@@ -4,7 +4,9 @@ import torch
 from typing import AsyncIterator, Optional
 from transformers import AutoTokenizer, AutoModelForCausalLM
 
+from ask_forge.backend.app.core.tracing import bind_context
 from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.usage import TokenUsage
 from ask_forge.backend.app.core.config import settings
 
 
@@ -36,12 +38,13 @@ class HuggingFaceAdapter(LLMProvider):
                 ).eval()
                 return tok, model
 
-            self._tokenizer, self._model = await loop.run_in_executor(None, _load)
+            self._tokenizer, self._model = await loop.run_in_executor(self.executor, _load)
 
     async def generate(
             self,
             prompt: str,
             max_tokens: int = 512,
+            usage: Optional[TokenUsage] = None,
             **kwargs
     ) -> str:
         await self._ensure_loaded()
@@ -58,11 +61,15 @@ class HuggingFaceAdapter(LLMProvider):
                     pad_token_id=self._tokenizer.eos_token_id,
                     repetition_penalty=1.1
                 )
+            if usage is not None:
+                prompt_len = inputs["input_ids"].shape[1]
+                usage.report(prompt_tokens=prompt_len, completion_tokens=outputs.shape[1] - prompt_len)
             return self._tokenizer.decode(outputs[0], skip_special_tokens=True)
 
-        return await loop.run_in_executor(None, _gen)
+        return await loop.run_in_executor(self.executor, bind_context(_gen))
 
-    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+    async def generate_stream(self, prompt: str, usage: Optional[TokenUsage] = None,
+                              **kwargs) -> AsyncIterator[str]:
         # HF TextIteratorStreamer cho streaming
         from transformers import TextIteratorStreamer
         from threading import Thread
@@ -76,6 +83,8 @@ class HuggingFaceAdapter(LLMProvider):
         )
 
         inputs = self._tokenizer([prompt], return_tensors="pt").to(self._model.device)
+        if usage is not None:
+            usage.report(prompt_tokens=inputs["input_ids"].shape[1])
 
         def _generate():
             self._model.generate(
@@ -0,0 +1,41 @@
+# backend/app/services/llm/adapters/managed_qg.py
+import logging
+from typing import AsyncIterator, List, Optional
+
+from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.model_manager import ModelManager, qg_checkpoint_for
+
+logger = logging.getLogger(__name__)
+
+
+class ManagedQuestionGenerator(LLMProvider):
+    """
+    Question generator nhiều checkpoint (theo lang, QG_CHECKPOINTS) trên ModelManager:
+    mỗi request chọn checkpoint rồi acquire model từ manager (load lazy / evict LRU).
+    """
+
+    def __init__(self, manager: ModelManager):
+        self.manager = manager
+
+    async def _ensure_loaded(self):
+        """Load checkpoint mặc định (dùng cho HF_PRELOAD_AT_STARTUP); checkpoint lỗi -> startup fail."""
+        await self.manager.load(qg_checkpoint_for())
+
+    def prefetch(self, lang: Optional[str] = None):
+        self.manager.schedule_prefetch(qg_checkpoint_for(lang))
+
+    async def generate(self, prompt: str, lang: str = "vi", **kwargs) -> List[str]:
+        # kwargs gồm usage= của InstrumentedProvider -> adapter báo số token thật
+        async with self.manager.acquire(qg_checkpoint_for(lang)) as adapter:
+            return await adapter.generate(prompt, lang=lang, **kwargs)
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        raise NotImplementedError("QG does not support streaming")
+
+    @property
+    def model_name(self) -> str:
+        return f"managed:hf:{qg_checkpoint_for()}"
+
+    @property
+    def supports_streaming(self) -> bool:
+        return False
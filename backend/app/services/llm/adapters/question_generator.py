@@ -1,18 +1,88 @@
 # backend/app/services/llm/adapters/question_generator.py
 import asyncio
+import copy
+import gc
+import hashlib
+import threading
+import time
 import torch
-from typing import AsyncIterator, Optional, Dict, List
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Optional, Dict, List, Tuple
+from transformers import AutoTokenizer, AutoModelForCausalLM, DynamicCache
 
 import logging
 from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.usage import TokenUsage
 from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import QG_DRAFT_ACCEPTANCE, QG_TOKENS_PER_SECOND
+from ask_forge.backend.app.core.tracing import bind_context
 import re  # Thêm vào đầu file
 
 from ask_forge.backend.app.services.qg.prompts.templates import build_queries_prompt_from_template
 
 logger = logging.getLogger(__name__)
 
+# Số prompt prefix (template) giữ KV cache cùng lúc cho mỗi checkpoint
+_PREFIX_CACHE_SIZE = 4
+# Khoảng thời gian tối thiểu giữa 2 lần stat() QG_PROMPT_PREFIX_FILE
+_PREFIX_STAT_INTERVAL_S = 5.0
+
+_DTYPES = {
+    "float32": torch.float32,
+    "fp32": torch.float32,
+    "bfloat16": torch.bfloat16,
+    "bf16": torch.bfloat16,
+    "float16": torch.float16,
+    "fp16": torch.float16,
+}
+
+
+def _use_cpu() -> bool:
+    return settings.HF_DEVICE_MAP == "cpu" or not torch.cuda.is_available()
+
+
+def _resolve_dtype(cpu: bool) -> torch.dtype:
+    """HF_DTYPE nếu có; mặc định float32 trên CPU (bf16 matmul chậm trên CPU không có AMX), bf16 trên GPU."""
+    if settings.HF_DTYPE:
+        try:
+            return _DTYPES[settings.HF_DTYPE.lower()]
+        except KeyError:
+            raise ValueError(f"Unsupported HF_DTYPE: {settings.HF_DTYPE}")
+    return torch.float32 if cpu else torch.bfloat16
+
+
+def _load_causal_lm(repo: str, dtype: torch.dtype, cpu: bool, quantize: bool):
+    model = AutoModelForCausalLM.from_pretrained(
+        repo,
+        dtype=dtype,
+        device_map=None if cpu else settings.HF_DEVICE_MAP,
+        low_cpu_mem_usage=settings.HF_LOW_CPU_MEM,
+        local_files_only=settings.HF_LOCAL_ONLY,
+        trust_remote_code=settings.HF_TRUST_REMOTE_CODE,
+    ).eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
+
+
+def _init_qg_thread():
+    """
+    Initializer cho worker thread của QG. Số intra-op threads của OpenMP là
+    per-OS-thread, nên set ở đây không ảnh hưởng threads của model embedding.
+    """
+    if settings.QG_NUM_THREADS > 0:
+        torch.set_num_threads(settings.QG_NUM_THREADS)
+    if settings.QG_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(settings.QG_INTEROP_THREADS)
+        except RuntimeError:
+            # Chỉ set được 1 lần / process, trước khi có inter-op work
+            pass
+
 
 class QuestionGeneratorAdapter(LLMProvider):
     """
@@ -21,13 +91,29 @@ class QuestionGeneratorAdapter(LLMProvider):
     Implements both:
     - generate() for compatibility with LLMProvider interface
     - generate_questions() for specific QG use case
+
+    Load và generate chạy trên executor riêng (QG_EXECUTOR_WORKERS threads) để
+    cố định số torch threads. Trên CPU, QG_CPU_QUANTIZE=True lượng tử hoá động
+    các nn.Linear sang int8.
     """
 
     def __init__(self, model_repo: str):
         self.model_repo = model_repo
         self._tokenizer: Optional[AutoTokenizer] = None
         self._model: Optional[AutoModelForCausalLM] = None
+        self._draft: Optional[AutoModelForCausalLM] = None
+        self._forward_counts = threading.local()
         self._load_lock = asyncio.Lock()
+        self._prefix_cache: "OrderedDict[str, Tuple[List[int], Optional[DynamicCache]]]" = OrderedDict()
+        self._prefix_lock = threading.Lock()  # _prefix_cache dùng chung giữa các thread của executor
+        self._prefix_source: Optional[Tuple[str, float]] = None
+        self._prefix_checked_at = 0.0
+        self._prefix_text = ""
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.QG_EXECUTOR_WORKERS,
+            thread_name_prefix="qg",
+            initializer=_init_qg_thread,
+        )
 
     async def _ensure_loaded(self):
         """Lazy load model (non-blocking)"""
@@ -39,20 +125,87 @@ class QuestionGeneratorAdapter(LLMProvider):
                 return
 
             loop = asyncio.get_running_loop()
-            dtype = torch.bfloat16 if torch.cuda.is_available() else torch.float32
+            cpu = _use_cpu()
+            quantize = cpu and settings.QG_CPU_QUANTIZE
+            # quantize_dynamic chỉ chạy trên weights float32
+            dtype = torch.float32 if quantize else _resolve_dtype(cpu)
 
             def _load():
-                logger.info(f"🧠 Loading QG model: {self.model_repo}")
-                tok = AutoTokenizer.from_pretrained(self.model_repo)
-                model = AutoModelForCausalLM.from_pretrained(
+                logger.info(f"🧠 Loading QG model: {self.model_repo} (dtype={dtype}, cpu={cpu}, int8={quantize})")
+                tok = AutoTokenizer.from_pretrained(
                     self.model_repo,
-                    dtype=torch.bfloat16,
-                    device_map=settings.HF_DEVICE_MAP,
-                ).eval()
-                logger.info(f"✅ QG model loaded on {settings.HF_DEVICE_MAP}")
-                return tok, model
+                    local_files_only=settings.HF_LOCAL_ONLY,
+                    trust_remote_code=settings.HF_TRUST_REMOTE_CODE,
+                )
+                model = _load_causal_lm(self.model_repo, dtype, cpu, quantize)
+                logger.info(f"✅ QG model loaded on {'cpu' if cpu else settings.HF_DEVICE_MAP}")
+                draft = self._load_draft(model, dtype, cpu, quantize)
+                if settings.QG_WARMUP:
+                    self._warmup(tok, model, draft)
+                return tok, model, draft
+
+            self._tokenizer, self._model, self._draft = await loop.run_in_executor(self._executor, _load)
+
+    def _load_draft(self, model, dtype, cpu: bool, quantize: bool):
+        """Draft model cho assisted generation (QG_DRAFT_CKPT); phải dùng chung vocab với model chính."""
+        if not settings.QG_DRAFT_CKPT:
+            return None
+        draft = _load_causal_lm(settings.QG_DRAFT_CKPT, dtype, cpu, quantize)
+        if draft.config.vocab_size != model.config.vocab_size:
+            logger.warning(
+                "⚠️ QG draft %s has a different vocab (%d != %d), speculative decoding disabled",
+                settings.QG_DRAFT_CKPT, draft.config.vocab_size, model.config.vocab_size,
+            )
+            return None
+        draft.generation_config.num_assistant_tokens = settings.QG_DRAFT_TOKENS
+        # Đếm forward pass của từng model để ước lượng acceptance rate
+        model.register_forward_hook(lambda *_: self._count_forward("target"))
+        draft.register_forward_hook(lambda *_: self._count_forward("draft"))
+        logger.info("✅ QG draft model loaded: %s", settings.QG_DRAFT_CKPT)
+        return draft
+
+    def _count_forward(self, name: str):
+        setattr(self._forward_counts, name, getattr(self._forward_counts, name, 0) + 1)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def unload(self):
+        """Giải phóng weights (ModelManager gọi khi evict)."""
+        self._model = None
+        self._draft = None
+        self._tokenizer = None
+        with self._prefix_lock:
+            self._prefix_cache.clear()
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def memory_footprint(self) -> int:
+        """Bytes của parameters + buffers (kể cả packed int8 weights sau quantize_dynamic)."""
+        total = 0
+        for model in (self._model, self._draft):
+            if model is None:
+                continue
+            for value in model.state_dict().values():
+                tensors = value if isinstance(value, tuple) else (value,)
+                total += sum(t.numel() * t.element_size() for t in tensors if torch.is_tensor(t))
+        return total
 
-            self._tokenizer, self._model = await loop.run_in_executor(None, _load)
+    def _warmup(self, tokenizer, model, draft=None):
+        """1 lần generate ngắn để khởi tạo kernels / thread pool trước request đầu tiên."""
+        t0 = time.perf_counter()
+        inputs = tokenizer(["warmup"], return_tensors="pt").to(model.device)
+        with torch.inference_mode():
+            model.generate(
+                **inputs,
+                max_new_tokens=settings.QG_WARMUP_TOKENS,
+                do_sample=False,
+                pad_token_id=tokenizer.eos_token_id,
+                assistant_model=draft,
+            )
+        logger.info("🔥 QG warmup done in %.2fs", time.perf_counter() - t0)
 
     async def generate(
             self,
@@ -62,6 +215,7 @@ class QuestionGeneratorAdapter(LLMProvider):
             lang: str = "vi",
             history_block: str = "",
             summary_block: str = "",
+            usage: Optional[TokenUsage] = None,
             **kwargs
     ) -> List[str]:
         """
@@ -80,45 +234,192 @@ class QuestionGeneratorAdapter(LLMProvider):
         await self._ensure_loaded()
         loop = asyncio.get_running_loop()
 
-        def _gen():
-            user_prompt = prompt
-            # user_prompt = build_queries_prompt_from_template(
-            #     seed_question=prompt,
-            #     contexts=self._format_contexts(contexts),
-            #     n=n,
-            #     lang=lang,
-            #     history_block=history_block,
-            #     summary_block=summary_block,
-            # )
-
-            # Tokenize
-            model_inputs = self._tokenizer([user_prompt],return_tensors="pt",).to(self._model.device)
-
-            # Generate
-            with torch.inference_mode():
-                outputs = self._model.generate(
-                    **model_inputs,
-                    max_new_tokens=128,
-                    do_sample=True,
-                    temperature=0.2,
-                    pad_token_id=self._tokenizer.eos_token_id,
-                    repetition_penalty=1.1
-                )
-            # Decode & Parse
-            resp_ids = outputs[0]
-            raw = self._tokenizer.decode(resp_ids, skip_special_tokens=True).replace("<think>", "")
+        # user_prompt = build_queries_prompt_from_template(
+        #     seed_question=prompt,
+        #     contexts=self._format_contexts(contexts),
+        #     n=n,
+        #     lang=lang,
+        #     history_block=history_block,
+        #     summary_block=summary_block,
+        # )
+        results, token_counts = await loop.run_in_executor(self._executor, bind_context(self._generate_sync, [prompt]))
+        questions = results[0]
+        if usage is not None:
+            # Số token thật của tokenizer (kể cả prefix QG_PROMPT_PREFIX_FILE)
+            usage.report(*token_counts[0])
+        logger.info(f"✅ Generated {len(questions)}/{n} questions")
+        return questions
+
+    async def generate_batch(self, prompts: List[str],
+                             usages: Optional[List[TokenUsage]] = None) -> List[List[str]]:
+        """
+        Generate cho nhiều prompt trong 1 lần model.generate (left padding).
+        usages (cùng độ dài prompts): nhận số token prompt / completion của từng prompt.
+        """
+        await self._ensure_loaded()
+        loop = asyncio.get_running_loop()
+        results, token_counts = await loop.run_in_executor(
+            self._executor, bind_context(self._generate_sync, list(prompts))
+        )
+        for usage, counts in zip(usages or [], token_counts):
+            usage.report(*counts)
+        return results
+
+    # ------------------------------------------------------------
+    # Prompt prefix + KV cache
+    # ------------------------------------------------------------
+    def _prompt_prefix(self) -> str:
+        """
+        Instruction prefix tĩnh (QG_PROMPT_PREFIX_FILE), đọc lại khi file đổi mtime.
+        mtime chỉ được kiểm tra mỗi _PREFIX_STAT_INTERVAL_S; đọc lỗi -> giữ prefix đọc được lần trước.
+        """
+        path = settings.QG_PROMPT_PREFIX_FILE
+        if not path:
+            return ""
+        now = time.monotonic()
+        source = self._prefix_source
+        if source is not None and source[0] == path and now - self._prefix_checked_at < _PREFIX_STAT_INTERVAL_S:
+            return self._prefix_text
+        self._prefix_checked_at = now
+        try:
+            mtime = Path(path).stat().st_mtime
+            if source != (path, mtime):
+                self._prefix_text = Path(path).read_text(encoding="utf-8")
+                self._prefix_source = (path, mtime)
+        except OSError as e:
+            logger.warning("⚠️ Cannot read QG prompt prefix %s, keeping previous prefix: %s", path, e)
+        return self._prefix_text
+
+    def _prefix_entry(self, prefix: str) -> Tuple[List[int], Optional[DynamicCache]]:
+        """
+        (token ids, past_key_values) của prefix, key = checkpoint + hash(prefix):
+        template đổi -> key mới; unload/đổi checkpoint -> cache bị xoá.
+        KV chỉ được tính khi QG_PREFIX_KV_CACHE bật.
+        """
+        key = f"{self.model_repo}:{hashlib.sha256(prefix.encode('utf-8')).hexdigest()}"
+        # Giữ lock cả lúc tính KV: các thread cùng prefix chờ 1 lần tính thay vì tính trùng
+        with self._prefix_lock:
+            entry = self._prefix_cache.get(key)
+            if entry is None:
+                ids = self._tokenizer(prefix)["input_ids"]
+                cache = None
+                if settings.QG_PREFIX_KV_CACHE:
+                    t0 = time.perf_counter()
+                    with torch.no_grad():
+                        out = self._model(
+                            input_ids=torch.tensor([ids], device=self._model.device),
+                            past_key_values=DynamicCache(),
+                            use_cache=True,
+                        )
+                    cache = out.past_key_values
+                    logger.info("🧊 Cached KV for QG prompt prefix (%d tokens) in %.2fs",
+                                len(ids), time.perf_counter() - t0)
+                entry = (ids, cache)
+                self._prefix_cache[key] = entry
+                while len(self._prefix_cache) > _PREFIX_CACHE_SIZE:
+                    self._prefix_cache.popitem(last=False)
+            self._prefix_cache.move_to_end(key)
+        return entry
+
+    def _build_inputs(self, prompts: List[str], prefix_ids: List[int]):
+        """
+        Left-pad [prefix + prompt] cho từng prompt.
+        Trả về (input_ids, attention_mask, skip) với skip[i] = số token pad + prefix
+        không decode vào output.
+        """
+        rows = [
+            prefix_ids + self._tokenizer(p, add_special_tokens=not prefix_ids)["input_ids"]
+            for p in prompts
+        ]
+        width = max(len(r) for r in rows)
+        pad_id = self._tokenizer.pad_token_id
+        input_ids = torch.tensor([[pad_id] * (width - len(r)) + r for r in rows], device=self._model.device)
+        attention_mask = torch.tensor([[0] * (width - len(r)) + [1] * len(r) for r in rows], device=self._model.device)
+        skip = [width - len(r) + len(prefix_ids) for r in rows]
+        return input_ids, attention_mask, skip
+
+    def _generate_sync(self, prompts: List[str]) -> Tuple[List[List[str]], List[Tuple[int, int]]]:
+        """Trả về (questions của từng prompt, (prompt_tokens, completion_tokens) của từng prompt)."""
+        # Tokenize (left padding để các prompt kết thúc cùng vị trí khi batch)
+        if self._tokenizer.pad_token_id is None:
+            self._tokenizer.pad_token = self._tokenizer.eos_token
+
+        prefix = self._prompt_prefix()
+        prefix_ids, prefix_kv = self._prefix_entry(prefix) if prefix else ([], None)
+        input_ids, attention_mask, skip = self._build_inputs(prompts, prefix_ids)
+
+        gen_kwargs = {}
+        # Assisted generation của transformers chỉ hỗ trợ batch size 1
+        assisted = self._draft is not None and len(prompts) == 1
+        if assisted:
+            gen_kwargs["assistant_model"] = self._draft
+        # KV của prefix chỉ dùng được khi prefix bắt đầu ở vị trí 0 (1 prompt, không pad)
+        elif prefix_kv is not None and len(prompts) == 1 and input_ids.shape[1] > len(prefix_ids):
+            # generate() ghi thêm vào cache -> luôn dùng bản copy
+            gen_kwargs["past_key_values"] = copy.deepcopy(prefix_kv)
+
+        self._forward_counts.target = 0
+        self._forward_counts.draft = 0
+        t0 = time.perf_counter()
+
+        # Generate
+        with torch.inference_mode():
+            outputs = self._model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=128,
+                do_sample=True,
+                temperature=0.2,
+                pad_token_id=self._tokenizer.eos_token_id,
+                repetition_penalty=1.1,
+                **gen_kwargs,
+            )
+        self._record_generation_stats(
+            new_tokens=int((outputs[:, input_ids.shape[1]:] != self._tokenizer.pad_token_id).sum()),
+            elapsed=time.perf_counter() - t0,
+            assisted=assisted,
+        )
+
+        # Token thật: prompt = phần không pad (gồm prefix), completion = token mới khác pad
+        prompt_width = input_ids.shape[1]
+        token_counts = [
+            (int(mask.sum()), int((out[prompt_width:] != self._tokenizer.pad_token_id).sum()))
+            for mask, out in zip(attention_mask, outputs)
+        ]
+
+        # Decode & Parse
+        results = []
+        for resp_ids, n_skip in zip(outputs, skip):
+            raw = self._tokenizer.decode(resp_ids[n_skip:], skip_special_tokens=True).replace("<think>", "")
 
             # ✂️ Cắt ngay khi gặp <EOS> đầu tiên
             if "<EOS>" in raw:
                 raw = raw.split("<EOS>")[0]
 
             questions = [ln.strip() for ln in raw.split("\n") if ln.strip()]
-            questions = self._filter_questions(questions)
+            results.append(self._filter_questions(questions))
+        return results, token_counts
 
-            logger.info(f"✅ Generated {len(questions)}/{n} questions")
-            return questions
-
-        return await loop.run_in_executor(None, _gen)
+    def _record_generation_stats(self, new_tokens: int, elapsed: float, assisted: bool) -> Dict[str, float]:
+        """
+        tokens/s cho mọi request; với assisted generation thêm acceptance rate:
+        mỗi bước verify (1 forward của model chính, bước đầu kiêm prefill) nhận a token
+        draft + 1 token của chính nó, nên accepted = new_tokens - số bước verify,
+        drafted = số forward pass của draft model.
+        """
+        mode = "assisted" if assisted else "plain"
+        stats = {"tokens": new_tokens, "seconds": round(elapsed, 3),
+                 "tokens_per_s": round(new_tokens / elapsed, 2) if elapsed > 0 else 0.0}
+        QG_TOKENS_PER_SECOND.labels(mode).observe(stats["tokens_per_s"])
+        if assisted:
+            verify_steps = max(getattr(self._forward_counts, "target", 0), 1)
+            drafted = getattr(self._forward_counts, "draft", 0)
+            accepted = max(new_tokens - verify_steps, 0)
+            stats["acceptance_rate"] = round(accepted / drafted, 3) if drafted else 0.0
+            stats["tokens_per_verify_step"] = round(new_tokens / verify_steps, 2)
+            QG_DRAFT_ACCEPTANCE.observe(stats["acceptance_rate"])
+        logger.info("📈 QG generation (%s): %s", mode, stats)
+        return stats
 
     def _format_contexts(self, contexts: Optional[List[Dict]]) -> str:
         """Format contexts list into string"""
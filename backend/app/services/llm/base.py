@@ -1,11 +1,16 @@
 # backend/app/services/llm/base.py
 from abc import ABC, abstractmethod
+from concurrent.futures import Executor
 from typing import AsyncIterator, Optional, Dict, Any
 
 
 class LLMProvider(ABC):
     """Base interface cho tất cả LLM providers"""
 
+    # Executor cho blocking call của provider (registry gán executor riêng của governor);
+    # None = default thread pool của event loop
+    executor: Optional[Executor] = None
+
     @abstractmethod
     async def generate(
             self,
@@ -0,0 +1,70 @@
+# backend/app/services/llm/circuit_breaker.py
+"""
+Circuit breaker cho 1 LLM provider.
+
+closed    -> request đi bình thường; LLM_BREAKER_FAILURES lỗi liên tiếp -> open
+open      -> router bỏ qua provider trong LLM_BREAKER_RESET_S giây
+half_open -> cho 1 request thử: thành công -> closed, lỗi -> open lại
+"""
+import logging
+import time
+from typing import Optional
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import LLM_PROVIDER_CIRCUIT_OPEN
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: Optional[int] = None, reset_timeout_s: Optional[float] = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.LLM_BREAKER_FAILURES
+        self.reset_timeout_s = settings.LLM_BREAKER_RESET_S if reset_timeout_s is None else reset_timeout_s
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_at: Optional[float] = None  # thời điểm request thử (half_open) bắt đầu
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout_s:
+            return "half_open"
+        return "open"
+
+    def ready(self) -> bool:
+        """Như allow() nhưng chỉ đọc: không giữ slot thử của half_open (dùng khi chọn ứng viên)."""
+        state = self.state
+        if state == "closed":
+            return True
+        # Request thử bị bỏ dở (vd. stream bị hủy giữa chừng) -> sau reset_timeout cho thử lại
+        return state == "half_open" and (
+            self._probe_at is None or time.monotonic() - self._probe_at >= self.reset_timeout_s
+        )
+
+    def allow(self) -> bool:
+        """Provider có nhận request không (half_open: giữ slot thử, chỉ 1 request tại 1 thời điểm)."""
+        if not self.ready():
+            return False
+        if self._opened_at is not None:
+            self._probe_at = time.monotonic()
+        return True
+
+    def record_success(self):
+        if self._opened_at is not None:
+            logger.info("✅ Circuit closed for %s", self.name)
+        self.failures = 0
+        self._opened_at = None
+        self._probe_at = None
+        LLM_PROVIDER_CIRCUIT_OPEN.labels(self.name).set(0)
+
+    def record_failure(self):
+        self.failures += 1
+        probing = self._probe_at is not None
+        if probing or self.failures >= self.failure_threshold:
+            if self._opened_at is None or probing:
+                logger.warning("🔌 Circuit opened for %s after %d failures", self.name, self.failures)
+            self._opened_at = time.monotonic()
+            self._probe_at = None
+            LLM_PROVIDER_CIRCUIT_OPEN.labels(self.name).set(1)
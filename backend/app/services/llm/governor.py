@@ -0,0 +1,107 @@
+# backend/app/services/llm/governor.py
+"""
+Concurrency governor cho từng LLM provider (admission control).
+
+- Executor riêng: blocking SDK call (Gemini, HF) không chiếm default thread pool
+  mà asyncio.to_thread (retrieval, embedding) đang dùng.
+- Semaphore: tối đa max_concurrency call chạy đồng thời.
+- Hàng chờ có giới hạn: đã có max_queue call chờ -> shed ngay (429);
+  chờ quá queue_timeout_s -> shed (503). Caller nhận ProviderOverloaded.
+- Thời gian chờ + độ sâu hàng chờ xuất ra /metrics.
+
+Giới hạn mặc định LLM_MAX_CONCURRENCY / LLM_MAX_QUEUE / LLM_QUEUE_TIMEOUT_S /
+LLM_EXECUTOR_WORKERS, override theo provider qua LLM_PROVIDER_LIMITS.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_SECONDS, LLM_SHED
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderOverloaded(RuntimeError):
+    """Provider đang quá tải: 429 (hàng chờ đầy) hoặc 503 (chờ quá lâu)."""
+
+    def __init__(self, provider: str, status_code: int, reason: str, retry_after: float = 1.0):
+        super().__init__(f"Provider '{provider}' overloaded: {reason}")
+        self.provider = provider
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class ProviderGovernor:
+    def __init__(self,
+                 name: str,
+                 max_concurrency: Optional[int] = None,
+                 max_queue: Optional[int] = None,
+                 queue_timeout_s: Optional[float] = None,
+                 executor_workers: Optional[int] = None):
+        limits = settings.LLM_PROVIDER_LIMITS.get(name, {})
+        self.name = name
+        self.max_concurrency = int(max_concurrency if max_concurrency is not None
+                                   else limits.get("max_concurrency", settings.LLM_MAX_CONCURRENCY))
+        self.max_queue = int(max_queue if max_queue is not None else limits.get("max_queue", settings.LLM_MAX_QUEUE))
+        self.queue_timeout_s = float(queue_timeout_s if queue_timeout_s is not None
+                                     else limits.get("queue_timeout_s", settings.LLM_QUEUE_TIMEOUT_S))
+        workers = int(executor_workers if executor_workers is not None
+                      else limits.get("executor_workers", settings.LLM_EXECUTOR_WORKERS))
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"llm-{name}")
+        self._semaphore: Optional[asyncio.Semaphore] = None  # tạo lazy trên event loop đang chạy
+        self.waiting = 0
+        self.running = 0
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Giữ 1 slot concurrency trong suốt call (kể cả stream)."""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        t0 = time.perf_counter()
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()  # còn slot: lấy ngay, không qua hàng chờ
+        else:
+            await self._wait_for_slot()
+        LLM_QUEUE_SECONDS.labels(self.name).observe(time.perf_counter() - t0)
+
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+            self._semaphore.release()
+
+    async def _wait_for_slot(self):
+        if self.waiting >= self.max_queue:
+            LLM_SHED.labels(self.name, "429").inc()
+            raise ProviderOverloaded(self.name, 429, f"{self.waiting} calls already queued")
+
+        self.waiting += 1
+        LLM_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            LLM_SHED.labels(self.name, "503").inc()
+            raise ProviderOverloaded(
+                self.name, 503, f"queued > {self.queue_timeout_s}s", retry_after=self.queue_timeout_s
+            ) from None
+        finally:
+            self.waiting -= 1
+            LLM_QUEUE_DEPTH.labels(self.name).set(self.waiting)
+
+    def snapshot(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "running": self.running,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,191 @@
+"""
+Model manager - load lazy theo key (checkpoint), giữ tổng RAM dưới budget.
+
+- acquire(key): load ở lần dùng đầu tiên; model đang được dùng không bị evict.
+- Trước khi load, evict model idle ít dùng gần đây nhất (LRU) tới khi đủ chỗ
+  theo footprint ước lượng (footprint đo được lần load trước, nếu có).
+- Model idle quá MODEL_IDLE_TTL_S bị unload bởi reaper chạy nền.
+- prefetch(key): load trước model dự đoán sắp cần (vd. theo lang của chat);
+  load(key) giống prefetch nhưng raise lỗi load (preload lúc startup).
+
+Model được quản lý phải có: `_ensure_loaded()` (async), `unload()`,
+`memory_footprint()` (bytes) và `is_loaded`.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from ask_forge.backend.app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_MB = 1024 * 1024
+
+
+def qg_checkpoint_for(lang: Optional[str] = None) -> str:
+    """Checkpoint QG cho 1 ngôn ngữ (QG_CHECKPOINTS), mặc định HF_QUESTION_GENERATOR_CKPT."""
+    return settings.QG_CHECKPOINTS.get(lang or "", settings.HF_QUESTION_GENERATOR_CKPT)
+
+
+@dataclass
+class _Entry:
+    model: Any
+    footprint: int = 0  # bytes, đo sau khi load
+    in_use: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    load_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class ModelManager:
+    def __init__(self,
+                 factory: Callable[[str], Any],
+                 budget_mb: Optional[int] = None,
+                 idle_ttl_s: Optional[float] = None,
+                 default_estimate_mb: Optional[int] = None):
+        self.factory = factory
+        budget_mb = settings.MODEL_RAM_BUDGET_MB if budget_mb is None else budget_mb
+        self.budget_bytes = budget_mb * _MB  # 0 = không giới hạn
+        self.idle_ttl_s = settings.MODEL_IDLE_TTL_S if idle_ttl_s is None else idle_ttl_s
+        self.default_estimate = (default_estimate_mb or settings.MODEL_DEFAULT_ESTIMATE_MB) * _MB
+
+        self._entries: Dict[str, _Entry] = {}
+        self._room_lock = asyncio.Lock()
+        self._prefetching: set[str] = set()
+        self._reaper: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------
+    def _entry(self, key: str) -> _Entry:
+        if key not in self._entries:
+            self._entries[key] = _Entry(model=self.factory(key))
+        return self._entries[key]
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(e.footprint for e in self._entries.values() if e.model.is_loaded)
+
+    def report(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "budget_mb": round(self.budget_bytes / _MB, 1) if self.budget_bytes else None,
+            "used_mb": round(self.used_bytes / _MB, 1),
+            "models": [
+                {
+                    "key": key,
+                    "loaded": e.model.is_loaded,
+                    "footprint_mb": round(e.footprint / _MB, 1),
+                    "in_use": e.in_use,
+                    "idle_s": round(now - e.last_used, 1),
+                }
+                for key, e in self._entries.items()
+            ],
+        }
+
+    # ------------------------------------------------------------
+    # Load / evict
+    # ------------------------------------------------------------
+    def _unload(self, key: str, entry: _Entry, reason: str):
+        entry.model.unload()
+        logger.info("🧹 Unloaded model %s (%s, %.0f MB)", key, reason, entry.footprint / _MB)
+
+    def _make_room(self, needed: int, keep: str):
+        """Evict model idle theo LRU tới khi used + needed <= budget."""
+        if not self.budget_bytes:
+            return
+        candidates = sorted(
+            ((k, e) for k, e in self._entries.items() if k != keep and e.in_use == 0 and e.model.is_loaded),
+            key=lambda item: item[1].last_used,
+        )
+        for key, entry in candidates:
+            if self.used_bytes + needed <= self.budget_bytes:
+                return
+            self._unload(key, entry, "budget")
+        if self.used_bytes + needed > self.budget_bytes:
+            logger.warning(
+                "⚠️ Model RAM budget exceeded: need %.0f MB, used %.0f/%.0f MB (models in use)",
+                needed / _MB, self.used_bytes / _MB, self.budget_bytes / _MB,
+            )
+
+    async def _ensure(self, key: str) -> _Entry:
+        entry = self._entry(key)
+        if entry.model.is_loaded:
+            return entry
+        async with entry.load_lock:
+            if entry.model.is_loaded:
+                return entry
+            async with self._room_lock:
+                self._make_room(entry.footprint or self.default_estimate, keep=key)
+                t0 = time.perf_counter()
+                await entry.model._ensure_loaded()
+                entry.footprint = entry.model.memory_footprint()
+                logger.info("📥 Loaded model %s (%.0f MB) in %.1fs", key, entry.footprint / _MB, time.perf_counter() - t0)
+                # Ước lượng có thể thấp hơn thực tế
+                self._make_room(0, keep=key)
+            # Vừa load: tính idle từ lúc này (last_used cũ có thể đã quá TTL -> reaper unload ngay)
+            entry.last_used = time.monotonic()
+        return entry
+
+    @asynccontextmanager
+    async def acquire(self, key: str) -> AsyncIterator[Any]:
+        entry = self._entry(key)
+        entry.in_use += 1  # chặn evict trong lúc đang load/dùng
+        try:
+            await self._ensure(key)
+            entry.last_used = time.monotonic()
+            yield entry.model
+        finally:
+            entry.in_use -= 1
+            entry.last_used = time.monotonic()
+
+    async def load(self, key: str):
+        """Load nếu chưa load; lỗi load được raise (vd. preload lúc startup)."""
+        await self._ensure(key)
+
+    async def prefetch(self, key: str):
+        """Load trước nếu chưa load (lỗi chỉ log, không raise)."""
+        try:
+            await self.load(key)
+        except Exception:
+            logger.exception("❌ Prefetch failed for %s", key)
+
+    def schedule_prefetch(self, key: str):
+        """Fire-and-forget prefetch, bỏ qua nếu đã load hoặc đang prefetch."""
+        entry = self._entries.get(key)
+        if (entry is not None and entry.model.is_loaded) or key in self._prefetching:
+            return
+        self._prefetching.add(key)
+        task = asyncio.create_task(self.prefetch(key))
+        task.add_done_callback(lambda _: self._prefetching.discard(key))
+
+    # ------------------------------------------------------------
+    # Idle reaper
+    # ------------------------------------------------------------
+    def evict_idle(self):
+        if self.idle_ttl_s <= 0:
+            return
+        now = time.monotonic()
+        for key, entry in list(self._entries.items()):
+            if entry.model.is_loaded and entry.in_use == 0 and now - entry.last_used > self.idle_ttl_s:
+                self._unload(key, entry, "idle")
+
+    async def _reap_loop(self):
+        interval = max(5.0, min(self.idle_ttl_s / 2, 60.0))
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    def start(self):
+        if self._reaper is None and self.idle_ttl_s > 0:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    def stop(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for key, entry in self._entries.items():
+            if entry.model.is_loaded:
+                self._unload(key, entry, "shutdown")
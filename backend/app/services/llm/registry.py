@@ -3,6 +3,9 @@ from typing import Dict, Optional
 import logging
 
 from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.circuit_breaker import CircuitBreaker
+from ask_forge.backend.app.services.llm.governor import ProviderGovernor
+from ask_forge.backend.app.services.llm.stats import InstrumentedProvider, ProviderStats
 
 logger = logging.getLogger(__name__)
 
@@ -16,17 +19,65 @@ class LLMRegistry:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._providers: Dict[str, LLMProvider] = {}
+            cls._instance._stats: Dict[str, ProviderStats] = {}
+            cls._instance._breakers: Dict[str, CircuitBreaker] = {}
+            cls._instance._governors: Dict[str, ProviderGovernor] = {}
         return cls._instance
 
     def register(self, name: str, provider: LLMProvider):
-        """Đăng ký provider mới"""
-        self._providers[name] = provider
+        """Đăng ký provider mới (bọc InstrumentedProvider: đo stats, circuit breaker, governor)"""
+        if name not in self._stats:
+            self._stats[name] = ProviderStats(name)
+            self._breakers[name] = CircuitBreaker(name)
+        if name not in self._governors:  # lần đầu, hoặc sau shutdown() (executor cũ đã dừng)
+            self._governors[name] = ProviderGovernor(name)
+        self._providers[name] = InstrumentedProvider(
+            provider, self._stats[name], self._breakers[name], self._governors[name]
+        )
         logger.info(f"✅ Registered LLM provider: {name} → {provider.model_name}")
 
     def get(self, name: str) -> Optional[LLMProvider]:
         """Lấy provider theo tên"""
         return self._providers.get(name)
 
+    def stats(self, name: str) -> Optional[ProviderStats]:
+        """Thống kê live của provider (None nếu chưa register)"""
+        return self._stats.get(name)
+
+    def breaker(self, name: str) -> Optional[CircuitBreaker]:
+        return self._breakers.get(name)
+
+    def available(self, name: str) -> bool:
+        """Đã register và circuit breaker nhận request (chỉ đọc, không giữ slot thử half_open)"""
+        breaker = self._breakers.get(name)
+        return name in self._providers and (breaker is None or breaker.ready())
+
+    def acquire(self, name: str) -> bool:
+        """Gọi ngay trước khi thực sự gửi request: half_open -> giữ slot thử cho request này"""
+        breaker = self._breakers.get(name)
+        return name in self._providers and (breaker is None or breaker.allow())
+
+    def stats_report(self) -> Dict[str, dict]:
+        return {
+            name: {
+                **stats.snapshot(),
+                "circuit": self._breakers[name].state,
+                "governor": self._governors[name].snapshot() if name in self._governors else None,
+            }
+            for name, stats in self._stats.items()
+        }
+
+    def shutdown(self):
+        """
+        Dừng executor riêng của các provider và bỏ provider/governor đã đăng ký
+        (lifespan sau trong cùng process register lại -> governor + executor mới).
+        Stats và circuit breaker được giữ lại.
+        """
+        for governor in self._governors.values():
+            governor.shutdown()
+        self._governors.clear()
+        self._providers.clear()
+
     def list_providers(self) -> list[str]:
         """Danh sách providers khả dụng"""
         return list(self._providers.keys())
@@ -1,9 +1,15 @@
 # backend/app/services/llm/router.py
-from typing import Optional, Callable
+import asyncio
+import time
+from typing import AsyncIterator, Dict, List, Optional, Callable
 import logging
 
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.tracing import start_span
+from ask_forge.backend.app.core.metrics import LLM_HEDGES
 from ask_forge.backend.app.services.llm.base import LLMProvider
-from ask_forge.backend.app.services.llm.registry import get_registry
+from ask_forge.backend.app.services.llm.registry import LLMRegistry, get_registry
+from ask_forge.backend.app.services.llm.usage import TokenUsage
 
 logger = logging.getLogger(__name__)
 
@@ -28,23 +34,142 @@ class LLMRouter:
             "task": "chat" | "question_generation" | "summary",
             "lang": "vi" | "en",
             "latency_requirement": "low" | "high",
+            "ttft_target_s": float,  # target TTFT cụ thể (ưu tiên hơn latency_requirement)
             "prefer_local": bool
         }
         """
-        # Run policies in order
+        name = self._select(context)
+        self.registry.acquire(name)  # caller gọi provider ngay -> giữ slot thử nếu circuit half_open
+        return self.registry.get(name)
+
+    def _select(self, context: dict) -> str:
+        # Run policies in order (provider có circuit breaker open bị bỏ qua).
+        # Chỉ kiểm tra trạng thái breaker; slot thử half_open được giữ khi thực sự gọi provider.
         for policy in self._routing_policies:
             provider_name = policy(context)
-            if provider_name:
-                provider = self.registry.get(provider_name)
-                if provider:
-                    logger.info(f"🎯 Routed to: {provider_name}")
-                    return provider
-                else:
-                    logger.warning(f"⚠️ Provider '{provider_name}' not found in registry")
+            if not provider_name:
+                continue
+            if self.registry.get(provider_name) is None:
+                logger.warning(f"⚠️ Provider '{provider_name}' not found in registry")
+            elif not self.registry.available(provider_name):
+                logger.warning(f"⚠️ Provider '{provider_name}' circuit open, skipping")
+            else:
+                logger.info(f"🎯 Routed to: {provider_name}")
+                return provider_name
+
+        # Fallback: default, hoặc candidate khác của task nếu circuit của default đang open
+        fallbacks = [self._default_provider, *settings.LLM_TASK_CANDIDATES.get(context.get("task"), [])]
+        for name in fallbacks:
+            if self.registry.get(name) is not None and self.registry.available(name):
+                logger.warning(f"⚠️ No policy matched, using fallback: {name}")
+                return name
+        logger.warning(f"⚠️ No available provider, using default: {self._default_provider}")
+        return self._default_provider
+
+    def _hedge_candidate(self, context: dict, primary: str) -> Optional[str]:
+        """Provider thứ 2 cho task (LLM_TASK_CANDIDATES), circuit không open (chỉ đọc trạng thái)."""
+        for name in settings.LLM_TASK_CANDIDATES.get(context.get("task"), []):
+            if name != primary and self.registry.get(name) is not None and self.registry.available(name):
+                return name
+        return None
+
+    async def stream(self, context: dict, prompt: str, route_info: Optional[dict] = None,
+                     **kwargs) -> AsyncIterator[str]:
+        """
+        Stream từ provider được route, có hedge + deadline cho token đầu tiên:
+
+        - Sau LLM_HEDGE_DELAY_S chưa có token đầu -> start thêm provider thứ 2;
+          provider nào ra token đầu trước thắng, provider còn lại bị cancel.
+        - Provider lỗi trước token đầu -> chuyển ngay sang provider thứ 2.
+        - Quá LLM_FIRST_TOKEN_TIMEOUT_S chưa có token nào -> TimeoutError
+          (tính là lỗi cho circuit breaker của các provider đang chờ).
+
+        route_info (nếu truyền vào) được điền: routing_s, provider (provider thắng), hedged,
+        usage (TokenUsage của provider thắng, đủ số khi stream kết thúc).
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.LLM_FIRST_TOKEN_TIMEOUT_S
+        t_route = time.perf_counter()
+        route_span = start_span("llm.route", task=context.get("task") or "")
+        primary = self._select(context)
+        backup = self._hedge_candidate(context, primary)
+        route_span.set(primary=primary, backup=backup or "")
+        route_span.end()
+        if route_info is not None:
+            route_info["routing_s"] = time.perf_counter() - t_route
+        # LLM_HEDGE_DELAY_S = 0: không hedge theo thời gian, backup chỉ dùng khi primary lỗi
+        hedge_at = loop.time() + settings.LLM_HEDGE_DELAY_S if settings.LLM_HEDGE_DELAY_S > 0 else deadline
+
+        streams: Dict[asyncio.Task, tuple] = {}  # task(__anext__) -> (name, async generator)
+        usages: Dict[str, TokenUsage] = {}
+
+        def start(name: str) -> bool:
+            # Giữ slot thử half_open chỉ khi task thực sự được start (backup không dùng tới không chiếm slot)
+            if not self.registry.acquire(name):
+                logger.warning(f"⚠️ Provider '{name}' circuit not accepting requests, skipping")
+                return False
+            usages[name] = TokenUsage()
+            agen = self.registry.get(name).generate_stream(prompt, usage=usages[name], **kwargs)
+            streams[asyncio.ensure_future(agen.__anext__())] = (name, agen)
+            return True
+
+        start(primary)
+        hedged = False
+        winner, first_chunk, last_error = None, None, None
+        try:
+            while winner is None:
+                if backup is not None and (not streams or loop.time() >= hedge_at):
+                    if start(backup):
+                        logger.info(f"🪁 Hedging stream: {primary} -> {backup}")
+                        hedged = True
+                    backup = None
+                if not streams:
+                    break
+                if loop.time() >= deadline:
+                    for name, _ in streams.values():
+                        self.registry.breaker(name).record_failure()
+                    raise TimeoutError(f"No first token within {settings.LLM_FIRST_TOKEN_TIMEOUT_S}s")
+
+                wake_at = deadline if backup is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(
+                    streams, timeout=max(0.0, wake_at - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name, agen = streams.pop(task)
+                    try:
+                        first_chunk = task.result()
+                    except StopAsyncIteration:
+                        first_chunk = ""
+                    except Exception as e:
+                        logger.warning(f"⚠️ Provider '{name}' failed before first token: {e}")
+                        last_error = e
+                        continue
+                    winner = (name, agen)
+                    break
+        finally:
+            # Hủy provider thua / còn đang chờ
+            for task in streams:
+                task.cancel()
+            for task, (_, agen) in streams.items():
+                await asyncio.gather(task, return_exceptions=True)
+                await agen.aclose()
 
-        # Fallback
-        logger.warning(f"⚠️ No policy matched, using default: {self._default_provider}")
-        return self.registry.get(self._default_provider)
+        if winner is None:
+            raise last_error or RuntimeError("No provider produced a stream")
+        name, agen = winner
+        if hedged:
+            LLM_HEDGES.labels("primary" if name == primary else "hedge").inc()
+            logger.info(f"🪁 Hedged stream won by {name}")
+        if route_info is not None:
+            route_info.update(provider=name, hedged=hedged, usage=usages[name])
+
+        try:
+            if first_chunk:
+                yield first_chunk
+            async for chunk in agen:
+                yield chunk
+        finally:
+            await agen.aclose()
 
 
 # ===== Routing Policies =====
@@ -65,4 +190,49 @@ def prefer_gemini_for_chat(context: dict) -> Optional[str]:
     """Gemini for chat (low latency, high quality)"""
     if context.get("task") == "chat":
         return "gemini_service"
-    return None
\ No newline at end of file
+    return None
+
+
+def latency_aware(candidates: Dict[str, List[str]],
+                  registry: Optional[LLMRegistry] = None) -> Callable[[dict], Optional[str]]:
+    """
+    Policy theo live stats: trong các provider ứng viên của task, chọn provider có
+    expected TTFT (p90 + phạt theo in-flight) thấp nhất mà vẫn <= target.
+
+    - Chỉ chạy khi context có "ttft_target_s" hoặc latency_requirement == "low"
+      (target = LLM_LOW_LATENCY_TTFT_S).
+    - Bỏ qua provider có error rate > LLM_MAX_ERROR_RATE.
+    - Provider chưa đủ LLM_STATS_MIN_SAMPLES được thử để có số liệu, tối đa
+      LLM_EXPLORE_MAX_INFLIGHT request đồng thời; còn lại đi provider đã đo tốt nhất.
+    - Không provider nào đạt target -> trả None (policy tĩnh phía sau quyết định).
+    """
+    registry = registry or get_registry()
+
+    def policy(context: dict) -> Optional[str]:
+        target = context.get("ttft_target_s")
+        if target is None and context.get("latency_requirement") == "low":
+            target = settings.LLM_LOW_LATENCY_TTFT_S
+        names = [n for n in candidates.get(context.get("task"), []) if registry.get(n) is not None]
+        if target is None or len(names) < 2:
+            return None
+
+        best, best_ttft = None, None
+        for name in names:
+            stats = registry.stats(name)
+            if stats.samples < settings.LLM_STATS_MIN_SAMPLES:
+                if stats.in_flight < settings.LLM_EXPLORE_MAX_INFLIGHT:
+                    return name  # explore
+                continue  # đang thử đủ rồi, chưa có số liệu để so sánh
+            if stats.error_rate > settings.LLM_MAX_ERROR_RATE:
+                continue
+            expected = stats.expected_ttft()
+            if expected is not None and expected <= target and (best_ttft is None or expected < best_ttft):
+                best, best_ttft = name, expected
+
+        if best is None:
+            logger.warning(f"⚠️ No provider meets TTFT target {target}s for task={context.get('task')}")
+            return None
+        logger.info(f"⏱️ Latency-aware pick: {best} (expected TTFT {best_ttft:.2f}s <= {target}s)")
+        return best
+
+    return policy
\ No newline at end of file
@@ -0,0 +1,202 @@
+# backend/app/services/llm/stats.py
+"""
+Thống kê live của từng LLM provider (rolling window N request gần nhất):
+TTFT, tokens/s, error rate, số request đang chạy. Router dùng để route theo
+latency; mỗi lần cập nhật cũng ghi ra Prometheus gauges (/metrics).
+
+InstrumentedProvider bọc provider khi register vào LLMRegistry nên mọi call
+site (chat stream, QG, summary) đều được đo mà không phải sửa; kết quả mỗi call
+cũng được báo cho circuit breaker của provider. Mỗi call chỉ chạy khi governor
+của provider cấp slot (call bị shed không tính vào stats / breaker). Số token
+prompt / completion của mỗi call được đếm qua TokenUsage (xem usage.py).
+"""
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.tracing import span, start_span
+from ask_forge.backend.app.core.metrics import (
+    LLM_PROVIDER_ERROR_RATE,
+    LLM_PROVIDER_INFLIGHT,
+    LLM_PROVIDER_TOKENS_PER_SECOND,
+    LLM_PROVIDER_TTFT,
+)
+from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.circuit_breaker import CircuitBreaker
+from ask_forge.backend.app.services.llm.governor import ProviderGovernor
+from ask_forge.backend.app.services.llm.usage import TokenUsage, record_usage, usage_index_var
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderStats:
+    def __init__(self, name: str, window: Optional[int] = None):
+        self.name = name
+        # (ttft_s, tokens_per_s, ok) của các request gần nhất
+        self._samples: Deque[Tuple[float, float, bool]] = deque(maxlen=window or settings.LLM_STATS_WINDOW)
+        self.in_flight = 0
+
+    # ------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------
+    def start(self):
+        self.in_flight += 1
+        LLM_PROVIDER_INFLIGHT.labels(self.name).set(self.in_flight)
+
+    def finish(self, ttft: Optional[float], tokens: int, duration: float, ok: bool):
+        self.in_flight = max(0, self.in_flight - 1)
+        decode_s = duration - (ttft or 0.0)
+        if decode_s <= 0:  # non-streaming: cả response tới cùng lúc
+            decode_s = duration
+        tps = tokens / decode_s if ok and tokens and decode_s > 0 else 0.0
+        self._samples.append((ttft if ttft is not None else float("nan"), tps, ok))
+        self._export()
+
+    def _export(self):
+        LLM_PROVIDER_INFLIGHT.labels(self.name).set(self.in_flight)
+        LLM_PROVIDER_ERROR_RATE.labels(self.name).set(self.error_rate)
+        p50, p90 = self.ttft_quantile(0.5), self.ttft_quantile(0.9)
+        if p50 is not None:
+            LLM_PROVIDER_TTFT.labels(self.name, "0.5").set(p50)
+            LLM_PROVIDER_TTFT.labels(self.name, "0.9").set(p90)
+        if self.tokens_per_second is not None:
+            LLM_PROVIDER_TOKENS_PER_SECOND.labels(self.name).set(self.tokens_per_second)
+
+    # ------------------------------------------------------------
+    # Aggregates
+    # ------------------------------------------------------------
+    @property
+    def samples(self) -> int:
+        return len(self._samples)
+
+    def ttft_quantile(self, q: float) -> Optional[float]:
+        values = [t for t, _, ok in self._samples if ok and t == t]
+        return float(np.quantile(values, q)) if values else None
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        values = [tps for _, tps, ok in self._samples if ok and tps > 0]
+        return float(np.mean(values)) if values else None
+
+    @property
+    def error_rate(self) -> float:
+        if not self._samples:
+            return 0.0
+        return sum(1 for *_, ok in self._samples if not ok) / len(self._samples)
+
+    def expected_ttft(self) -> Optional[float]:
+        """p90 TTFT, phạt thêm theo số request đang chạy (provider đang bận thì chậm hơn)."""
+        p90 = self.ttft_quantile(0.9)
+        if p90 is None:
+            return None
+        return p90 * (1.0 + settings.LLM_INFLIGHT_PENALTY * self.in_flight)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "samples": self.samples,
+            "in_flight": self.in_flight,
+            "ttft_p50_s": self.ttft_quantile(0.5),
+            "ttft_p90_s": self.ttft_quantile(0.9),
+            "tokens_per_s": self.tokens_per_second,
+            "error_rate": round(self.error_rate, 3),
+        }
+
+
+class InstrumentedProvider(LLMProvider):
+    """Bọc 1 provider: đo TTFT / tokens/s / lỗi của mỗi call vào ProviderStats."""
+
+    def __init__(self, provider: LLMProvider, stats: ProviderStats,
+                 breaker: Optional[CircuitBreaker] = None, governor: Optional[ProviderGovernor] = None):
+        self.provider = provider
+        self.stats = stats
+        self.breaker = breaker
+        self.governor = governor or ProviderGovernor(stats.name)
+        provider.executor = self.governor.executor
+
+    def _report(self, failed: bool):
+        if self.breaker is not None:
+            self.breaker.record_failure() if failed else self.breaker.record_success()
+
+    def __getattr__(self, item):
+        # prefetch, _ensure_loaded, ... của provider gốc
+        return getattr(self.provider, item)
+
+    def _account(self, usage: TokenUsage, index: str, prompt: str, output: str) -> TokenUsage:
+        usage.fill_estimates(prompt, output)
+        record_usage(self.name, index, usage)
+        return usage
+
+    async def generate(self, prompt: str, usage: Optional[TokenUsage] = None, **kwargs):
+        usage = usage if usage is not None else TokenUsage()
+        index = usage_index_var.get()
+        with span("llm.generate", provider=self.name) as s:
+            async with self.governor.slot():
+                t0 = time.perf_counter()
+                self.stats.start()
+                result, failed = None, False
+                try:
+                    result = await self.provider.generate(prompt, usage=usage, **kwargs)
+                    self._report(failed=False)
+                    return result
+                except Exception:
+                    failed = True
+                    self._report(failed=True)
+                    raise
+                finally:
+                    text = "\n".join(result) if isinstance(result, list) else (result or "")
+                    duration = time.perf_counter() - t0
+                    # Non-streaming: token đầu tiên tới cùng lúc với cả response
+                    ttft = duration if result is not None else None
+                    self._account(usage, index, prompt, text)
+                    self.stats.finish(ttft, usage.completion_tokens, duration, not failed)
+                    s.set(tokens_in=usage.prompt_tokens or 0, tokens_out=usage.completion_tokens or 0)
+
+    async def generate_stream(self, prompt: str, usage: Optional[TokenUsage] = None,
+                              **kwargs) -> AsyncIterator[str]:
+        usage = usage if usage is not None else TokenUsage()
+        index = usage_index_var.get()
+        # Async generator: span không đổi context (xem core/tracing.py), tự end ở finally
+        s = start_span("llm.generate_stream", provider=self.name)
+        try:
+            async with self.governor.slot():
+                t0 = time.perf_counter()
+                self.stats.start()
+                ttft, parts, failed = None, [], False
+                try:
+                    async for chunk in self.provider.generate_stream(prompt, usage=usage, **kwargs):
+                        if ttft is None:
+                            ttft = time.perf_counter() - t0
+                            s.set(ttft_ms=round(ttft * 1000, 3))
+                        parts.append(chunk)
+                        yield chunk
+                    s.set(completed=True)  # stream chạy hết (không bị cancel / ngắt giữa chừng)
+                    self._report(failed=False)
+                except Exception as e:
+                    # Client ngắt stream (GeneratorExit / CancelledError) không tính là lỗi của provider
+                    failed = True
+                    self._report(failed=True)
+                    s.record_error(e)
+                    raise
+                finally:
+                    self._account(usage, index, prompt, "".join(parts))
+                    self.stats.finish(ttft, usage.completion_tokens, time.perf_counter() - t0, not failed)
+                    s.set(tokens_in=usage.prompt_tokens or 0, tokens_out=usage.completion_tokens or 0)
+        finally:
+            s.end()
+
+    @property
+    def name(self) -> str:
+        """Tên trong registry."""
+        return self.stats.name
+
+    @property
+    def model_name(self) -> str:
+        return self.provider.model_name
+
+    @property
+    def supports_streaming(self) -> bool:
+        return self.provider.supports_streaming
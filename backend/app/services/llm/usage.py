@@ -0,0 +1,81 @@
+# backend/app/services/llm/usage.py
+"""
+Token accounting cho mọi call LLM (InstrumentedProvider bọc generate / generate_stream).
+
+- Adapter nhận `usage: TokenUsage` qua kwargs và gọi usage.report(...) khi provider trả
+  usage metadata (Gemini usage_metadata, số token thật của HF tokenizer ...).
+- Phần provider không báo được ước lượng local: tokenizer HF của TOKEN_COUNT_TOKENIZER
+  nếu có cấu hình, không thì ~4 ký tự / token.
+- Kết quả ghi vào askforge_llm_tokens_total{provider, index, direction, source};
+  index lấy từ usage_index_var (chat request set, QG job kế thừa qua context của task).
+"""
+import logging
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import LLM_PROMPT_TOKENS, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Index của request đang gọi LLM (label cho counter)
+usage_index_var: ContextVar[str] = ContextVar("llm_usage_index", default="none")
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 ký tự / token (đủ để so sánh throughput giữa các provider)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+@lru_cache(maxsize=1)
+def _load_tokenizer(name: str):
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(name)
+    except Exception as e:
+        logger.warning(f"⚠️ Token count tokenizer '{name}' unavailable, using ~4 chars/token: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Ước lượng số token local khi provider không trả usage."""
+    if not text:
+        return 0
+    tokenizer = _load_tokenizer(settings.TOKEN_COUNT_TOKENIZER) if settings.TOKEN_COUNT_TOKENIZER else None
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+
+@dataclass
+class TokenUsage:
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    prompt_source: str = "estimate"  # provider | estimate
+    completion_source: str = "estimate"
+
+    def report(self, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        """Adapter gọi với số token provider trả về (None = không biết, để ước lượng)."""
+        if prompt_tokens is not None:
+            self.prompt_tokens, self.prompt_source = int(prompt_tokens), "provider"
+        if completion_tokens is not None:
+            self.completion_tokens, self.completion_source = int(completion_tokens), "provider"
+
+    def fill_estimates(self, prompt: str, output: str):
+        if self.prompt_source != "provider":
+            self.prompt_tokens = count_tokens(prompt)
+        if self.completion_source != "provider":
+            self.completion_tokens = count_tokens(output)
+
+    @property
+    def total_tokens(self) -> int:
+        return (self.prompt_tokens or 0) + (self.completion_tokens or 0)
+
+
+def record_usage(provider: str, index: str, usage: TokenUsage):
+    LLM_TOKENS.labels(provider, index, "prompt", usage.prompt_source).inc(usage.prompt_tokens or 0)
+    LLM_TOKENS.labels(provider, index, "completion", usage.completion_source).inc(usage.completion_tokens or 0)
+    if usage.prompt_tokens:
+        LLM_PROMPT_TOKENS.labels(provider).observe(usage.prompt_tokens)
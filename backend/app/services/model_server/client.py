@@ -0,0 +1,276 @@
+"""
+Client của model server: 1 Unix socket connection, multiplex nhiều request.
+
+- Gửi frame dưới write lock; 1 reader thread nhận response và resolve
+  concurrent.futures.Future theo "id" -> dùng được cả từ code sync
+  (vector repo trong worker thread) lẫn async (asyncio.wrap_future).
+- Server dùng chung giữa các API worker: close() chỉ đóng connection; server được
+  spawn tự thoát khi không còn client nào (MODEL_SERVER_IDLE_EXIT_S).
+- RemoteQuestionGenerator: LLMProvider mỏng thay cho QuestionGeneratorAdapter.
+- RemoteEmbeddingService: cùng interface với EmbeddingService.
+"""
+import asyncio
+import itertools
+import logging
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from threading import Lock, Thread
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.embedding.service import ChromaEmbeddingAdapter, LangChainEmbeddingAdapter
+from ask_forge.backend.app.services.llm.base import LLMProvider
+from ask_forge.backend.app.services.llm.model_manager import qg_checkpoint_for
+from ask_forge.backend.app.services.llm.usage import TokenUsage
+from ask_forge.backend.app.services.model_server.protocol import encode_frame, recv_frame, unpack_array
+
+logger = logging.getLogger(__name__)
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+class ModelServerClient:
+    def __init__(self, socket_path: Optional[str] = None):
+        self.socket_path = socket_path or settings.MODEL_SERVER_SOCKET
+        self._sock: Optional[socket.socket] = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+        self._process: Optional[subprocess.Popen] = None
+
+    # ------------------------------------------------------------
+    # Connection
+    # ------------------------------------------------------------
+    def _connect(self) -> socket.socket:
+        """Gọi dưới self._lock."""
+        if self._sock is not None:
+            return self._sock
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.socket_path)
+        self._sock = sock
+        Thread(target=self._reader, args=(sock,), name="model-server-reader", daemon=True).start()
+        logger.info("🔗 Connected to model server at %s", self.socket_path)
+        return sock
+
+    def _reader(self, sock: socket.socket):
+        try:
+            while True:
+                message = recv_frame(sock)
+                with self._lock:
+                    fut = self._pending.pop(message.get("id"), None)
+                if fut is None:
+                    continue
+                if "error" in message:
+                    fut.set_exception(ModelServerError(message["error"]))
+                else:
+                    fut.set_result(message.get("result"))
+        except (OSError, ConnectionError, ValueError) as e:
+            self._fail_pending(sock, e)
+
+    def _fail_pending(self, sock: socket.socket, error: Exception):
+        with self._lock:
+            if self._sock is sock:
+                self._sock = None
+            pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(ModelServerError(f"Model server connection lost: {error}"))
+        try:
+            sock.close()
+        except OSError:
+            pass
+
+    def ensure_running(self, timeout: Optional[float] = None):
+        """Connect tới server; spawn subprocess nếu chưa có (MODEL_SERVER_SPAWN)."""
+        timeout = timeout or settings.MODEL_SERVER_START_TIMEOUT_S
+        try:
+            with self._lock:
+                self._connect()
+            return
+        except OSError:
+            if not settings.MODEL_SERVER_SPAWN:
+                raise
+
+        logger.info("🚀 Spawning model server (%s)", self.socket_path)
+        # Session riêng: signal gửi tới process group của worker này không kill server dùng chung
+        self._process = subprocess.Popen([
+            sys.executable, "-m", "ask_forge.backend.app.services.model_server.server",
+            "--socket", self.socket_path,
+            "--exit-when-idle",
+        ], start_new_session=True)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with self._lock:
+                    self._connect()
+                return
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise ModelServerError(f"Model server did not start within {timeout}s")
+                time.sleep(0.1)
+
+    # ------------------------------------------------------------
+    # Calls
+    # ------------------------------------------------------------
+    def submit(self, method: str, params: Optional[Dict[str, Any]] = None) -> Future:
+        return self._send(method, params)[1]
+
+    def _send(self, method: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Future]:
+        fut: Future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            sock = self._connect()
+            self._pending[request_id] = fut
+            try:
+                sock.sendall(encode_frame({"id": request_id, "method": method, "params": params or {}}))
+            except OSError as e:
+                self._pending.pop(request_id, None)
+                raise ModelServerError(f"Model server unavailable: {e}") from e
+        return request_id, fut
+
+    def _forget(self, request_id: int):
+        """Request hết timeout: bỏ khỏi _pending (server có thể không bao giờ trả lời)."""
+        with self._lock:
+            self._pending.pop(request_id, None)
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        request_id, fut = self._send(method, params)
+        try:
+            return fut.result(timeout=timeout or settings.MODEL_SERVER_REQUEST_TIMEOUT_S)
+        except FutureTimeoutError:
+            self._forget(request_id)
+            raise
+
+    async def acall(self, method: str, params: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> Any:
+        request_id, fut = await asyncio.to_thread(self._send, method, params)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(fut),
+                timeout=timeout or settings.MODEL_SERVER_REQUEST_TIMEOUT_S,
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            self._forget(request_id)
+            raise
+
+    def close(self):
+        """Chỉ đóng connection: server dùng chung với worker khác, tự thoát khi hết client."""
+        with self._lock:
+            sock, self._sock = self._sock, None
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._process = None
+
+
+@lru_cache(maxsize=1)
+def get_model_server_client() -> ModelServerClient:
+    return ModelServerClient()
+
+
+class RemoteQuestionGenerator(LLMProvider):
+    """LLMProvider gọi question generator nằm trong model server (checkpoint theo lang)."""
+
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or get_model_server_client()
+        self._prefetches: set = set()
+
+    async def _ensure_loaded(self):
+        await self.client.acall("load", {"model_repo": qg_checkpoint_for()})
+
+    def prefetch(self, lang: Optional[str] = None):
+        """Fire-and-forget: server load trước checkpoint cho lang."""
+        task = asyncio.create_task(self.client.acall("load", {"model_repo": qg_checkpoint_for(lang)}))
+        self._prefetches.add(task)
+        task.add_done_callback(self._prefetch_done)
+
+    def _prefetch_done(self, task: asyncio.Task):
+        self._prefetches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("⚠️ QG prefetch failed: %s", task.exception())
+
+    async def generate(self, prompt: str, n: int = 5, lang: Optional[str] = None,
+                       usage: Optional[TokenUsage] = None, **kwargs) -> List[str]:
+        reply = await self.client.acall("generate", {"prompt": prompt, "model_repo": qg_checkpoint_for(lang)})
+        questions = reply["questions"]
+        if usage is not None:
+            # Số token do tokenizer trong model server đếm
+            usage.report(reply.get("prompt_tokens"), reply.get("completion_tokens"))
+        logger.info(f"✅ Generated {len(questions)}/{n} questions (model server)")
+        return questions
+
+    async def generate_stream(self, prompt: str, **kwargs) -> AsyncIterator[str]:
+        raise NotImplementedError("QG does not support streaming")
+
+    @property
+    def model_name(self) -> str:
+        return f"remote:hf:{qg_checkpoint_for()}"
+
+    @property
+    def supports_streaming(self) -> bool:
+        return False
+
+
+class RemoteEmbeddingService:
+    """Cùng interface với EmbeddingService; encode chạy trong model server."""
+
+    def __init__(self, client: Optional[ModelServerClient] = None):
+        self.client = client or get_model_server_client()
+        self.model_name = settings.EMBEDDING_MODEL
+        self._dimension: Optional[int] = None
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._dimension is not None
+
+    @property
+    def active_backend(self) -> str:
+        return "remote"
+
+    def load(self):
+        self.client.ensure_running()
+        self._dimension = int(self.client.call("dimension"))
+
+    def close(self):
+        self.client.close()
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            self.load()
+        return self._dimension
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return unpack_array(self.client.call("embed", {"texts": list(texts)}))
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        return self.encode(texts)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        # Server gom các embed_query đồng thời từ mọi worker thành batch
+        return unpack_array(self.client.call("embed_query", {"text": text}))
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        return unpack_array(await self.client.acall("embed_query", {"text": text}))
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        if len(texts) == 1:
+            return self.embed_query(texts[0])[None, :]
+        return self.encode(texts)
+
+    def as_chroma(self) -> ChromaEmbeddingAdapter:
+        return ChromaEmbeddingAdapter(self)
+
+    def as_langchain(self) -> LangChainEmbeddingAdapter:
+        return LangChainEmbeddingAdapter(self)
@@ -0,0 +1,77 @@
+"""
+Wire protocol giữa API workers và model server.
+
+Mỗi frame = 4 byte độ dài (big-endian) + JSON UTF-8.
+    request : {"id": int, "method": str, "params": {...}}
+    response: {"id": int, "result": ...} | {"id": int, "error": str}
+
+Nhiều request dùng chung 1 connection (multiplex theo "id"); response có thể
+về không theo thứ tự. Ma trận vector được gửi dạng base64 float32.
+"""
+import asyncio
+import base64
+import json
+import socket
+import struct
+from typing import Any, Dict
+
+import numpy as np
+
+_HEADER = struct.Struct(">I")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(payload)) + payload
+
+
+def _decode_payload(payload: bytes) -> Dict[str, Any]:
+    return json.loads(payload.decode("utf-8"))
+
+
+def _check_length(length: int):
+    if length > MAX_FRAME_BYTES:
+        raise ValueError(f"Frame too large: {length} bytes")
+
+
+# ------------------------------------------------------------
+# asyncio (server)
+# ------------------------------------------------------------
+async def read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """Raise asyncio.IncompleteReadError khi peer đóng connection."""
+    (length,) = _HEADER.unpack(await reader.readexactly(_HEADER.size))
+    _check_length(length)
+    return _decode_payload(await reader.readexactly(length))
+
+
+# ------------------------------------------------------------
+# Blocking socket (client reader thread)
+# ------------------------------------------------------------
+def _recv_exactly(sock: socket.socket, n: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < n:
+        chunk = sock.recv(n - len(buf))
+        if not chunk:
+            raise ConnectionError("Model server closed the connection")
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def recv_frame(sock: socket.socket) -> Dict[str, Any]:
+    (length,) = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    _check_length(length)
+    return _decode_payload(_recv_exactly(sock, length))
+
+
+# ------------------------------------------------------------
+# Arrays
+# ------------------------------------------------------------
+def pack_array(array: np.ndarray) -> Dict[str, Any]:
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    return {"shape": list(array.shape), "data": base64.b64encode(array.tobytes()).decode("ascii")}
+
+
+def unpack_array(packed: Dict[str, Any]) -> np.ndarray:
+    data = base64.b64decode(packed["data"])
+    return np.frombuffer(data, dtype=np.float32).reshape(packed["shape"]).copy()
@@ -0,0 +1,274 @@
+"""
+Model server - process riêng sở hữu các HF model (question generator + embedding).
+
+API workers nói chuyện với server qua Unix socket (xem protocol.py), nên torch
+compute không tranh GIL/RAM với request handling và mọi uvicorn worker dùng
+chung 1 bản weights.
+
+Methods:
+    ping                                   -> {"pid", "models" (ModelManager report), "embedding_backend"}
+    load      {model_repo?}                -> {"model_repo"}
+    generate  {prompt, model_repo?}        -> {"questions": List[str], "prompt_tokens", "completion_tokens"}
+                                              (gom batch theo model_repo)
+    embed     {texts}                      -> packed float32 (n, dim)
+    embed_query {text}                     -> packed float32 (dim,) (micro-batched)
+    dimension                              -> int
+
+Chạy:
+    python -m ask_forge.backend.app.services.model_server.server --socket /tmp/askforge-models.sock
+"""
+import argparse
+import asyncio
+import fcntl
+import logging
+import os
+import signal
+import socket
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.embedding.service import EmbeddingService
+from ask_forge.backend.app.services.llm.adapters.question_generator import QuestionGeneratorAdapter
+from ask_forge.backend.app.services.llm.model_manager import ModelManager, qg_checkpoint_for
+from ask_forge.backend.app.services.llm.usage import TokenUsage
+from ask_forge.backend.app.services.model_server.protocol import encode_frame, pack_array, read_frame
+
+logger = logging.getLogger(__name__)
+
+
+class _GenerateBatcher:
+    """Gom các request generate đồng thời (cùng model_repo) thành 1 lần model.generate."""
+
+    def __init__(self, server: "ModelServer", max_batch_size: int, max_wait_ms: float):
+        self.server = server
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000.0
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, model_repo: str, prompt: str) -> Dict[str, Any]:
+        fut = asyncio.get_running_loop().create_future()
+        if model_repo not in self._queues:
+            self._queues[model_repo] = asyncio.Queue()
+            self._workers[model_repo] = asyncio.create_task(self._run(model_repo))
+        await self._queues[model_repo].put((prompt, fut))
+        return await fut
+
+    async def _collect(self, q: asyncio.Queue) -> List[Tuple[str, asyncio.Future]]:
+        batch = [await q.get()]
+        deadline = time.perf_counter() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(q.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self, model_repo: str):
+        q = self._queues[model_repo]
+        while True:
+            batch = [(p, f) for p, f in await self._collect(q) if not f.done()]
+            if not batch:
+                continue
+            usages = [TokenUsage() for _ in batch]
+            try:
+                async with self.server.models.acquire(model_repo) as adapter:
+                    results = await adapter.generate_batch([p for p, _ in batch], usages=usages)
+            except Exception as e:
+                logger.exception("❌ Batched generate failed (%s, %d prompts)", model_repo, len(batch))
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            logger.info("✅ Generated batch of %d for %s", len(batch), model_repo)
+            for (_, fut), questions, usage in zip(batch, results, usages):
+                if not fut.done():
+                    fut.set_result({
+                        "questions": questions,
+                        "prompt_tokens": usage.prompt_tokens,
+                        "completion_tokens": usage.completion_tokens,
+                    })
+
+    def stop(self):
+        for task in self._workers.values():
+            task.cancel()
+
+
+class ModelServer:
+    def __init__(self, socket_path: str):
+        self.socket_path = socket_path
+        self.embedding = EmbeddingService()
+        # Nhiều checkpoint QG (QG_CHECKPOINTS) dưới chung 1 RAM budget
+        self.models = ModelManager(QuestionGeneratorAdapter)
+        self._batcher = _GenerateBatcher(
+            self,
+            max_batch_size=settings.MODEL_SERVER_MAX_BATCH,
+            max_wait_ms=settings.MODEL_SERVER_BATCH_WAIT_MS,
+        )
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients = 0
+        self._idle_exit: Optional[asyncio.TimerHandle] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    # ------------------------------------------------------------
+    # Models
+    # ------------------------------------------------------------
+    async def preload(self):
+        try:
+            await asyncio.to_thread(self.embedding.load)
+            if settings.HF_PRELOAD_AT_STARTUP:
+                await self.models.prefetch(qg_checkpoint_for())
+        except Exception:
+            logger.exception("❌ Model preload failed (models will load on first request)")
+
+    # ------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------
+    async def _dispatch(self, method: str, params: Dict[str, Any]) -> Any:
+        if method == "ping":
+            return {
+                "pid": os.getpid(),
+                "models": self.models.report(),
+                "embedding_backend": self.embedding.active_backend,
+            }
+        if method == "load":
+            model_repo = params.get("model_repo") or qg_checkpoint_for()
+            async with self.models.acquire(model_repo):
+                return {"model_repo": model_repo}
+        if method == "generate":
+            model_repo = params.get("model_repo") or qg_checkpoint_for()
+            return await self._batcher.submit(model_repo, params["prompt"])
+        if method == "embed":
+            return pack_array(await asyncio.to_thread(self.embedding.encode, params["texts"]))
+        if method == "embed_query":
+            return pack_array(await self.embedding.aembed_query(params["text"]))
+        if method == "dimension":
+            return await asyncio.to_thread(lambda: self.embedding.dimension)
+        raise ValueError(f"Unknown method: {method}")
+
+    async def _handle_request(self, message: Dict[str, Any], writer: asyncio.StreamWriter, write_lock: asyncio.Lock):
+        try:
+            response = {"id": message["id"], "result": await self._dispatch(message["method"], message.get("params") or {})}
+        except Exception as e:
+            logger.exception("❌ Model server request failed: %s", message.get("method"))
+            response = {"id": message.get("id"), "error": f"{type(e).__name__}: {e}"}
+        async with write_lock:
+            writer.write(encode_frame(response))
+            await writer.drain()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        self._client_connected()
+        try:
+            while True:
+                message = await read_frame(reader)
+                # Mỗi request 1 task: connection không bị chặn bởi request chậm
+                task = asyncio.create_task(self._handle_request(message, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            self._client_disconnected()
+
+    # ------------------------------------------------------------
+    # Client refcount (server spawn bởi API worker, --exit-when-idle)
+    # ------------------------------------------------------------
+    def _client_connected(self):
+        self._clients += 1
+        if self._idle_exit is not None:
+            self._idle_exit.cancel()
+            self._idle_exit = None
+
+    def _client_disconnected(self):
+        self._clients -= 1
+        self._schedule_idle_exit()
+
+    def _schedule_idle_exit(self):
+        if self._stop is None or self._clients > 0 or self._idle_exit is not None:
+            return
+        delay = settings.MODEL_SERVER_IDLE_EXIT_S
+
+        def _exit():
+            self._idle_exit = None
+            if self._clients == 0:
+                logger.info("💤 No clients for %.0fs, stopping model server", delay)
+                self._stop.set()
+
+        self._idle_exit = asyncio.get_running_loop().call_later(delay, _exit)
+
+    # ------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------
+    async def serve(self, exit_when_idle: bool = False):
+        path = Path(self.socket_path)
+        if path.exists():
+            path.unlink()
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=str(path))
+        logger.info("🚀 Model server listening on %s (pid=%d)", path, os.getpid())
+
+        self.models.start()
+        # Bind socket trước rồi mới load model: client connect được ngay, request đầu chờ load xong
+        asyncio.create_task(self.preload())
+
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            loop.add_signal_handler(sig, stop.set)
+        if exit_when_idle:
+            # Worker spawn server sẽ connect ngay; thoát nếu không worker nào dùng
+            self._stop = stop
+            self._schedule_idle_exit()
+        async with self._server:
+            await stop.wait()
+
+        self._batcher.stop()
+        self.models.stop()
+        self.embedding.close()
+        if path.exists():
+            path.unlink()
+        logger.info("🛑 Model server stopped")
+
+
+def _socket_alive(path: str) -> bool:
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(path)
+        return True
+    except OSError:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask Forge model server")
+    parser.add_argument("--socket", default=settings.MODEL_SERVER_SOCKET)
+    parser.add_argument("--exit-when-idle", action="store_true",
+                        help="stop after MODEL_SERVER_IDLE_EXIT_S with no connected client")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s [model-server] %(message)s")
+
+    # Nhiều API worker có thể cùng spawn server: chỉ 1 process giữ được lock
+    lock_file = open(f"{args.socket}.lock", "w")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logger.info("Another model server owns %s, exiting", args.socket)
+        return
+    if _socket_alive(args.socket):
+        logger.info("Model server already running on %s, exiting", args.socket)
+        return
+
+    asyncio.run(ModelServer(args.socket).serve(exit_when_idle=args.exit_when_idle))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Cache kết quả QG theo (seed question đã normalize, context chunk ids, lang, checkpoint).
+
+Chunk id gắn với index (index_name::source::chunk_id) -> 2 index có cùng tên file /
+chunk id không dùng chung entry. Index bị build lại / xoá -> invalidate(index_name)
+xoá các entry dùng index đó; job bắt đầu trước lúc invalidate không được ghi lại kết quả cũ.
+
+- Trong RAM: LRU có giới hạn số entry + TTL.
+- Tuỳ chọn persist xuống SQLite (QG_CACHE_SQLITE_PATH): entry sống qua restart,
+  miss trong RAM sẽ đọc lại từ SQLite rồi nạp vào LRU.
+
+Hit trả về ngay, không route provider / không load model.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import QG_CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+_WS = re.compile(r"\s+")
+_PRUNE_EVERY = 256  # số lần ghi SQLite giữa 2 lần dọn entry cũ
+
+
+def normalize_seed(question: str) -> str:
+    """NFKC + casefold + gộp whitespace, bỏ dấu câu cuối ("Là gì ?" == "là gì")."""
+    text = unicodedata.normalize("NFKC", question).casefold()
+    return _WS.sub(" ", text).strip().rstrip("?!.。？！ ")
+
+
+def context_fingerprint(contexts: List[Dict], index_name: str = "") -> List[str]:
+    """
+    Id ổn định của từng chunk (index::source::chunk_id), fallback hash của text.
+    Context của query 1 index không có index_name -> dùng index_name của request.
+    """
+    ids = []
+    for c in contexts or []:
+        if c.get("chunk_id"):
+            ids.append(f"{c.get('index_name') or index_name}::{c.get('source', '')}::{c['chunk_id']}")
+        else:
+            ids.append("text:" + hashlib.sha256(c.get("text", "").encode("utf-8")).hexdigest()[:16])
+    return sorted(ids)
+
+
+def context_indexes(contexts: List[Dict], index_name: str = "") -> List[str]:
+    """Các index mà contexts đến từ (để invalidate entry khi index đổi)."""
+    names = {c.get("index_name") or index_name for c in contexts or []}
+    return sorted(n for n in names if n)
+
+
+def make_key(seed_question: str, contexts: List[Dict], lang: str, checkpoint: str, index_name: str = "") -> str:
+    payload = json.dumps(
+        [normalize_seed(seed_question), context_fingerprint(contexts, index_name), lang or "", checkpoint],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _indexes_column(indexes: Iterable[str]) -> str:
+    # "|a|b|": tìm entry theo index bằng instr(indexes, "|a|")
+    return "|" + "|".join(indexes) + "|" if indexes else ""
+
+
+class QGResultCache:
+    def __init__(self,
+                 max_entries: Optional[int] = None,
+                 ttl_s: Optional[float] = None,
+                 sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries or settings.QG_CACHE_MAX_ENTRIES
+        self.ttl_s = settings.QG_CACHE_TTL_S if ttl_s is None else ttl_s  # 0 = không hết hạn
+        self._entries: "OrderedDict[str, Tuple[float, List[str], Tuple[str, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_writes = 0
+        # Số lần invalidate của từng index: set() bỏ kết quả của job bắt đầu trước invalidate
+        self._generations: Dict[str, int] = {}
+
+        sqlite_path = settings.QG_CACHE_SQLITE_PATH if sqlite_path is None else sqlite_path
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            Path(sqlite_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS qg_cache ("
+                "key TEXT PRIMARY KEY, questions TEXT NOT NULL, created_at REAL NOT NULL, "
+                "indexes TEXT NOT NULL DEFAULT '')"
+            )
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(qg_cache)")}
+            if "indexes" not in columns:  # file cache tạo trước khi có cột indexes
+                self._db.execute("ALTER TABLE qg_cache ADD COLUMN indexes TEXT NOT NULL DEFAULT ''")
+            self._db.commit()
+            self._prune_db()
+            logger.info("🗄️ QG cache persisted to %s", sqlite_path)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_s > 0 and time.time() - created_at > self.ttl_s
+
+    # ------------------------------------------------------------
+    # Get / set (sync: gọi qua asyncio.to_thread khi có SQLite)
+    # ------------------------------------------------------------
+    def get(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self._entries[key]
+                entry = None
+            if entry is None and self._db is not None:
+                row = self._db.execute(
+                    "SELECT created_at, questions, indexes FROM qg_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[0]):
+                    entry = (row[0], json.loads(row[1]), tuple(i for i in row[2].split("|") if i))
+                    self._put(key, entry)
+            if entry is None:
+                QG_CACHE_REQUESTS.labels("miss").inc()
+                return None
+            self._entries.move_to_end(key)
+            QG_CACHE_REQUESTS.labels("hit").inc()
+            return list(entry[1])
+
+    def generation(self, indexes: Iterable[str]) -> Tuple[int, ...]:
+        """Chụp lúc job bắt đầu, truyền lại cho set()."""
+        with self._lock:
+            return tuple(self._generations.get(i, 0) for i in indexes)
+
+    def set(self, key: str, questions: List[str], indexes: Iterable[str] = (),
+            generation: Optional[Tuple[int, ...]] = None):
+        indexes = tuple(indexes)
+        entry = (time.time(), list(questions), indexes)
+        with self._lock:
+            current = tuple(self._generations.get(i, 0) for i in indexes)
+            if generation is not None and generation != current:
+                # Index đổi trong lúc generate: câu hỏi dựa trên nội dung cũ
+                return
+            self._put(key, entry)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO qg_cache (key, questions, created_at, indexes) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(entry[1], ensure_ascii=False), entry[0], _indexes_column(indexes)),
+                )
+                self._db.commit()
+                self._db_writes += 1
+                if self._db_writes % _PRUNE_EVERY == 0:
+                    self._prune_db()
+
+    def _put(self, key: str, entry: Tuple[float, List[str], Tuple[str, ...]]):
+        """Gọi dưới self._lock."""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_db(self):
+        """Xoá entry hết hạn và giữ tối đa max_entries entry mới nhất trong SQLite."""
+        if self.ttl_s > 0:
+            self._db.execute("DELETE FROM qg_cache WHERE created_at < ?", (time.time() - self.ttl_s,))
+        self._db.execute(
+            "DELETE FROM qg_cache WHERE key NOT IN "
+            "(SELECT key FROM qg_cache ORDER BY created_at DESC LIMIT ?)",
+            (self.max_entries,),
+        )
+        self._db.commit()
+
+    def invalidate(self, index_name: str):
+        """Index bị build lại / thêm tài liệu / xoá -> bỏ mọi entry dùng index đó."""
+        with self._lock:
+            self._generations[index_name] = self._generations.get(index_name, 0) + 1
+            stale = [key for key, entry in self._entries.items() if index_name in entry[2]]
+            for key in stale:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM qg_cache WHERE instr(indexes, ?) > 0", (_indexes_column([index_name]),)
+                )
+                self._db.commit()
+        if stale:
+            logger.info("🧹 QG cache invalidated for %s (%d entries)", index_name, len(stale))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM qg_cache")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
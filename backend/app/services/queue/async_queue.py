@@ -1,9 +1,17 @@
 import asyncio
+import time
 import uuid
 import logging
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
 from datetime import datetime
 
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import QG_JOB_SECONDS
+from ask_forge.backend.app.core.tracing import span
+from ask_forge.backend.app.services.llm.model_manager import qg_checkpoint_for
+from ask_forge.backend.app.services.qg.cache import QGResultCache, context_indexes, make_key
+from ask_forge.backend.app.utils.singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
 class AsyncBackgroundQueue:
@@ -20,9 +28,11 @@ class AsyncBackgroundQueue:
     - Runs in same process (CPU bound tasks block event loop)
     """
 
-    def __init__(self):
+    def __init__(self, flight: Optional[SingleFlight] = None):
         self._jobs: Dict[str, dict] = {} # {job_id: {status, result, error}}
         self._lock = asyncio.Lock()
+        self.flight = flight or SingleFlight()
+        self.qg_cache: Optional[QGResultCache] = QGResultCache() if settings.QG_CACHE_ENABLED else None
 
     async def enqueue_qg(
             self,
@@ -31,9 +41,11 @@ class AsyncBackgroundQueue:
             lang: str,
             session_id: str,
             app_state,
+            index_name: str = "",
     ) -> str:
         """Enqueue QG task to background worker"""
         job_id = str(uuid.uuid4())
+        enqueued_at = time.perf_counter()
 
         # Initialize job status
         async with self._lock:
@@ -44,7 +56,7 @@ class AsyncBackgroundQueue:
                 "created_at": datetime.now().isoformat(),
             }
 
-        # ✅ Create background task (non-blocking)
+        # ✅ Create background task (non-blocking); task kế thừa context (request_id, span chat.stream)
         asyncio.create_task(
             self._run_qg_task(
                 job_id=job_id,
@@ -53,6 +65,8 @@ class AsyncBackgroundQueue:
                 lang=lang,
                 session_id=session_id,
                 app_state=app_state,
+                index_name=index_name,
+                enqueued_at=enqueued_at,
             )
         )
         return job_id
@@ -65,44 +79,87 @@ class AsyncBackgroundQueue:
             lang: str,
             session_id: str,
             app_state,
+            index_name: str = "",
+            enqueued_at: Optional[float] = None,
     ):
         """Actually run the QG task"""
-        try:
-            logger.info(f"🔧 QG task started: {job_id}")
-
-            # Route to provider
-            provider = await app_state.llm_router.route({
-                "task": "question_generation",
-                "prefer_local": True,
-            })
-
-            logger.info(f"✅ Routed to: {provider.model_name}")
-
-            # Generate questions
-            questions = await provider.generate(
-                prompt=seed_question,
-                contexts=contexts,
-                n=5,
-                lang=lang,
-            )
+        enqueued_at = enqueued_at or time.perf_counter()
+        provider = "none"
+        with span("qg.job", job_id=job_id, index=index_name, lang=lang) as job_span:
+            job_span.set(queue_ms=round((time.perf_counter() - enqueued_at) * 1000, 3))
+            try:
+                logger.info(f"🔧 QG task started: {job_id}")
+
+                # Job trùng (seed + contexts + lang + checkpoint) đang chạy -> dùng chung 1 lần generate
+                key = make_key(seed_question, contexts, lang, qg_checkpoint_for(lang), index_name)
+                questions, cached, provider = await self.flight.do(
+                    "qg", key,
+                    lambda: self._generate_questions(
+                        key, seed_question, contexts, lang, app_state, context_indexes(contexts, index_name)
+                    ),
+                )
+
+                # Update job status
+                async with self._lock:
+                    self._jobs[job_id].update({
+                        "status": "completed",
+                        "result": list(questions),
+                        "cached": cached,
+                        "completed_at": datetime.now().isoformat(),
+                    })
+
+                QG_JOB_SECONDS.labels(index_name, provider, "completed").observe(time.perf_counter() - enqueued_at)
+                job_span.set(provider=provider, cached=cached, n_questions=len(questions))
+                logger.info(f"✅ QG task completed: {job_id} ({len(questions)} questions, cached={cached})")
+            except Exception as e:
+                QG_JOB_SECONDS.labels(index_name, provider, "failed").observe(time.perf_counter() - enqueued_at)
+                job_span.set(provider=provider)
+                job_span.record_error(e)
+                logger.exception(f"❌ QG task failed: {job_id}")
+                async with self._lock:
+                    self._jobs[job_id].update({
+                        "status": "failed",
+                        "error": str(e),
+                        "failed_at": datetime.now().isoformat(),
+                    })
+
+    async def _generate_questions(
+            self,
+            key: str,
+            seed_question: str,
+            contexts: List[dict],
+            lang: str,
+            app_state,
+            indexes: Optional[List[str]] = None,
+    ) -> Tuple[List[str], bool, str]:
+        """Trả về (questions, cached, provider) - provider = "cache" khi lấy từ QG cache."""
+        indexes = indexes or []
+        # Cache hit: trả kết quả luôn, không route / không chạm model
+        if self.qg_cache is not None:
+            generation = self.qg_cache.generation(indexes)
+            questions = await asyncio.to_thread(self.qg_cache.get, key)
+            if questions is not None:
+                return questions, True, "cache"
+
+        # Route to provider
+        provider = await app_state.llm_router.route({
+            "task": "question_generation",
+            "prefer_local": True,
+        })
+
+        logger.info(f"✅ Routed to: {provider.model_name}")
+
+        # Generate questions
+        questions = await provider.generate(
+            prompt=seed_question,
+            contexts=contexts,
+            n=5,
+            lang=lang,
+        )
 
-            # Update job status
-            async with self._lock:
-                self._jobs[job_id].update({
-                    "status": "completed",
-                    "result": questions,
-                    "completed_at": datetime.now().isoformat(),
-                })
-
-            logger.info(f"✅ QG task completed: {job_id} ({len(questions)} questions)")
-        except Exception as e:
-            logger.exception(f"❌ QG task failed: {job_id}")
-            async with self._lock:
-                self._jobs[job_id].update({
-                    "status": "failed",
-                    "error": str(e),
-                    "failed_at": datetime.now().isoformat(),
-                })
+        if self.qg_cache is not None and questions:
+            await asyncio.to_thread(self.qg_cache.set, key, questions, indexes, generation)
+        return questions, False, getattr(provider, "name", provider.model_name)
 
     async def get_result(self, job_id: str) -> Optional[list]:
         """Poll job result"""
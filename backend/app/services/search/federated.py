@@ -0,0 +1,193 @@
+"""
+Federated retrieval - query nhiều index song song trên thread pool giới hạn,
+merge theo calibrated score, shard chậm bị timeout và trả về partial results.
+
+Query đã timeout vẫn chạy tiếp trong pool (không huỷ được thread): mỗi shard chỉ được
+giữ tối đa FEDERATED_MAX_INFLIGHT_PER_SHARD query (chờ + đang chạy), quá thì shard bị
+bỏ qua ngay (status="shed") để shard chậm không chiếm hết pool của các request sau.
+"""
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.core.metrics import FEDERATED_SHARD_SHED
+from ask_forge.backend.app.core.tracing import bind_context, span
+from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
+
+logger = logging.getLogger(__name__)
+
+
+class _ScoreStats:
+    """Running mean/variance (Welford) của similarity score trả về từ một shard."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, scores: List[float]):
+        for x in scores:
+            self.n += 1
+            delta = x - self.mean
+            self.mean += delta / self.n
+            self._m2 += delta * (x - self.mean)
+
+    @property
+    def var(self) -> float:
+        return self._m2 / (self.n - 1) if self.n > 1 else 0.0
+
+
+class FederatedSearcher:
+    """
+    Query một danh sách index đồng thời và merge kết quả.
+
+    Calibration: mỗi shard có phân phối score riêng (độ dài chunk, domain...),
+    nên score được chuẩn hoá thành z-score theo thống kê của shard, shrink về
+    thống kê chung của mọi shard khi shard còn ít mẫu. Chưa có thống kê nào
+    thì calibrated score = raw cosine.
+    """
+
+    def __init__(self,
+                 repo: ChromaRepo,
+                 max_workers: Optional[int] = None,
+                 shard_timeout_s: Optional[float] = None,
+                 prior_weight: Optional[int] = None,
+                 max_inflight_per_shard: Optional[int] = None):
+        self.repo = repo
+        self.max_inflight_per_shard = max_inflight_per_shard or settings.FEDERATED_MAX_INFLIGHT_PER_SHARD
+        self.shard_timeout_s = shard_timeout_s or settings.FEDERATED_SHARD_TIMEOUT_S
+        self.prior_weight = prior_weight if prior_weight is not None else settings.FEDERATED_CALIBRATION_PRIOR
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or settings.FEDERATED_MAX_WORKERS,
+            thread_name_prefix="federated-search",
+        )
+        self._stats: Dict[str, _ScoreStats] = {}
+        self._global = _ScoreStats()
+        self._lock = Lock()
+        self._inflight: Dict[str, int] = {}
+
+    # ------------------------------------------------------------
+    # Calibration
+    # ------------------------------------------------------------
+    def _observe(self, index_name: str, scores: List[float]):
+        with self._lock:
+            self._stats.setdefault(index_name, _ScoreStats()).update(scores)
+            self._global.update(scores)
+
+    def _calibrator(self, index_name: str) -> Tuple[float, float]:
+        """(mean, std) của shard, shrink về thống kê global theo prior_weight."""
+        with self._lock:
+            g = self._global
+            if g.n < 2:
+                return 0.0, 1.0
+            st = self._stats.get(index_name) or _ScoreStats()
+            w = self.prior_weight
+            mean = (st.n * st.mean + w * g.mean) / (st.n + w)
+            var = (st.n * st.var + w * g.var) / (st.n + w)
+        return mean, math.sqrt(var) if var > 1e-12 else 1.0
+
+    # ------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------
+    def _search_shard(self, index_name: str, query_text: str, n_results: int,
+                      search_params: Optional[Dict[str, Any]], deadline: float,
+                      query_embedding: Optional[np.ndarray] = None) -> Tuple[List[Dict[str, Any]], float]:
+        t0 = time.perf_counter()
+        if time.monotonic() > deadline:
+            # Chờ trong pool quá lâu: request đã trả partial results, không query nữa
+            raise TimeoutError("shard deadline passed before query started")
+        with span("search.shard", index=index_name, n_results=n_results) as s:
+            # Không lọc ở shard: lấy đủ score để cập nhật calibration, lọc sau khi merge
+            contexts = self.repo.get_context_for_chat(
+                index_name=index_name,
+                query_text=query_text,
+                n_results=n_results,
+                min_relevance=float("-inf"),
+                search_params=search_params,
+                query_embedding=query_embedding,
+            )
+            s.set(n_contexts=len(contexts))
+        return contexts, time.perf_counter() - t0
+
+    def search(self,
+               index_names: List[str],
+               query_text: str,
+               n_results: int = 5,
+               min_relevance: float = 0.0,
+               search_params: Optional[Dict[str, Any]] = None,
+               query_embedding: Optional[np.ndarray] = None,
+               ) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        Trả về (contexts đã merge, trạng thái từng shard).
+        query_embedding: vector của query_text đã embed sẵn, dùng chung cho mọi shard.
+
+        Mỗi context có thêm `index_name` và `calibrated_score`; `score` vẫn là raw cosine.
+        Shard quá SHARD_TIMEOUT bị bỏ qua (status="timeout"), lỗi -> status="error",
+        shard còn quá nhiều query chưa xong -> status="shed" (không submit).
+        """
+        index_names = list(dict.fromkeys(index_names))  # dedupe, giữ thứ tự
+        deadline = time.monotonic() + self.shard_timeout_s
+        shards: Dict[str, Dict[str, Any]] = {}
+        futures = {}
+        for name in index_names:
+            if not self._acquire_slot(name):
+                FEDERATED_SHARD_SHED.labels(name).inc()
+                shards[name] = {"status": "shed"}
+                logger.warning("🚫 Federated shard '%s' shed: %d queries still in flight", name, self.max_inflight_per_shard)
+                continue
+            fut = self._executor.submit(
+                bind_context(self._search_shard, name, query_text, n_results, search_params, deadline,
+                             query_embedding)
+            )
+            fut.add_done_callback(lambda _, name=name: self._release_slot(name))
+            futures[fut] = name
+        done, not_done = wait(futures, timeout=self.shard_timeout_s) if futures else (set(), set())
+
+        merged: List[Dict[str, Any]] = []
+        for fut in done:
+            name = futures[fut]
+            try:
+                contexts, elapsed = fut.result()
+            except Exception as e:
+                logger.warning("⚠️ Federated shard '%s' failed: %s", name, e)
+                shards[name] = {"status": "error", "error": str(e)}
+                continue
+
+            mean, std = self._calibrator(name)
+            self._observe(name, [c["score"] for c in contexts])
+            for c in contexts:
+                c["index_name"] = name
+                c["calibrated_score"] = round((c["score"] - mean) / std, 4)
+            merged.extend(contexts)
+            shards[name] = {"status": "ok", "count": len(contexts), "latency_ms": round(elapsed * 1000, 1)}
+
+        for fut in not_done:
+            name = futures[fut]
+            fut.cancel()  # chưa chạy thì huỷ; đang chạy thì bỏ kết quả
+            shards[name] = {"status": "timeout"}
+            logger.warning("⏱️ Federated shard '%s' timed out after %.2fs", name, self.shard_timeout_s)
+
+        shards = {name: shards[name] for name in index_names}
+        merged = [c for c in merged if c["score"] >= min_relevance]
+        merged.sort(key=lambda c: c["calibrated_score"], reverse=True)
+        return merged[:n_results], shards
+
+    def _acquire_slot(self, index_name: str) -> bool:
+        with self._lock:
+            if self._inflight.get(index_name, 0) >= self.max_inflight_per_shard:
+                return False
+            self._inflight[index_name] = self._inflight.get(index_name, 0) + 1
+            return True
+
+    def _release_slot(self, index_name: str):
+        with self._lock:
+            self._inflight[index_name] -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
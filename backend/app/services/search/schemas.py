@@ -0,0 +1,24 @@
+from __future__ import annotations
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from ask_forge.backend.app.services.chat.schemas import ContextChunk
+
+
+class BatchSearchBody(BaseModel):
+    index_name: str = Field(..., description="Tên index trong Chroma")
+    queries: List[str] = Field(..., min_length=1, description="Danh sách câu hỏi, embed trong 1 forward pass")
+    n_results: int = Field(default=5, ge=1)
+    min_rel: float = Field(default=0.0)
+    nprobe: Optional[int] = Field(default=None, description="Số IVF list được probe (chỉ dùng với VECTOR_INDEX_MODE=ivfpq)")
+
+
+class QueryResult(BaseModel):
+    query: str
+    contexts: List[ContextChunk] = Field(default_factory=list)
+
+
+class BatchSearchResponse(BaseModel):
+    ok: bool = True
+    index_name: str
+    results: List[QueryResult] = Field(default_factory=list)
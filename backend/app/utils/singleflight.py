@@ -0,0 +1,46 @@
+"""
+Single-flight: các lời gọi đồng thời cùng key dùng chung 1 lần tính.
+
+Caller đầu tiên (leader) tạo task; caller tới sau khi task còn đang chạy (follower)
+await chính task đó. Task được shield: 1 caller bị cancel (client ngắt SSE)
+không làm hỏng kết quả của các caller còn lại. Kết quả (hoặc exception) được
+chia sẻ nguyên bản -> caller không được mutate kết quả.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from ask_forge.backend.app.core.metrics import SINGLEFLIGHT_CALLS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, group: str, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Chạy fn() 1 lần cho mọi caller đồng thời cùng (group, key)."""
+        flight_key = (group, key)
+        task = self._inflight.get(flight_key)
+        if task is None:
+            SINGLEFLIGHT_CALLS.labels(group, "leader").inc()
+            task = asyncio.ensure_future(fn())
+            self._inflight[flight_key] = task
+            task.add_done_callback(lambda t: self._forget(flight_key, t))
+        else:
+            SINGLEFLIGHT_CALLS.labels(group, "shared").inc()
+            logger.debug("🔗 Joined in-flight %s call", group)
+        return await asyncio.shield(task)
+
+    def _forget(self, flight_key: Hashable, task: asyncio.Task):
+        if self._inflight.get(flight_key) is task:
+            del self._inflight[flight_key]
+        # Tránh "exception was never retrieved" khi mọi caller đã bị cancel
+        if not task.cancelled():
+            task.exception()
+
+    def inflight(self, group: str) -> int:
+        return sum(1 for g, _ in self._inflight if g == group)
@@ -0,0 +1,362 @@
+"""
+Micro-benchmark các hot path của indexing / retrieval, chạy offline.
+
+Corpus PDF tổng hợp (kích thước cấu hình được, sinh deterministic theo --seed),
+đo riêng từng stage:
+    load_pdfs              - parse PDF (PyPDFLoader)          items = pages
+    split_and_filter       - chunking                          items = chunks
+    embed_documents        - encode toàn bộ chunks             items = chunks
+    upsert[batch_size=B]   - repo.upsert (embed + ghi index)   items = chunks
+    get_context_for_chat[n_results=K]                          items = queries
+    render_prompt[n_results=K] - chat_prompt.txt + contexts     items = prompts
+
+Mỗi stage: median / min thời gian qua --repeat lần (sau 1 lần warmup), throughput
+(items/s) và bộ nhớ đỉnh của 1 lần chạy riêng có tracemalloc (heap Python; tensor của
+torch / ONNX nằm ngoài tracemalloc -> xem thêm rss_hwm_mb, high-water mark của process).
+
+Mặc định dùng 1 BERT tí hon (2 layer, hidden 64, weights random, vocab sinh từ corpus)
+build vào thư mục tạm -> không cần mạng; --embedding-model trỏ tới model local thật
+nếu muốn số liệu sát production. Chroma / index local ghi vào thư mục tạm.
+
+    python -m ask_forge.backend.benchmarks.bench_indexing --files 8 --pages 20 --output runs/indexing.json
+    python -m ask_forge.backend.benchmarks.bench_indexing --vector-mode int8 --upsert-batch-sizes 256,3000
+"""
+import argparse
+import asyncio
+import gc
+import io
+import json
+import logging
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ask_forge.backend.app.core.config import settings
+
+logger = logging.getLogger("askforge.bench")
+
+_WORDS = (
+    "data model question lesson knowledge example system network security algorithm "
+    "analysis document concept definition process result explain student teacher course "
+    "memory storage protocol packet encryption key password access control firewall server "
+    "client request response database index query vector search score context answer "
+    "du lieu mo hinh cau hoi bai hoc kien thuc vi du he thong mang bao mat thuat toan "
+    "phan tich tai lieu khai niem dinh nghia quy trinh kiem tra ket qua giai thich"
+).split()
+
+
+# ------------------------------------------------------------
+# Synthetic corpus
+# ------------------------------------------------------------
+def synthetic_lines(rng: random.Random, n_lines: int, words_per_line: int = 12) -> List[str]:
+    lines = []
+    for _ in range(n_lines):
+        n = rng.randint(words_per_line // 2, words_per_line)
+        lines.append(" ".join(rng.choice(_WORDS) for _ in range(n)).capitalize() + ".")
+    return lines
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """PDF tối giản (Helvetica, text ASCII), đủ để PyPDFLoader extract text theo trang."""
+    n_pages = len(pages)
+    objects: List[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            "<< /Type /Pages /Kids [" + " ".join(f"{4 + 2 * i} 0 R" for i in range(n_pages))
+            + f"] /Count {n_pages} >>"
+        ).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        body = "BT /F1 9 Tf 11 TL 36 806 Td " + " ".join(f"({_pdf_escape(l)}) Tj T*" for l in lines) + " ET"
+        stream = body.encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for num, obj in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % num + obj + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for off in offsets:
+        out.write(b"%010d 00000 n \n" % off)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_corpus(n_files: int, n_pages: int, lines_per_page: int, seed: int) -> List[Tuple[str, bytes]]:
+    rng = random.Random(seed)
+    return [
+        (f"synthetic_{i:03d}.pdf", make_pdf([synthetic_lines(rng, lines_per_page) for _ in range(n_pages)]))
+        for i in range(n_files)
+    ]
+
+
+def make_queries(n: int, seed: int) -> List[str]:
+    rng = random.Random(seed + 1)
+    return [" ".join(rng.choice(_WORDS) for _ in range(rng.randint(4, 10))) + "?" for _ in range(n)]
+
+
+# ------------------------------------------------------------
+# Tiny offline embedding model
+# ------------------------------------------------------------
+def build_tiny_model(target: Path, seed: int) -> str:
+    """BERT random 2 layer / hidden 64 + mean pooling, lưu theo format sentence-transformers."""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    hf_dir = target / "hf"
+    hf_dir.mkdir(parents=True, exist_ok=True)
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + sorted(set(_WORDS)) + list("abcdefghijklmnopqrstuvwxyz.?")
+    (hf_dir / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    BertTokenizerFast(vocab_file=str(hf_dir / "vocab.txt"), do_lower_case=True).save_pretrained(hf_dir)
+
+    torch.manual_seed(seed)
+    config = BertConfig(
+        vocab_size=len(vocab),
+        hidden_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=128,
+        max_position_embeddings=512,
+    )
+    BertModel(config).save_pretrained(hf_dir)
+
+    word = models.Transformer(str(hf_dir), max_seq_length=256)
+    pooling = models.Pooling(word.get_word_embedding_dimension(), pooling_mode="mean")
+    st_dir = target / "st"
+    SentenceTransformer(modules=[word, pooling]).save(str(st_dir))
+    return str(st_dir)
+
+
+def make_repo(mode: str):
+    """Giống AppState._create_vector_repo nhưng không cần AppState."""
+    from ask_forge.backend.app.repositories.quantized import QUANTIZATION_MODES, QuantizedRepo
+    from ask_forge.backend.app.repositories.vectorstore import ChromaRepo
+
+    if mode in QUANTIZATION_MODES:
+        return QuantizedRepo(mode=mode)
+    if mode == "ivfpq":
+        from ask_forge.backend.app.repositories.faiss_store import FaissIVFPQRepo
+        return FaissIVFPQRepo()
+    if mode != "float":
+        raise ValueError(f"Unknown VECTOR_INDEX_MODE: {mode}")
+    return ChromaRepo()
+
+
+# ------------------------------------------------------------
+# Measurement
+# ------------------------------------------------------------
+def _rss_hwm_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024  # macOS: bytes, Linux: KiB
+
+
+def measure(name: str, fn: Callable[[], Any], *, items: int, repeat: int, trace_memory: bool = True,
+            **params) -> Dict[str, Any]:
+    fn()  # warmup (lazy load, cache của tokenizer / collection ...)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+
+    peak_py_mb = None
+    if trace_memory:
+        # Lần chạy riêng: tracemalloc làm chậm code Python, không lẫn vào số thời gian
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peak_py_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        finally:
+            tracemalloc.stop()
+
+    median = statistics.median(times)
+    result = {
+        "stage": name,
+        **params,
+        "items": items,
+        "repeat": repeat,
+        "median_s": round(median, 6),
+        "min_s": round(min(times), 6),
+        "items_per_s": round(items / median, 2) if median > 0 else None,
+        "peak_py_mb": round(peak_py_mb, 3) if peak_py_mb is not None else None,
+        "rss_hwm_mb": round(_rss_hwm_mb(), 1),
+    }
+    logger.info("%-40s %10.4fs  %10.1f items/s  peak %s MB", name, median, result["items_per_s"] or 0,
+                result["peak_py_mb"])
+    return result
+
+
+# ------------------------------------------------------------
+# Suite
+# ------------------------------------------------------------
+def run_suite(args, workdir: Path) -> List[Dict[str, Any]]:
+    # Settings phải set trước khi tạo EmbeddingService / repo đầu tiên
+    settings.EMBEDDING_MODEL = args.embedding_model or build_tiny_model(workdir / "model", args.seed)
+    settings.EMBEDDING_BACKEND = args.embedding_backend
+    settings.EMBEDDING_DEVICE = args.device
+    settings.EMBEDDING_MICROBATCH_ENABLED = False  # query đơn lẻ encode trực tiếp, không chờ gom batch
+    settings.CHROMA_PERSIST_DIR = str(workdir / "chroma")
+    settings.QUANTIZED_INDEX_DIR = str(workdir / "quantized")
+    settings.FAISS_INDEX_DIR = str(workdir / "faiss")
+
+    from fastapi import UploadFile
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    from ask_forge.backend.app.services.chat import pipeline as chat_pipeline
+    from ask_forge.backend.app.services.indexing.chunking import split_and_filter
+    from ask_forge.backend.app.services.indexing.pdf_loader import load_pdfs
+
+    results: List[Dict[str, Any]] = []
+    corpus = make_corpus(args.files, args.pages, args.lines_per_page, args.seed)
+    corpus_mb = sum(len(data) for _, data in corpus) / (1024 * 1024)
+    logger.info("Corpus: %d files x %d pages (%.2f MB)", args.files, args.pages, corpus_mb)
+
+    # --- load_pdfs ---------------------------------------------------
+    def _load():
+        files = [UploadFile(file=io.BytesIO(data), filename=name) for name, data in corpus]
+        return asyncio.run(load_pdfs(files))
+
+    docs_per_file = _load()
+    n_pages = sum(len(docs) for _, docs in docs_per_file)
+    results.append(measure("load_pdfs", _load, items=n_pages, repeat=args.repeat,
+                           trace_memory=not args.no_tracemalloc, corpus_mb=round(corpus_mb, 3)))
+
+    # --- split_and_filter --------------------------------------------
+    splitter = RecursiveCharacterTextSplitter(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
+
+    def _split():
+        return [split_and_filter(fname, docs, splitter, settings.MIN_CHARS)[0] for fname, docs in docs_per_file]
+
+    all_chunks = _split()
+    texts = [c["text"] for doc in all_chunks for c in doc["content"]]
+    results.append(measure("split_and_filter", _split, items=len(texts), repeat=args.repeat,
+                           trace_memory=not args.no_tracemalloc,
+                           chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP))
+
+    # --- embedding ---------------------------------------------------
+    repo = make_repo(args.vector_mode)
+    embedding_service = repo.embedding_service
+    embedding_service.load()
+    results.append(measure("embed_documents", lambda: embedding_service.embed_documents(texts),
+                           items=len(texts), repeat=args.repeat, trace_memory=not args.no_tracemalloc,
+                           backend=embedding_service.active_backend, dim=embedding_service.dimension,
+                           batch_size=embedding_service.batch_size))
+
+    # --- upsert ------------------------------------------------------
+    runs = {"n": 0}
+
+    def _upsert(batch_size: int):
+        # Mỗi lần 1 index mới: đo insert thật, không phải update id đã có
+        runs["n"] += 1
+        repo.upsert(f"bench_upsert_{batch_size}_{runs['n']}", all_chunks, batch_size=batch_size)
+
+    for batch_size in args.upsert_batch_sizes:
+        results.append(measure(f"upsert[batch_size={batch_size}]", lambda: _upsert(batch_size),
+                               items=len(texts), repeat=args.repeat, trace_memory=not args.no_tracemalloc,
+                               batch_size=batch_size, vector_mode=args.vector_mode))
+
+    # --- retrieval + prompt rendering --------------------------------
+    index_name = "bench_query"
+    repo.upsert(index_name, all_chunks)
+    queries = make_queries(args.queries, args.seed)
+    template = (Path(chat_pipeline.__file__).resolve().parent / "prompts" / "chat_prompt.txt").read_text(encoding="utf-8")
+
+    for n_results in args.n_results:
+        def _retrieve(n=n_results):
+            return [repo.get_context_for_chat(index_name=index_name, query_text=q, n_results=n) for q in queries]
+
+        results.append(measure(f"get_context_for_chat[n_results={n_results}]", _retrieve,
+                               items=len(queries), repeat=args.repeat, trace_memory=not args.no_tracemalloc,
+                               n_results=n_results, vector_mode=args.vector_mode))
+
+        contexts = _retrieve()
+
+        def _render(contexts=contexts):
+            return [chat_pipeline._render_prompt(template, question=q, contexts=ctx, lang=args.lang)
+                    for q, ctx in zip(queries, contexts)]
+
+        results.append(measure(f"render_prompt[n_results={n_results}]", _render,
+                               items=len(queries), repeat=args.repeat, trace_memory=not args.no_tracemalloc,
+                               n_results=n_results,
+                               avg_prompt_chars=round(statistics.mean(len(p) for p in _render()), 1)))
+
+    embedding_service.close()
+    return results
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ask Forge indexing / retrieval micro-benchmarks")
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=10, help="Số trang mỗi file")
+    parser.add_argument("--lines-per-page", type=int, default=60)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--n-results", type=_int_list, default=[1, 5, 20], help="vd. 1,5,20")
+    parser.add_argument("--upsert-batch-sizes", type=_int_list, default=[64, 512, 3000])
+    parser.add_argument("--vector-mode", default="float", help="float | int8 | binary | ivfpq")
+    parser.add_argument("--embedding-model", default=None,
+                        help="Đường dẫn model sentence-transformers local; bỏ trống = BERT tí hon random")
+    parser.add_argument("--embedding-backend", default="torch", help="torch | onnx")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--lang", default="vietnamese")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Bỏ lần chạy đo peak memory")
+    parser.add_argument("--workdir", default=None, help="Giữ model / index ở đây thay vì thư mục tạm")
+    parser.add_argument("--output", default=None, help="File JSON kết quả")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+
+    started_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+    if args.workdir:
+        Path(args.workdir).mkdir(parents=True, exist_ok=True)
+        results = run_suite(args, Path(args.workdir))
+    else:
+        with tempfile.TemporaryDirectory(prefix="askforge-bench-") as tmp:
+            results = run_suite(args, Path(tmp))
+
+    report: Dict[str, Optional[Any]] = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "host": {"python": platform.python_version(), "machine": platform.machine(), "platform": platform.platform()},
+        "started_at": started_at,
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Load test end-to-end cho /chat/stream + QG poll flow.
+
+N "học sinh" chạy đồng thời, mỗi học sinh hỏi M câu: stream answer qua
+/api/chat/stream (SSE), sau đó poll /api/chat/qg/{job_id} tới khi QG xong.
+
+Đo (p50/p95/p99):
+    ttft_s          - từ lúc gửi request tới token event đầu tiên
+    latency_s       - tới [DONE]
+    qg_latency_s    - từ qg_job event tới khi poll thấy completed
+    loop_lag_s      - độ trễ event loop (sleep 10ms bị trễ thêm bao nhiêu);
+                      in-process = loop của chính app, --url = loop của client
+và error rate (HTTP lỗi, SSE error event, QG failed / timeout).
+
+Chạy in-process (app thật qua ASGI transport stream từng chunk, có lifespan), offline với fake LLM:
+    FAKE_LLM_ENABLED=true python -m ask_forge.backend.benchmarks.load_chat \\
+        --students 40 --questions 3 --index-name demo --output runs/fake_40.json
+
+Hoặc bắn vào server đang chạy:
+    python -m ask_forge.backend.benchmarks.load_chat --url http://localhost:8000 --students 40
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+logger = logging.getLogger("askforge.bench")
+
+DEFAULT_QUESTIONS = [
+    "Mã hoá đối xứng là gì?",
+    "So sánh TCP và UDP.",
+    "Tấn công SQL injection hoạt động như thế nào?",
+    "Tường lửa dùng để làm gì?",
+    "Giải thích cơ chế xác thực hai yếu tố.",
+]
+
+
+@dataclass
+class TurnResult:
+    student: int
+    question: str
+    ok: bool = False
+    status: Optional[int] = None
+    error: Optional[str] = None
+    ttft_s: Optional[float] = None
+    latency_s: Optional[float] = None
+    tokens: int = 0
+    answer_cache_hit: bool = False
+    qg_ok: Optional[bool] = None
+    qg_latency_s: Optional[float] = None
+    qg_questions: int = 0
+
+
+@dataclass
+class LoopLagMonitor:
+    interval_s: float = 0.01
+    samples: List[float] = field(default_factory=list)
+    _task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval_s)
+            self.samples.append(max(0.0, loop.time() - t0 - self.interval_s))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+
+# ------------------------------------------------------------
+# Client
+# ------------------------------------------------------------
+class _QueueStream(httpx.AsyncByteStream):
+    def __init__(self, queue: asyncio.Queue, app_task: asyncio.Task):
+        self._queue = queue
+        self._app_task = app_task
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                break
+            yield chunk
+
+    async def aclose(self):
+        if not self._app_task.done():
+            self._app_task.cancel()
+            await asyncio.gather(self._app_task, return_exceptions=True)
+
+
+class StreamingASGITransport(httpx.AsyncBaseTransport):
+    """
+    Như httpx.ASGITransport nhưng trả response ngay khi app gửi headers và stream
+    body theo từng chunk (ASGITransport đợi app chạy xong -> không đo được TTFT).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = b"".join([chunk async for chunk in request.stream])
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": request.method,
+            "headers": [(k.lower(), v) for k, v in request.headers.raw],
+            "scheme": request.url.scheme,
+            "path": request.url.path,
+            "raw_path": request.url.raw_path.split(b"?")[0],
+            "query_string": request.url.query,
+            "server": (request.url.host, request.url.port),
+            "client": ("127.0.0.1", 0),
+            "root_path": "",
+        }
+        started: asyncio.Future = asyncio.get_running_loop().create_future()
+        queue: asyncio.Queue = asyncio.Queue()
+        disconnected = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                started.set_result((message["status"], message.get("headers", [])))
+            elif message["type"] == "http.response.body":
+                if message.get("body"):
+                    queue.put_nowait(message["body"])
+                if not message.get("more_body", False):
+                    queue.put_nowait(None)
+                    disconnected.set()
+
+        async def run_app():
+            try:
+                await self.app(scope, receive, send)
+            except Exception as e:
+                if not started.done():
+                    started.set_exception(e)
+            finally:
+                queue.put_nowait(None)
+
+        app_task = asyncio.create_task(run_app())
+        status, headers = await started
+        return httpx.Response(status, headers=headers, stream=_QueueStream(queue, app_task), request=request)
+
+
+@asynccontextmanager
+async def make_client(args) -> AsyncIterator[httpx.AsyncClient]:
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.students * 2, max_keepalive_connections=args.students * 2)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits) as client:
+            yield client
+        return
+
+    # In-process: chạy lifespan thật (AppState.startup/shutdown) rồi gọi app qua ASGI
+    from ask_forge.backend.app.main import app
+
+    async with app.router.lifespan_context(app):
+        transport = StreamingASGITransport(app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+            yield client
+
+
+async def _sse_events(response: httpx.Response) -> AsyncIterator[object]:
+    async for line in response.aiter_lines():
+        if not line.startswith("data: "):
+            continue
+        data = line[len("data: "):]
+        if data == "[DONE]":
+            yield "[DONE]"
+            return
+        yield json.loads(data)
+
+
+async def poll_qg(client: httpx.AsyncClient, args, result: TurnResult, poll_url: str, t_job: float):
+    deadline = t_job + args.qg_timeout
+    while time.perf_counter() < deadline:
+        resp = await client.get(poll_url)
+        body = resp.json()
+        if body.get("status") == "completed":
+            result.qg_ok = True
+            result.qg_latency_s = time.perf_counter() - t_job
+            result.qg_questions = len(body.get("questions") or [])
+            return
+        if resp.status_code >= 400 or body.get("status") == "failed":
+            result.qg_ok = False
+            result.error = result.error or f"qg failed: {body.get('error')}"
+            return
+        await asyncio.sleep(args.qg_poll_interval)
+    result.qg_ok = False
+    result.error = result.error or "qg timeout"
+
+
+async def run_turn(client: httpx.AsyncClient, args, student: int, question: str) -> TurnResult:
+    result = TurnResult(student=student, question=question)
+    payload = {
+        "query_text": question,
+        "index_name": args.index_name,
+        "lang": args.lang,
+        "n_results": args.n_results,
+    }
+    t0 = time.perf_counter()
+    poll_url, t_job = None, None
+    try:
+        async with client.stream("POST", f"{args.prefix}/chat/stream", json=payload) as resp:
+            result.status = resp.status_code
+            if resp.status_code != 200:
+                result.error = f"HTTP {resp.status_code}: {(await resp.aread())[:200]!r}"
+                return result
+            async for event in _sse_events(resp):
+                if event == "[DONE]":
+                    result.latency_s = time.perf_counter() - t0
+                    break
+                etype = event.get("type")
+                if etype == "token":
+                    if result.ttft_s is None:
+                        result.ttft_s = time.perf_counter() - t0
+                    result.tokens += 1
+                elif etype == "answer_cache":
+                    result.answer_cache_hit = True
+                elif etype == "qg_job":
+                    poll_url, t_job = event["poll_url"], time.perf_counter()
+                elif etype == "error":
+                    result.error = event.get("content")
+        result.ok = result.error is None and result.latency_s is not None
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+        return result
+
+    if result.ok and poll_url and not args.no_qg:
+        await poll_qg(client, args, result, poll_url, t_job)
+    return result
+
+
+async def run_student(client: httpx.AsyncClient, args, student: int, rng: random.Random) -> List[TurnResult]:
+    await asyncio.sleep(args.ramp_s * student / max(args.students, 1))
+    results = []
+    for i in range(args.questions):
+        question = args.question_pool[0] if args.same_question else rng.choice(args.question_pool)
+        results.append(await run_turn(client, args, student, question))
+        if args.think_time > 0 and i < args.questions - 1:
+            await asyncio.sleep(rng.uniform(0.5, 1.5) * args.think_time)
+    return results
+
+
+# ------------------------------------------------------------
+# Report
+# ------------------------------------------------------------
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    values = [v for v in values if v is not None]
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "p50": round(float(p50), 4),
+        "p95": round(float(p95), 4),
+        "p99": round(float(p99), 4),
+        "max": round(float(max(values)), 4),
+    }
+
+
+def summarize(results: List[TurnResult], lag: List[float], wall_s: float) -> Dict[str, object]:
+    qg = [r for r in results if r.qg_ok is not None]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if r.error:
+            key = r.error.split(":")[0][:60]
+            errors[key] = errors.get(key, 0) + 1
+    return {
+        "turns": len(results),
+        "wall_s": round(wall_s, 3),
+        "throughput_turns_per_s": round(len(results) / wall_s, 3) if wall_s > 0 else None,
+        "error_rate": round(sum(1 for r in results if not r.ok) / len(results), 4) if results else None,
+        "qg_error_rate": round(sum(1 for r in qg if not r.qg_ok) / len(qg), 4) if qg else None,
+        "answer_cache_hit_rate": round(sum(r.answer_cache_hit for r in results) / len(results), 4) if results else None,
+        "errors": errors,
+        "ttft_s": percentiles([r.ttft_s for r in results if r.ok]),
+        "latency_s": percentiles([r.latency_s for r in results if r.ok]),
+        "qg_latency_s": percentiles([r.qg_latency_s for r in qg if r.qg_ok]),
+        "loop_lag_s": percentiles(lag),
+    }
+
+
+async def main_async(args) -> Dict[str, object]:
+    rng = random.Random(args.seed)
+    monitor = LoopLagMonitor()
+    async with make_client(args) as client:
+        monitor.start()
+        t0 = time.perf_counter()
+        per_student = await asyncio.gather(*[
+            run_student(client, args, s, random.Random(rng.random())) for s in range(args.students)
+        ])
+        wall_s = time.perf_counter() - t0
+        await monitor.stop()
+
+    results = [r for rs in per_student for r in rs]
+    report = {
+        "config": {
+            k: v for k, v in vars(args).items() if k not in ("question_pool", "output", "raw")
+        },
+        "mode": "url" if args.url else "in_process",
+        "host": {"python": platform.python_version(), "machine": platform.machine()},
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "summary": summarize(results, monitor.samples, wall_s),
+    }
+    if args.raw:
+        report["turns"] = [asdict(r) for r in results]
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ask Forge /chat/stream + QG load test")
+    parser.add_argument("--url", default=None, help="Base URL của server; bỏ trống = chạy app in-process")
+    parser.add_argument("--prefix", default="/api")
+    parser.add_argument("--students", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=3, help="Số câu hỏi mỗi học sinh")
+    parser.add_argument("--index-name", default="default")
+    parser.add_argument("--lang", default="vietnamese")
+    parser.add_argument("--n-results", type=int, default=5)
+    parser.add_argument("--questions-file", default=None, help="Mỗi dòng 1 câu hỏi")
+    parser.add_argument("--same-question", action="store_true", help="Cả lớp hỏi cùng 1 câu")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Giây nghỉ trung bình giữa 2 câu")
+    parser.add_argument("--ramp-s", type=float, default=0.0, help="Dàn đều thời điểm bắt đầu của học sinh")
+    parser.add_argument("--no-qg", action="store_true", help="Không poll QG")
+    parser.add_argument("--qg-poll-interval", type=float, default=0.25)
+    parser.add_argument("--qg-timeout", type=float, default=120.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="HTTP read timeout")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--raw", action="store_true", help="Lưu kết quả từng turn vào JSON")
+    parser.add_argument("--output", default=None, help="File JSON kết quả")
+    args = parser.parse_args(argv)
+
+    args.question_pool = (
+        [q.strip() for q in Path(args.questions_file).read_text(encoding="utf-8").splitlines() if q.strip()]
+        if args.questions_file else DEFAULT_QUESTIONS
+    )
+    return args
+
+
+def main(argv=None):
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(text, encoding="utf-8")
+    print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
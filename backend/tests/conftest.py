@@ -0,0 +1,23 @@
+"""
+Fixtures chung cho test backend.
+
+Chạy: pytest backend/tests (thư mục repo phải tên ask_forge, import dạng ask_forge.backend...).
+"""
+import os
+
+# Settings yêu cầu GEMINI_API_KEY; test không gọi Gemini thật
+os.environ.setdefault("GEMINI_API_KEY", "test-key")
+
+import pytest
+
+from ask_forge.backend.app.services.llm.registry import LLMRegistry
+
+
+@pytest.fixture
+def registry():
+    """LLMRegistry mới cho mỗi test (registry là singleton của process)."""
+    LLMRegistry._instance = None
+    reg = LLMRegistry()
+    yield reg
+    reg.shutdown()
+    LLMRegistry._instance = None
@@ -0,0 +1,97 @@
+import numpy as np
+
+from ask_forge.backend.app.services.chat.answer_cache import SemanticAnswerCache
+from ask_forge.backend.app.services.qg.cache import QGResultCache, context_indexes, make_key
+
+CONTEXTS_A = [{"text": "a", "source": "s.pdf", "chunk_id": "c1"}]
+CONTEXTS_AB = [
+    {"text": "a", "source": "s.pdf", "chunk_id": "c1", "index_name": "a"},
+    {"text": "b", "source": "t.pdf", "chunk_id": "c9", "index_name": "b"},
+]
+
+
+# ------------------------------------------------------------
+# QGResultCache
+# ------------------------------------------------------------
+def test_qg_key_normalizes_seed_and_includes_index():
+    key = make_key("Là gì ?", CONTEXTS_A, "vi", "ckpt", index_name="a")
+    assert key == make_key("  là   GÌ", CONTEXTS_A, "vi", "ckpt", index_name="a")
+    assert key != make_key("Là gì ?", CONTEXTS_A, "vi", "ckpt", index_name="b")
+
+
+def test_qg_invalidate_drops_only_entries_of_that_index():
+    cache = QGResultCache(max_entries=10, ttl_s=0, sqlite_path="")
+    cache.set("k_a", ["q1"], indexes=["a"])
+    cache.set("k_ab", ["q2"], indexes=context_indexes(CONTEXTS_AB))
+    cache.set("k_c", ["q3"], indexes=["c"])
+
+    cache.invalidate("b")
+    assert cache.get("k_a") == ["q1"]
+    assert cache.get("k_ab") is None
+    assert cache.get("k_c") == ["q3"]
+
+
+def test_qg_set_dropped_when_index_changed_during_job():
+    cache = QGResultCache(max_entries=10, ttl_s=0, sqlite_path="")
+    generation = cache.generation(["a"])  # job bắt đầu
+    cache.invalidate("a")  # index build lại trong lúc generate
+    cache.set("k", ["stale"], indexes=["a"], generation=generation)
+    assert cache.get("k") is None
+
+    cache.set("k", ["fresh"], indexes=["a"], generation=cache.generation(["a"]))
+    assert cache.get("k") == ["fresh"]
+
+
+def test_qg_invalidate_persists_to_sqlite(tmp_path):
+    path = str(tmp_path / "qg.sqlite3")
+    cache = QGResultCache(max_entries=10, ttl_s=0, sqlite_path=path)
+    cache.set("k_a", ["q1"], indexes=["a"])
+    cache.set("k_b", ["q2"], indexes=["b"])
+    cache.invalidate("a")
+    cache.close()
+
+    reopened = QGResultCache(max_entries=10, ttl_s=0, sqlite_path=path)
+    assert reopened.get("k_a") is None
+    assert reopened.get("k_b") == ["q2"]
+    reopened.close()
+
+
+# ------------------------------------------------------------
+# SemanticAnswerCache
+# ------------------------------------------------------------
+def _vec(*values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float32)
+
+
+def test_answer_cache_hit_on_similar_question_same_contexts():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=10, ttl_s=0)
+    cache.put(("a",), "q", _vec(1, 0, 0), CONTEXTS_A, "vi", "answer")
+
+    hit = cache.lookup(("a",), _vec(1, 0.05, 0), CONTEXTS_A, "vi")
+    assert hit is not None and hit[0] == "answer"
+    assert cache.lookup(("a",), _vec(0, 1, 0), CONTEXTS_A, "vi") is None  # câu khác
+    assert cache.lookup(("a",), _vec(1, 0, 0), CONTEXTS_A, "en") is None  # lang khác
+    assert cache.lookup(("a",), _vec(1, 0, 0), CONTEXTS_AB, "vi") is None  # contexts khác
+
+
+def test_answer_cache_invalidate_drops_scopes_with_index():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=10, ttl_s=0)
+    cache.put(("a",), "q", _vec(1, 0, 0), CONTEXTS_A, "vi", "only a")
+    cache.put(("a", "b"), "q", _vec(1, 0, 0), CONTEXTS_AB, "vi", "federated")
+    cache.put(("c",), "q", _vec(1, 0, 0), CONTEXTS_A, "vi", "only c")
+
+    cache.invalidate("b")
+    assert cache.lookup(("a",), _vec(1, 0, 0), CONTEXTS_A, "vi")[0] == "only a"
+    assert cache.lookup(("a", "b"), _vec(1, 0, 0), CONTEXTS_AB, "vi") is None
+    assert cache.lookup(("c",), _vec(1, 0, 0), CONTEXTS_A, "vi")[0] == "only c"
+
+
+def test_answer_cache_put_dropped_when_index_changed_during_stream():
+    cache = SemanticAnswerCache(threshold=0.95, max_entries=10, ttl_s=0)
+    generation = cache.generation(("a",))  # chụp trước retrieve
+    cache.invalidate("a")
+    cache.put(("a",), "q", _vec(1, 0, 0), CONTEXTS_A, "vi", "stale", generation=generation)
+    assert len(cache) == 0
+
+    cache.put(("a",), "q", _vec(1, 0, 0), CONTEXTS_A, "vi", "fresh", generation=cache.generation(("a",)))
+    assert cache.lookup(("a",), _vec(1, 0, 0), CONTEXTS_A, "vi")[0] == "fresh"
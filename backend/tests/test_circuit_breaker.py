@@ -0,0 +1,68 @@
+import pytest
+
+from ask_forge.backend.app.services.llm import circuit_breaker as cb_module
+from ask_forge.backend.app.services.llm.circuit_breaker import CircuitBreaker
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.monotonic giả cho circuit breaker: test tự tăng now[0]."""
+    now = [1000.0]
+    monkeypatch.setattr(cb_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("p", failure_threshold=3, reset_timeout_s=10)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.ready() and not breaker.allow()
+
+
+def test_success_resets_failure_count(clock):
+    breaker = CircuitBreaker("p", failure_threshold=2, reset_timeout_s=10)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.state == "half_open"
+
+    # ready() chỉ đọc: chọn ứng viên không chiếm slot thử
+    assert breaker.ready() and breaker.ready()
+    assert breaker.allow()
+    assert not breaker.ready() and not breaker.allow()  # probe đang chạy
+
+
+def test_probe_success_closes_failure_reopens(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    clock[0] += 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_abandoned_probe_is_retried_after_reset_timeout(clock):
+    breaker = CircuitBreaker("p", failure_threshold=1, reset_timeout_s=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()  # probe không bao giờ báo kết quả
+    clock[0] += 5
+    assert not breaker.allow()
+    clock[0] += 5
+    assert breaker.allow()
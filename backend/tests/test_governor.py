@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from ask_forge.backend.app.services.llm.governor import ProviderGovernor, ProviderOverloaded
+
+
+def _governor(**limits) -> ProviderGovernor:
+    return ProviderGovernor("test", executor_workers=1, **limits)
+
+
+def test_explicit_zero_limits_are_kept():
+    governor = _governor(max_concurrency=1, max_queue=0, queue_timeout_s=0)
+    assert governor.max_queue == 0
+    assert governor.queue_timeout_s == 0
+    governor.shutdown()
+
+
+def test_sheds_429_when_queue_full():
+    governor = _governor(max_concurrency=1, max_queue=1, queue_timeout_s=5)
+
+    async def hold(release: asyncio.Event):
+        async with governor.slot():
+            await release.wait()
+
+    async def main():
+        release = asyncio.Event()
+        running = asyncio.create_task(hold(release))
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(hold(release))
+        await asyncio.sleep(0)
+        assert governor.snapshot()["running"] == 1 and governor.snapshot()["waiting"] == 1
+
+        with pytest.raises(ProviderOverloaded) as exc:
+            async with governor.slot():
+                pass
+        assert exc.value.status_code == 429
+
+        release.set()
+        await asyncio.gather(running, queued)
+        assert governor.snapshot()["running"] == 0 and governor.snapshot()["waiting"] == 0
+
+    asyncio.run(main())
+    governor.shutdown()
+
+
+def test_sheds_503_after_queue_timeout():
+    governor = _governor(max_concurrency=1, max_queue=4, queue_timeout_s=0.05)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with governor.slot():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(ProviderOverloaded) as exc:
+            async with governor.slot():
+                pass
+        assert exc.value.status_code == 503
+        assert governor.waiting == 0
+
+        release.set()
+        await running
+        async with governor.slot():  # slot được trả lại sau khi call xong
+            pass
+
+    asyncio.run(main())
+    governor.shutdown()
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.repositories.quantized import QuantizedIndex
+
+DIM = 32
+
+
+def _unit(rng: np.random.Generator, n: int) -> np.ndarray:
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _fill(index, vectors):
+    ids = [f"doc::{i}" for i in range(len(vectors))]
+    index.upsert(ids, vectors, [f"text {i}" for i in range(len(vectors))],
+                 [{"source": "doc", "page": i} for i in range(len(vectors))])
+    return ids
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_upsert_search_reload(tmp_path, mode):
+    rng = np.random.default_rng(0)
+    vectors = _unit(rng, 200)
+    index = QuantizedIndex(tmp_path / "idx", mode)
+    _fill(index, vectors)
+
+    rows, scores = index.search(vectors[42], k=5)
+    assert rows[0] == 42
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    assert np.all(np.diff(scores) <= 0)  # exact rescore, giảm dần
+
+    # Ghi đè 1 id: không thêm row mới, search thấy vector + record mới
+    replacement = _unit(rng, 1)
+    index.upsert(["doc::42"], replacement, ["updated"], [{"source": "doc", "page": 99}])
+    assert index.count() == 200
+    rows, _ = index.search(replacement[0], k=1)
+    assert rows[0] == 42
+    index.close()
+
+    reopened = QuantizedIndex(tmp_path / "idx", mode)
+    assert reopened.count() == 200 and reopened.dim == DIM
+    rows, scores = reopened.search(replacement[0], k=1)
+    ids, documents, metadatas = reopened.records(rows.tolist())
+    assert ids == ["doc::42"] and documents == ["updated"] and metadatas[0]["page"] == 99
+    assert scores[0] == pytest.approx(1.0, abs=1e-5)
+    reopened.close()
+
+
+def test_duplicate_ids_in_batch_keep_last(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = _unit(rng, 2)
+    index = QuantizedIndex(tmp_path / "idx", "int8")
+    index.upsert(["a", "a"], vectors, ["first", "second"], [{}, {}])
+    assert index.count() == 1
+    rows, _ = index.search(vectors[1], k=1)
+    assert index.records(rows.tolist())[1] == ["second"]
+    index.close()
+
+
+def test_reopen_with_other_kind_fails(tmp_path):
+    index = QuantizedIndex(tmp_path / "idx", "int8")
+    _fill(index, _unit(np.random.default_rng(2), 10))
+    index.close()
+    with pytest.raises(ValueError):
+        QuantizedIndex(tmp_path / "idx", "binary")
+
+
+def test_dim_mismatch_rejected(tmp_path):
+    index = QuantizedIndex(tmp_path / "idx", "int8")
+    _fill(index, _unit(np.random.default_rng(3), 10))
+    with pytest.raises(ValueError):
+        index.upsert(["x"], np.ones((1, DIM + 1), dtype=np.float32), ["x"], [{}])
+    index.close()
+
+
+def test_ivfpq_trains_and_retrains_on_growth(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    from ask_forge.backend.app.repositories.faiss_store import FaissIVFPQIndex
+
+    monkeypatch.setattr(settings, "FAISS_MIN_TRAIN_SIZE", 300)
+    monkeypatch.setattr(settings, "FAISS_NLIST", 64)
+    monkeypatch.setattr(settings, "FAISS_PQ_M", 8)
+    monkeypatch.setattr(settings, "FAISS_RETRAIN_GROWTH", 2.0)
+    rng = np.random.default_rng(4)
+    vectors = _unit(rng, 2000)
+    index = FaissIVFPQIndex(tmp_path / "idx")
+
+    index.upsert([f"d{i}" for i in range(100)], vectors[:100], ["x"] * 100, [{}] * 100)
+    assert not index.is_trained  # dưới FAISS_MIN_TRAIN_SIZE: full scan
+    assert index.search(vectors[5], k=1)[0][0] == 5
+
+    index.upsert([f"d{i}" for i in range(100, 300)], vectors[100:300], ["x"] * 200, [{}] * 200)
+    assert index.is_trained
+    first_nlist = index._index.nlist
+
+    index.upsert([f"d{i}" for i in range(300, 2000)], vectors[300:], ["x"] * 1700, [{}] * 1700)
+    assert index._index.nlist > first_nlist
+    assert index._index.ntotal == 2000
+
+    # Update không nhân bản vector trong IVF (remove_ids qua direct map)
+    index.upsert(["d7"], vectors[7:8], ["y"], [{}])
+    assert index._index.ntotal == 2000
+    index.close()
+
+    reopened = FaissIVFPQIndex(tmp_path / "idx")
+    assert reopened.is_trained and reopened._index.ntotal == 2000
+    rows, scores = reopened.search(vectors[7], k=1, nprobe=64)
+    assert rows[0] == 7 and scores[0] == pytest.approx(1.0, abs=1e-5)
+    reopened.close()
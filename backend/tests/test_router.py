@@ -0,0 +1,112 @@
+import asyncio
+import time
+
+import pytest
+
+from ask_forge.backend.app.core.config import settings
+from ask_forge.backend.app.services.llm.adapters.fake import FakeLLMInjectedError, FakeLLMProvider
+from ask_forge.backend.app.services.llm.router import LLMRouter
+
+CONTEXT = {"task": "chat"}
+
+
+@pytest.fixture
+def router(registry, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_TASK_CANDIDATES", {"chat": ["gemini_service", "backup"]})
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_S", 0.05)
+    monkeypatch.setattr(settings, "LLM_FIRST_TOKEN_TIMEOUT_S", 2.0)
+    return LLMRouter()
+
+
+def _register(registry, name, **kwargs):
+    kwargs.setdefault("itl_ms", 1)
+    kwargs.setdefault("output_tokens", 4)
+    registry.register(name, FakeLLMProvider(name, jitter=0, error_rate=kwargs.pop("error_rate", 0), **kwargs))
+
+
+def _collect(router, route_info):
+    async def main():
+        return [chunk async for chunk in router.stream(CONTEXT, "prompt", route_info=route_info)]
+    return asyncio.run(main())
+
+
+def test_fast_primary_is_not_hedged(router, registry):
+    _register(registry, "gemini_service", ttft_ms=1)
+    _register(registry, "backup", ttft_ms=1)
+    info = {}
+    chunks = _collect(router, info)
+
+    assert len(chunks) == 4
+    assert info["provider"] == "gemini_service" and info["hedged"] is False
+    assert info["usage"].completion_tokens == 4
+    assert registry.stats("backup").samples == 0
+
+
+def test_slow_primary_is_hedged_and_backup_wins(router, registry):
+    _register(registry, "gemini_service", ttft_ms=1000)
+    _register(registry, "backup", ttft_ms=1)
+    info = {}
+    t0 = time.perf_counter()
+    chunks = _collect(router, info)
+
+    assert len(chunks) == 4
+    assert info["provider"] == "backup" and info["hedged"] is True
+    assert time.perf_counter() - t0 < 0.5  # không chờ primary
+    # Primary thua bị cancel: không tính là lỗi cho circuit breaker
+    assert registry.breaker("gemini_service").failures == 0
+
+
+def test_primary_error_falls_back_before_hedge_delay(router, registry, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGE_DELAY_S", 5.0)
+    _register(registry, "gemini_service", ttft_ms=1, error_rate=1.0)
+    _register(registry, "backup", ttft_ms=1)
+    info = {}
+    t0 = time.perf_counter()
+    _collect(router, info)
+
+    assert info["provider"] == "backup"
+    assert time.perf_counter() - t0 < 1.0
+    assert registry.breaker("gemini_service").failures == 1
+
+
+def test_all_providers_fail_raises_last_error(router, registry):
+    _register(registry, "gemini_service", ttft_ms=1, error_rate=1.0)
+    _register(registry, "backup", ttft_ms=1, error_rate=1.0)
+    with pytest.raises(FakeLLMInjectedError):
+        _collect(router, {})
+
+
+def test_no_first_token_before_deadline_times_out(router, registry, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_FIRST_TOKEN_TIMEOUT_S", 0.1)
+    _register(registry, "gemini_service", ttft_ms=1000)
+    _register(registry, "backup", ttft_ms=1000)
+    with pytest.raises(TimeoutError):
+        _collect(router, {})
+    assert registry.breaker("gemini_service").failures == 1
+    assert registry.breaker("backup").failures == 1
+
+
+def test_open_primary_routes_to_backup(router, registry):
+    _register(registry, "gemini_service", ttft_ms=1)
+    _register(registry, "backup", ttft_ms=1)
+    breaker = registry.breaker("gemini_service")
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    info = {}
+    _collect(router, info)
+    assert info["provider"] == "backup" and info["hedged"] is False
+
+
+def test_unused_backup_does_not_take_half_open_probe(router, registry):
+    _register(registry, "gemini_service", ttft_ms=1)
+    _register(registry, "backup", ttft_ms=1)
+    breaker = registry.breaker("backup")
+    breaker.reset_timeout_s = 0
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    info = {}
+    _collect(router, info)
+    assert info["provider"] == "gemini_service"
+    assert breaker.ready()  # slot thử vẫn còn cho request thật tới backup